@@ -7,19 +7,27 @@
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-from utils.custom_tk_widgets import ToolTipButton, ImageFrame, ask_choice
+from utils.custom_tk_widgets import ToolTipButton, ImageFrame, TaskStatusBar, ask_choice
 from utils.button_icon_gen import IvpBtnIcon
 from utils.image_parser import ImageParser
 from utils.image_processor import ImageProcessor
-from zipfile import ZipFile, ZIP_LZMA
+from utils.encoded_image import EncodedImage
+from utils.ivp_archive import IvpArchive, IvpArchiveReader
+from utils.large_image import LargeImage
+from utils.task_runner import TaskRunner
+from utils.tile_scheduler import TileScheduler
+import io
 import os
-import pathlib
+import threading
+import numpy as np
 
 
 # App globals
 CURRENT_IMAGE = None
 GRAYSCALE_DATA = None
 LAST_NOISED_DATA = None
+# zero pixel choices of the geometric mean filter, for an epsilon of 0 and 1
+ZERO_POLICIES = ["Any zero gives 0", "Zeros lower the mean"]
 
 ########## FUNCTIONS ##########
 
@@ -43,46 +51,64 @@ def open_folder():
         current_frame.stop_loading()
         return
 
-    for file in os.listdir(folder_path):
-        filetypes_allowed = [".pcx", ".jpg", ".jpeg", ".png", ".bmp"]
-        file_type = pathlib.Path(file).suffix
-        if file_type not in filetypes_allowed:
-            messagebox.showerror("Error", "Folder should only contain image files")
-            return
-        else:
-            continue
-    
     zip_path = folder_path + "/" + folder_path.split("/")[-1] + ".ivp"
-    files = os.listdir(folder_path)
-    
-    with ZipFile(zip_path, 'w', ZIP_LZMA) as zip:
-        for file in files:
-            zip.write("/".join([folder_path, file]), arcname=file)
-    
-    os.startfile(folder_path)
-    current_frame.stop_loading()
+    result = {}
+
+    def build_archive():
+        try:
+            result["report"] = IvpArchive.build(folder_path, zip_path)
+        except Exception as e:
+            result["error"] = e
+
+    # compress on a worker thread so the window stays responsive
+    worker = threading.Thread(target=build_archive, daemon=True)
+    worker.start()
+
+    def check_archive():
+        if worker.is_alive():
+            root.after(100, check_archive)
+            return
+
+        current_frame.stop_loading()
+        if "error" in result:
+            messagebox.showerror("Error", str(result["error"]))
+            return
+
+        report = result["report"]
+        info = f"Files: {report["files"]}\n"
+        info += f"Duplicates skipped: {len(report["duplicates"])}\n"
+        info += f"Archive size: {report["bytes out"]} of {report["bytes in"]} bytes\n"
+        info += f"Time: {report["seconds"]:.2f} s ({report["throughput"]:.2f} MiB/s)"
+        messagebox.showinfo("Folder compressed", info)
+
+        if hasattr(os, "startfile"):
+            os.startfile(folder_path)
+
+    check_archive()
     
 
 def open_file():
     global CURRENT_IMAGE
     global GRAYSCALE_DATA
 
-    file_types = [("Image/Compressed Files", ["*.pcx", "*.jpg", "*.jpeg", "*.png", "*.bmp", "*.ivp"]), ("Image Files", ["*.pcx", "*.jpg", "*.jpeg", "*.png", "*.bmp"]), ("Compressed Image", ["*.ivp"])]
+    file_types = [("Image/Compressed Files", ["*.pcx", "*.jpg", "*.jpeg", "*.png", "*.bmp", "*.ivc", "*.ivp"]), ("Image Files", ["*.pcx", "*.jpg", "*.jpeg", "*.png", "*.bmp"]), ("Encoded Image", ["*.ivc"]), ("Compressed Image", ["*.ivp"])]
     filename = filedialog.askopenfilename(
         title="Open an image file", filetypes=file_types
     )
     if filename:
-        # extract all images if compressed
+        # read images straight from the archive, each is decoded when first shown
         if filename.endswith("ivp"):
-            with ZipFile(filename, "r") as archive:
-                namelist = archive.namelist()
-                archive.extractall(filename[:-4])
-                # remove the empty .zip file in the output folder
-                filename = ["/".join([filename[:-4], name]) for name in namelist]
+            archive = IvpArchiveReader(filename)
+            filename = archive.get_names()
+            load_image = archive.load
+            if not filename:
+                messagebox.showerror("Error opening file", "Archive has no images")
+                return
 
         # load single image
         else:
             filename = [filename]
+            load_image = ImageParser.parse_image
         
         for i in range(len(filename)):
             main_notebook.select(0)
@@ -92,7 +118,7 @@ def open_file():
                 if i == 0:
                     current_frame = main_frame
                     current_frame.start_loading()
-                    CURRENT_IMAGE = ImageParser.parse_image(filename[i])
+                    CURRENT_IMAGE = load_image(filename[i])
                     main_frame.display_image(
                         ImageProcessor.get_displayable_image(
                             CURRENT_IMAGE["pixel_data"],
@@ -102,7 +128,7 @@ def open_file():
                     )
                     metadata_title.configure(text="Image Metadata")
                     metadata_label.configure(text=CURRENT_IMAGE["metadata"])
-                    if CURRENT_IMAGE["palette_data"]:
+                    if CURRENT_IMAGE["palette_data"] is not None:
                         palette_title.configure(text="Color Palette")
                         palette_image.display_image(
                             ImageProcessor.get_displayable_palette(
@@ -117,43 +143,206 @@ def open_file():
                         palette_image.remove_image()
                         palette_image.pack_forget()
 
-                    GRAYSCALE_DATA = list(
+                    GRAYSCALE_DATA = np.asarray(
                         ImageProcessor.get_grayscale_image(
                             CURRENT_IMAGE["pixel_data"],
                             CURRENT_IMAGE["width"],
                             CURRENT_IMAGE["height"],
-                        ).getdata()
+                        )
                     )
+                    current_frame.stop_loading()
 
-                # for the rest, in a new tab
+                # for the rest, in a new tab that is filled in when selected
                 else:
-                    img_to_disp = ImageParser.parse_image(filename[i])
-                    new_frame = ImageFrame(main_notebook, title=f"img{i}", parsable_image_data=img_to_disp)
+                    new_frame = ImageFrame(
+                        main_notebook,
+                        title=f"img{i}",
+                        image_loader=lambda name=filename[i]: load_image(name),
+                    )
                     new_frame.pack(fill="both", expand=True)
                     main_notebook.add(new_frame, text=f"img{i}")
-                    main_notebook.select(new_frame)
-                    current_frame = new_frame
-                    current_frame.start_loading()
-                    new_frame.display_image(
-                        ImageProcessor.get_displayable_image(
-                            img_to_disp["pixel_data"],
-                            img_to_disp["width"],
-                            img_to_disp["height"],
-                        )
-                    )
-                current_frame.stop_loading()
 
             except Exception as e:
-                current_frame.stop_loading()
+                if current_frame:
+                    current_frame.stop_loading()
                 messagebox.showerror("Error opening file", str(e))
 
+
+def show_selected_tab(event):
+    current_frame = main_notebook.nametowidget(main_notebook.select())
+    # only tabs of not yet shown images have to be loaded
+    if current_frame.image_loader is None or current_frame.image is not None:
+        return
+
+    current_frame.start_loading()
+    try:
+        image_info = current_frame.get_parsable_image_data()
+        current_frame.display_image(
+            ImageProcessor.get_displayable_image(
+                image_info["pixel_data"],
+                image_info["width"],
+                image_info["height"],
+            )
+        )
+        current_frame.stop_loading()
+    except Exception as e:
+        current_frame.stop_loading()
+        messagebox.showerror("Error opening file", str(e))
+
+
+def save_encoded_image():
+    if not CURRENT_IMAGE:
+        messagebox.showerror("Error", "Load an image first")
+        return
+
+    codec = ask_choice(
+        root,
+        "Save encoded image",
+        "Choose encoding",
+        ["Run-length Encoding", "Huffman Coding"],
+        ["rle", "huffman"],
+    )
+    if codec == None:
+        return
+
+    file_types = [("Encoded Image", ["*.ivc"]), ("Compressed Image", ["*.ivp"])]
+    location = filedialog.asksaveasfilename(
+        title="Save encoded image", filetypes=file_types, defaultextension=".ivc"
+    )
+    if not location:
+        return
+
+    archive = None
+    # add the encoded image as an entry of an .ivp archive
+    if location.endswith(".ivp"):
+        archive = location
+        location = simpledialog.askstring(
+            "Save encoded image", "Enter entry name", initialvalue="image.ivc"
+        )
+        if not location:
+            return
+
+    try:
+        size = EncodedImage.save(CURRENT_IMAGE["pixel_data"], location, codec, archive)
+        messagebox.showinfo("Encoded image saved", f"Encoded image size: {size} bytes")
+    except Exception as e:
+        messagebox.showerror("Error saving file", str(e))
+
+
+def filter_large_image():
+    file_types = [("Image Files", ["*.pcx", "*.jpg", "*.jpeg", "*.png", "*.bmp"])]
+    source = filedialog.askopenfilename(
+        title="Open a large image", filetypes=file_types
+    )
+    if not source:
+        return
+
+    mode = "Filter large image"
+    try:
+        choices = [
+            "Averaging Filter",
+            "Median Filter",
+            "Highpass Filter",
+            "Unsharp Masking",
+            "Highboost Filter",
+            "Image Gradient",
+            "Geometric Mean Filter",
+            "Contraharmonic Mean Filter",
+        ]
+        choices_map = [
+            "average",
+            "median",
+            "highpass",
+            "unsharp",
+            "highboost",
+            "gradient",
+            "geometric",
+            "contraharmonic",
+        ]
+        name = ask_choice(root, mode, "Choose filter", choices, choices_map)
+        if name == None:
+            raise Exception("Cancelled operation")
+
+        # the same options process_image asks for
+        options = {}
+        if name == "highpass":
+            laplacians = [
+                "[0, 1, 0, 1, -4, 1, 0, 1, 0]",
+                "[0, -1, 0, -1, 4, -1, 0, -1, 0]",
+                "[1, 1, 1, 1, -8, 1, 1, 1, 1]",
+                "[-1, -1, -1, -1, 8, -1, -1, -1, -1]",
+            ]
+            options["filter"] = ask_choice(
+                root, mode, "Choose laplacian filter", laplacians, [1, 2, 3, 4]
+            )
+            if options["filter"] == None:
+                raise Exception("Cancelled operation")
+        if name == "highboost":
+            options["A"] = simpledialog.askfloat(
+                mode, "Enter A value", initialvalue=2, minvalue=1
+            )
+            if options["A"] == None:
+                raise Exception("Cancelled operation")
+        if name == "gradient":
+            options["mode"] = ask_choice(
+                root, mode, "Choose gradient direction", ["both", "x", "y"], [1, 2, 3]
+            )
+            if options["mode"] == None:
+                raise Exception("Cancelled operation")
+        if name == "contraharmonic":
+            # larger powers of 255 overflow the float sums of the filter
+            options["q"] = simpledialog.askfloat(
+                mode, "Enter q value", initialvalue=0, minvalue=-100, maxvalue=100
+            )
+            if options["q"] == None:
+                raise Exception("Cancelled operation")
+        if name == "geometric":
+            options["epsilon"] = ask_choice(
+                root, mode, "Choose how zero pixels count", ZERO_POLICIES, [0.0, 1.0]
+            )
+            if options["epsilon"] == None:
+                raise Exception("Cancelled operation")
+        if name in ("average", "median", "geometric", "contraharmonic"):
+            options["radius"] = simpledialog.askinteger(
+                mode, "Enter mask radius", initialvalue=1, minvalue=1
+            )
+            if options["radius"] == None:
+                raise Exception("Cancelled operation")
+
+        file_types = [("PNG", ["*.png"]), ("PCX", ["*.pcx"]), ("Raw pixels", ["*.raw"])]
+        location = filedialog.asksaveasfilename(
+            title="Save filtered image", filetypes=file_types, defaultextension=".png"
+        )
+        if not location:
+            raise Exception("Cancelled operation")
+
+        # the image goes through files next to the output instead of memory
+        runner.submit(
+            f"{choices[choices_map.index(name)]} ({os.path.basename(source)})",
+            lambda task: LargeImage.process(
+                source,
+                location,
+                name,
+                scheduler,
+                task.report,
+                os.path.dirname(location),
+                **options,
+            ),
+            lambda result: messagebox.showinfo(mode, f"Saved {location}"),
+            show_operation_error,
+        )
+    except Exception as e:
+        show_operation_error(e)
+
+
 def update_orig_image():
     global CURRENT_IMAGE, GRAYSCALE_DATA
 
     current_frame = main_notebook.nametowidget(main_notebook.select())
+    image_info = current_frame.get_parsable_image_data()
 
-    if current_frame.parsable_image_data:
-        CURRENT_IMAGE = current_frame.parsable_image_data
+    if image_info:
+        CURRENT_IMAGE = image_info
 
         main_frame.display_image(
             ImageProcessor.get_displayable_image(
@@ -164,7 +353,7 @@ def update_orig_image():
         )
         metadata_title.configure(text="Image Metadata")
         metadata_label.configure(text=CURRENT_IMAGE["metadata"])
-        if CURRENT_IMAGE["palette_data"]:
+        if CURRENT_IMAGE["palette_data"] is not None:
             palette_title.configure(text="Color Palette")
             palette_image.display_image(
                 ImageProcessor.get_displayable_palette(
@@ -179,12 +368,12 @@ def update_orig_image():
             palette_image.remove_image()
             palette_image.pack_forget()
 
-        GRAYSCALE_DATA = list(
+        GRAYSCALE_DATA = np.asarray(
             ImageProcessor.get_grayscale_image(
                 CURRENT_IMAGE["pixel_data"],
                 CURRENT_IMAGE["width"],
                 CURRENT_IMAGE["height"],
-            ).getdata()
+            )
         )
 
         main_notebook.select(0)
@@ -194,38 +383,59 @@ def update_orig_image():
         messagebox.showerror("Error", "This image is not editable")
 
 
+def get_noised_data():
+    if LAST_NOISED_DATA is None:
+        raise Exception("Perform an image degradation operation first.")
+    return LAST_NOISED_DATA
+
+
+def keep_noised_image(image):
+    global LAST_NOISED_DATA
+    LAST_NOISED_DATA = np.asarray(image)
+    return image
+
+
+def show_operation_error(error):
+    if str(error) != "Cancelled operation":
+        messagebox.showerror("Error", str(error))
+
+
 def process_image(mode):
-    current_frame = main_notebook.nametowidget(main_notebook.select())
+    # dialogs are answered here, and the operation itself is queued on the
+    # worker thread with the image it was asked for
     try:
         if not CURRENT_IMAGE:
             raise Exception("Load an image first")
 
+        current_image = CURRENT_IMAGE
         image_data = CURRENT_IMAGE["pixel_data"]
         grayscale_data = GRAYSCALE_DATA
         width = CURRENT_IMAGE["width"]
         height = CURRENT_IMAGE["height"]
-        global LAST_NOISED_DATA
         info = None
-        current_frame.start_loading()
 
         match mode:
             case "Red Channel":
-                image = ImageProcessor.show_color_channel_images(
+                operation = lambda task: ImageProcessor.show_color_channel_images(
                     image_data, width, height, "red"
                 )
             case "Green Channel":
-                image = ImageProcessor.show_color_channel_images(
+                operation = lambda task: ImageProcessor.show_color_channel_images(
                     image_data, width, height, "green"
                 )
             case "Blue Channel":
-                image = ImageProcessor.show_color_channel_images(
+                operation = lambda task: ImageProcessor.show_color_channel_images(
                     image_data, width, height, "blue"
                 )
             case "Grayscale Transform":
-                image = ImageProcessor.get_grayscale_image(image_data, width, height)
+                operation = lambda task: ImageProcessor.get_grayscale_image(
+                    image_data, width, height
+                )
                 info = "Transformation function: (r + g + b) / 3"
             case "Negative Transform":
-                image = ImageProcessor.get_negative_image(grayscale_data, width, height)
+                operation = lambda task: ImageProcessor.get_negative_image(
+                    grayscale_data, width, height
+                )
             case "Black and White Transform":
                 threshold = simpledialog.askinteger(
                     mode,
@@ -236,7 +446,7 @@ def process_image(mode):
                 )
                 if threshold == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor.get_black_and_white_image(
+                operation = lambda task: ImageProcessor.get_black_and_white_image(
                     grayscale_data, width, height, threshold
                 )
                 info = f"Threshold Value: {threshold}"
@@ -246,32 +456,40 @@ def process_image(mode):
                 )
                 if gamma == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor.get_gamma_transformed_image(
+                operation = lambda task: ImageProcessor.get_gamma_transformed_image(
                     grayscale_data, width, height, gamma
                 )
                 info = f"Gamma: {gamma}"
             case "Averaging Filter":
-                choices = ["3x3", "5x5", "7x7", "9x9"]
-                choices_map = [1, 2, 3, 4]
+                choices = ["3x3", "5x5", "7x7", "9x9", "Custom"]
+                choices_map = [1, 2, 3, 4, 0]
                 radius = ask_choice(
                     root, mode, "Choose mask size", choices, choices_map
                 )
+                if radius == 0:
+                    radius = simpledialog.askinteger(
+                        mode, "Enter mask radius", initialvalue=5, minvalue=1
+                    )
                 if radius == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor().get_average_filtered_image(
-                    grayscale_data, width, height, radius
+                operation = lambda task: scheduler.filter(
+                    "average", grayscale_data, task.report, radius=radius
                 )
                 info = f"Mask: {2*radius+1}x{2*radius+1}"
             case "Median Filter":
-                choices = ["3x3", "5x5", "7x7", "9x9"]
-                choices_map = [1, 2, 3, 4]
+                choices = ["3x3", "5x5", "7x7", "9x9", "Custom"]
+                choices_map = [1, 2, 3, 4, 0]
                 radius = ask_choice(
                     root, mode, "Choose mask size", choices, choices_map
                 )
+                if radius == 0:
+                    radius = simpledialog.askinteger(
+                        mode, "Enter mask radius", initialvalue=5, minvalue=1
+                    )
                 if radius == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor().get_median_filtered_image(
-                    grayscale_data, width, height, radius
+                operation = lambda task: scheduler.filter(
+                    "median", grayscale_data, task.report, radius=radius
                 )
                 info = f"Mask: {2*radius+1}x{2*radius+1}"
             case "Highpass Filter":
@@ -287,13 +505,13 @@ def process_image(mode):
                 )
                 if filter == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor().get_highpass_filtered_image(
-                    grayscale_data, width, height, filter
+                operation = lambda task: scheduler.filter(
+                    "highpass", grayscale_data, task.report, filter=filter
                 )
                 info = f"Filter used: {choices[choices_map.index(filter)]}"
             case "Unsharp Masking":
-                image = ImageProcessor().get_unsharp_masked_image(
-                    grayscale_data, width, height
+                operation = lambda task: scheduler.filter(
+                    "unsharp", grayscale_data, task.report
                 )
             case "Highboost Filter":
                 a = simpledialog.askfloat(
@@ -301,8 +519,8 @@ def process_image(mode):
                 )
                 if a == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor().get_highboost_filtered_image(
-                    grayscale_data, width, height, a
+                operation = lambda task: scheduler.filter(
+                    "highboost", grayscale_data, task.report, A=a
                 )
                 info = f"A: {a}"
             case "Image Gradient":
@@ -313,8 +531,8 @@ def process_image(mode):
                 )
                 if direction == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor().get_image_gradient(
-                    grayscale_data, width, height, direction
+                operation = lambda task: scheduler.filter(
+                    "gradient", grayscale_data, task.report, mode=direction
                 )
                 info = f"Gradient direction: {choices[choices_map.index(direction)]}"
             case "Salt and Pepper Noise":
@@ -327,352 +545,434 @@ def process_image(mode):
                 )
                 if probability == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor.apply_salt_pepper(
-                    grayscale_data, width, height, probability
+                operation = lambda task: keep_noised_image(
+                    ImageProcessor.apply_salt_pepper(
+                        grayscale_data, width, height, probability
+                    )
                 )
                 info = f"Salt and pepper probability: {probability}"
-                LAST_NOISED_DATA = list(image.getdata())
             case "Gaussian Noise":
-                image = ImageProcessor.apply_gaussian(grayscale_data, width, height)
-                LAST_NOISED_DATA = list(image.getdata())
+                operation = lambda task: keep_noised_image(
+                    ImageProcessor.apply_gaussian(grayscale_data, width, height)
+                )
             case "Erlang Noise":
-                image = ImageProcessor.apply_erlang(grayscale_data, width, height)
-                LAST_NOISED_DATA = list(image.getdata())
+                operation = lambda task: keep_noised_image(
+                    ImageProcessor.apply_erlang(grayscale_data, width, height)
+                )
             case "Geometric Mean Filter":
-                if not LAST_NOISED_DATA:
-                    raise Exception("Perform an image degradation operation first.")
-                image = ImageProcessor().add_geometric_filter(
-                    width, height, LAST_NOISED_DATA
+                # queued degradations have not set the noised data yet
+                if not runner.pending:
+                    get_noised_data()
+                choices = ["3x3", "5x5", "7x7", "9x9", "Custom"]
+                choices_map = [1, 2, 3, 4, 0]
+                radius = ask_choice(
+                    root, mode, "Choose mask size", choices, choices_map
                 )
+                if radius == 0:
+                    radius = simpledialog.askinteger(
+                        mode, "Enter mask radius", initialvalue=5, minvalue=1
+                    )
+                if radius == None:
+                    raise Exception("Cancelled operation")
+                epsilon = ask_choice(
+                    root, mode, "Choose how zero pixels count", ZERO_POLICIES, [0.0, 1.0]
+                )
+                if epsilon == None:
+                    raise Exception("Cancelled operation")
+                operation = lambda task: scheduler.filter(
+                    "geometric",
+                    get_noised_data(),
+                    task.report,
+                    radius=radius,
+                    epsilon=epsilon,
+                )
+                info = f"Mask: {2*radius+1}x{2*radius+1}, Epsilon: {epsilon}"
             case "Contraharmonic Mean Filter":
-                if not LAST_NOISED_DATA:
-                    raise Exception("Perform an image degradation operation first.")
-                q = simpledialog.askfloat(mode, "Enter q value", initialvalue=0)
+                # queued degradations have not set the noised data yet
+                if not runner.pending:
+                    get_noised_data()
+                # larger powers of 255 overflow the float sums of the filter
+                q = simpledialog.askfloat(
+                    mode, "Enter q value", initialvalue=0, minvalue=-100, maxvalue=100
+                )
                 if q == None:
                     raise Exception("Cancelled operation")
-                image = ImageProcessor().add_contraharmonic(
-                    width, height, LAST_NOISED_DATA, q
+                choices = ["3x3", "5x5", "7x7", "9x9", "Custom"]
+                choices_map = [1, 2, 3, 4, 0]
+                radius = ask_choice(
+                    root, mode, "Choose mask size", choices, choices_map
+                )
+                if radius == 0:
+                    radius = simpledialog.askinteger(
+                        mode, "Enter mask radius", initialvalue=5, minvalue=1
+                    )
+                if radius == None:
+                    raise Exception("Cancelled operation")
+                operation = lambda task: scheduler.filter(
+                    "contraharmonic", get_noised_data(), task.report, q=q, radius=radius
                 )
-                info = f"q value: {q}"
+                info = f"q value: {q}, Mask: {2*radius+1}x{2*radius+1}"
             case "Order-Statistics Filter":
-                if not LAST_NOISED_DATA:
-                    raise Exception("Perform an image degradation operation first.")
-                image = ImageProcessor().get_median_filtered_image(
-                    LAST_NOISED_DATA, width, height
+                # queued degradations have not set the noised data yet
+                if not runner.pending:
+                    get_noised_data()
+                operation = lambda task: scheduler.filter(
+                    "median", get_noised_data(), task.report
                 )
                 info = "Filter used: 3x3 median filter"
             case "Run-length Encoding":
-                rle_data, palette, size_info = ImageProcessor.run_length_encoding(
-                    image_data
-                )
-                image = ImageProcessor.run_length_decode(
-                    rle_data, palette, width, height
-                )
-                orig_info = ImageProcessor.get_uncompressed_image_size(image_data)
-                info = "Uncompressed Image Information\n"
-                info += f"Image size: {orig_info["image size"]} bytes\n"
-                info += f"Palette size: {orig_info["palette size"]} bytes\n"
-                info += "\nRun-length Encoded Image Information\n"
-                info += f"Image size: {size_info["image size"]} bytes\n"
-                info += f"Palette size: {size_info["palette size"]} bytes\n"
-                info += "\nCompression Ratio\n"
-                info += f"Image data only: {orig_info["image size"] / size_info["image size"]}"
-                info += f"\nImage data and palette info: {(orig_info["image size"] + orig_info["palette size"]) / (size_info["image size"] + size_info["palette size"])}"
+                def operation(task):
+                    nonlocal info
+                    rle_data, palette, size_info = ImageProcessor.run_length_encoding(
+                        image_data
+                    )
+                    image = ImageProcessor.run_length_decode(
+                        rle_data, palette, width, height
+                    )
+                    task.report(1, 3)
+                    if "uncompressed size" not in current_image:
+                        current_image["uncompressed size"] = (
+                            ImageProcessor.get_uncompressed_image_size(image_data)
+                        )
+                    orig_info = current_image["uncompressed size"]
+                    info = "Uncompressed Image Information\n"
+                    info += f"Image size: {orig_info["image size"]} bytes\n"
+                    info += f"Palette size: {orig_info["palette size"]} bytes\n"
+                    info += "\nRun-length Encoded Image Information\n"
+                    info += f"Image size: {size_info["image size"]} bytes\n"
+                    info += f"Palette size: {size_info["palette size"]} bytes\n"
+                    info += "\nCompression Ratio\n"
+                    info += f"Image data only: {orig_info["image size"] / size_info["image size"]}"
+                    info += f"\nImage data and palette info: {(orig_info["image size"] + orig_info["palette size"]) / (size_info["image size"] + size_info["palette size"])}"
+                    task.report(2, 3)
+                    encoded_size = EncodedImage.encode(image_data, io.BytesIO(), "rle")
+                    info += f"\n\nEncoded file size: {encoded_size} bytes"
+                    info += f"\nOn-disk compression ratio: {width * height * 3 / encoded_size}"
+                    return image
             case "Huffman Coding":
-                huffman_data, huffman_codes, size_info = ImageProcessor.huffman_coding(
-                    image_data
-                )
-                image = ImageProcessor.huffman_decode(
-                    huffman_data, huffman_codes, width, height
-                )
-                orig_info = ImageProcessor.get_uncompressed_image_size(image_data)
-                info = "Uncompressed Image Information\n"
-                info += f"Image size: {orig_info["image size"]} bytes\n"
-                info += f"Palette size: {orig_info["palette size"]} bytes\n"
-                info += "\nHuffman Coded Image Information\n"
-                info += f"Image size: {size_info["image size"]} bytes\n"
-                info += f"Huffman codes size: {size_info["huffman codes size"]} bytes\n"
-                info += "\nCompression Ratio\n"
-                info += f"Image data only: {orig_info["image size"] / size_info["image size"]}"
-                info += f"\nImage data and huffman codes: {(orig_info["image size"] + orig_info["palette size"]) / (size_info["image size"] + size_info["huffman codes size"])}"
+                def operation(task):
+                    nonlocal info
+                    huffman_data, huffman_codes, size_info = ImageProcessor.huffman_coding(
+                        image_data
+                    )
+                    image = ImageProcessor.huffman_decode(
+                        huffman_data, huffman_codes, width, height
+                    )
+                    task.report(1, 3)
+                    if "uncompressed size" not in current_image:
+                        current_image["uncompressed size"] = (
+                            ImageProcessor.get_uncompressed_image_size(image_data)
+                        )
+                    orig_info = current_image["uncompressed size"]
+                    info = "Uncompressed Image Information\n"
+                    info += f"Image size: {orig_info["image size"]} bytes\n"
+                    info += f"Palette size: {orig_info["palette size"]} bytes\n"
+                    info += "\nHuffman Coded Image Information\n"
+                    info += f"Image size: {size_info["image size"]} bytes\n"
+                    info += f"Huffman codes size: {size_info["huffman codes size"]} bytes\n"
+                    info += "\nCompression Ratio\n"
+                    info += f"Image data only: {orig_info["image size"] / size_info["image size"]}"
+                    info += f"\nImage data and huffman codes: {(orig_info["image size"] + orig_info["palette size"]) / (size_info["image size"] + size_info["huffman codes size"])}"
+                    task.report(2, 3)
+                    encoded_size = EncodedImage.encode(image_data, io.BytesIO(), "huffman")
+                    info += f"\n\nEncoded file size: {encoded_size} bytes"
+                    info += f"\nOn-disk compression ratio: {width * height * 3 / encoded_size}"
+                    return image
 
             case _:
-                current_frame.stop_loading()
                 return
 
-        current_frame.stop_loading()
-        new_frame = ImageFrame(main_notebook, title=mode, info=info)
-        new_frame.pack(fill="both", expand=True)
-        if len(main_notebook.tabs()) >= 5:
-            main_notebook.forget(1)
-        main_notebook.add(new_frame, text=mode)
-        main_notebook.select(new_frame)
-        new_frame.display_image(image)
+        def show_result(image):
+            new_frame = ImageFrame(main_notebook, title=mode, info=info)
+            new_frame.pack(fill="both", expand=True)
+            if len(main_notebook.tabs()) >= 5:
+                main_notebook.forget(1)
+            main_notebook.add(new_frame, text=mode)
+            main_notebook.select(new_frame)
+            new_frame.display_image(image)
+
+        runner.submit(mode, operation, show_result, show_operation_error)
     except Exception as e:
-        current_frame.stop_loading()
-        if str(e) != "Cancelled operation":
-            messagebox.showerror("Error", str(e))
+        show_operation_error(e)
 
 
 ########## PLACEMENT OF UI ELEMENTS ##########
 
-# setup the root of the app
-root = tk.Tk()
-root.title("Image Processing App")
-root.geometry("1280x720")
-root.state("zoomed")
-
-# configure styling
-# ttk.Style().configure("TFrame", background="#121212")
-
-##### setup menu buttons
-menubar = tk.Menu(root)
-root.config(menu=menubar)
-
-# File menu to open images
-file_menu = tk.Menu(menubar, tearoff=False)
-file_menu.add_command(label="Open image", command=open_file, accelerator="Ctrl+O")
-menubar.add_cascade(label="File", menu=file_menu)
-
-# menu button for batch processing
-batch_menu = tk.Menu(menubar, tearoff=False)
-batch_menu.add_command(label="Compress folder images", command=open_folder, accelerator="Ctrl+F")
-batch_menu.add_checkbutton(label="Edit current image", command=update_orig_image, accelerator="Ctrl+U")
-menubar.add_cascade(label="Batch Processing", menu=batch_menu)
-
-menubar.add_command(label="About...", command=show_about)
-
-
-##### setup main frame
-main_notebook = ttk.Notebook(root)
-main_notebook.pack(side="left", fill="both", expand=True)
-
-main_frame = ImageFrame(main_notebook, closable=False)
-main_frame.pack(fill="both", expand=True)
-
-main_notebook.add(main_frame, text="Original")
-
-##### setup sidebar frame
-sidebar = ttk.Notebook(root, width=200)
-sidebar.pack(side="right", fill="y")
-
-buttons_frame = ttk.Frame(sidebar, relief="solid", padding=10)
-buttons_frame.pack(fill="both", expand=True)
-metadata_frame = ttk.Frame(sidebar, relief="solid", padding=10)
-metadata_frame.pack(fill="both", expand=True)
-
-sidebar.add(buttons_frame, text="Edit")
-sidebar.add(metadata_frame, text="Metadata")
-
-# setup sidebar buttons
-# color buttons
-dark_btn_icon = IvpBtnIcon.black()
-color_btn_label = ttk.Label(buttons_frame, text="Color Channels")
-red_btn_icon = IvpBtnIcon.red()
-red_btn = ToolTipButton(
-    buttons_frame,
-    image=red_btn_icon,
-    tooltip="Red Channel",
-    command=lambda: process_image("Red Channel"),
-)
-green_btn_icon = IvpBtnIcon.green()
-green_btn = ToolTipButton(
-    buttons_frame,
-    image=green_btn_icon,
-    tooltip="Green Channel",
-    command=lambda: process_image("Green Channel"),
-)
-blue_btn_icon = IvpBtnIcon.blue()
-blue_btn = ToolTipButton(
-    buttons_frame,
-    image=blue_btn_icon,
-    tooltip="Blue Channel",
-    command=lambda: process_image("Blue Channel"),
-)
-# image transform buttons
-img_trans_label = ttk.Label(buttons_frame, text="Image Transformation")
-gray_btn_icon = IvpBtnIcon.grayscale()
-gray_btn = ToolTipButton(
-    buttons_frame,
-    image=gray_btn_icon,
-    tooltip="Grayscale Transform",
-    command=lambda: process_image("Grayscale Transform"),
-)
-neg_btn_icon = IvpBtnIcon.black()
-neg_btn = ToolTipButton(
-    buttons_frame,
-    image=neg_btn_icon,
-    tooltip="Negative Transform",
-    text="+/-",
-    command=lambda: process_image("Negative Transform"),
-)
-bnw_btn_icon = IvpBtnIcon.black_and_white()
-bnw_btn = ToolTipButton(
-    buttons_frame,
-    image=bnw_btn_icon,
-    tooltip="Black and White Transform",
-    command=lambda: process_image("Black and White Transform"),
-)
-gamma_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Gamma Transform",
-    text="γ",
-    command=lambda: process_image("Gamma Transform"),
-)
-# spatial filter buttons
-filter_label = ttk.Label(buttons_frame, text="Spatial Filtering")
-ave_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Averaging Filter",
-    text="x̄",
-    command=lambda: process_image("Averaging Filter"),
-)
-med_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Median Filter",
-    text="x͂",
-    command=lambda: process_image("Median Filter"),
-)
-hipass_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Highpass Filter",
-    text="HI",
-    command=lambda: process_image("Highpass Filter"),
-)
-unsharp_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Unsharp Masking",
-    text="U",
-    command=lambda: process_image("Unsharp Masking"),
-)
-hiboost_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Highboost Filter",
-    text="HB",
-    command=lambda: process_image("Highboost Filter"),
-)
-gradient_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Image Gradient",
-    text="G",
-    command=lambda: process_image("Image Gradient"),
-)
-# image degradation buttons
-img_deg_label = ttk.Label(buttons_frame, text="Image Degradation")
-salt_pepper_btn_icon = IvpBtnIcon.salt_and_pepper()
-salt_pepper_btn = ToolTipButton(
-    buttons_frame,
-    image=salt_pepper_btn_icon,
-    tooltip="Salt and Pepper Noise",
-    command=lambda: process_image("Salt and Pepper Noise"),
-)
-gauss_btn_icon = IvpBtnIcon.gauss()
-gauss_btn = ToolTipButton(
-    buttons_frame,
-    image=gauss_btn_icon,
-    tooltip="Gaussian Noise",
-    command=lambda: process_image("Gaussian Noise"),
-)
-erlang_btn_icon = IvpBtnIcon.erlang()
-erlang_btn = ToolTipButton(
-    buttons_frame,
-    image=erlang_btn_icon,
-    tooltip="Erlang Noise",
-    command=lambda: process_image("Erlang Noise"),
-)
-# image restoration buttons
-img_res_label = ttk.Label(buttons_frame, text="Image Restoration")
-geometric_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Geometric Mean Filter",
-    text="Π",
-    command=lambda: process_image("Geometric Mean Filter"),
-)
-contraharm_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Contraharmonic Mean Filter",
-    text="Σ/Σ",
-    command=lambda: process_image("Contraharmonic Mean Filter"),
-)
-ordstat_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Order-Statistics Filter",
-    text="x͂",
-    command=lambda: process_image("Order-Statistics Filter"),
-)
-# image compression buttons
-img_comp_label = ttk.Label(buttons_frame, text="Image Compression")
-rle_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Run-length Encoding",
-    text="RLE",
-    command=lambda: process_image("Run-length Encoding"),
-)
-huffman_btn = ToolTipButton(
-    buttons_frame,
-    image=dark_btn_icon,
-    tooltip="Huffman Coding",
-    text="HC",
-    command=lambda: process_image("Huffman Coding"),
-)
-
-# display the sidebar elements
-pady = 2
-color_btn_label.grid(column=0, row=0, columnspan=3, pady=5, sticky="w")
-red_btn.grid(column=0, row=1, padx=5, pady=pady)
-green_btn.grid(column=1, row=1, padx=5, pady=pady)
-blue_btn.grid(column=2, row=1, padx=5, pady=pady)
-img_trans_label.grid(column=0, row=2, columnspan=3, pady=5, sticky="w")
-gray_btn.grid(column=0, row=3, padx=5, pady=pady)
-neg_btn.grid(column=1, row=3, padx=5, pady=pady)
-bnw_btn.grid(column=2, row=3, padx=5, pady=pady)
-gamma_btn.grid(column=0, row=4, padx=5, pady=pady)
-filter_label.grid(column=0, row=5, columnspan=3, pady=5, sticky="w")
-ave_btn.grid(column=0, row=6, padx=5, pady=pady)
-med_btn.grid(column=1, row=6, padx=5, pady=pady)
-hipass_btn.grid(column=2, row=6, padx=5, pady=pady)
-unsharp_btn.grid(column=0, row=7, padx=5, pady=pady)
-hiboost_btn.grid(column=1, row=7, padx=5, pady=pady)
-gradient_btn.grid(column=2, row=7, padx=5, pady=pady)
-img_deg_label.grid(column=0, row=8, columnspan=3, pady=5, sticky="w")
-salt_pepper_btn.grid(column=0, row=9, padx=5, pady=pady)
-gauss_btn.grid(column=1, row=9, padx=5, pady=pady)
-erlang_btn.grid(column=2, row=9, padx=5, pady=pady)
-img_res_label.grid(column=0, row=10, columnspan=3, pady=5, sticky="w")
-geometric_btn.grid(column=0, row=11, padx=5, pady=pady)
-contraharm_btn.grid(column=1, row=11, padx=5, pady=pady)
-ordstat_btn.grid(column=2, row=11, padx=5, pady=pady)
-img_comp_label.grid(column=0, row=12, columnspan=3, pady=5, sticky="w")
-rle_btn.grid(column=0, row=13, padx=5, pady=pady)
-huffman_btn.grid(column=1, row=13, padx=5, pady=pady)
-
-# setup metadata elements
-metadata_title = ttk.Label(metadata_frame, text="Open an image first")
-metadata_label = ttk.Label(metadata_frame, wraplength=170)
-palette_title = ttk.Label(metadata_frame)
-palette_image = ImageFrame(metadata_frame, closable=False)
-metadata_title.pack(anchor="nw")
-metadata_label.pack(anchor="nw", pady=(10, 25))
-palette_title.pack(anchor="nw")
-
-# setup keyboard shortcuts
-root.bind("<Control-o>", lambda event: open_file())
-root.bind("<Control-O>", lambda event: open_file())
-root.bind("<Control-f>", lambda event: open_folder())
-root.bind("<Control-F>", lambda event: open_folder())
-root.bind("<Control-u>", lambda event: update_orig_image())
-root.bind("<Control-U>", lambda event: update_orig_image())
-
-# start app
-root.mainloop()
+if __name__ == "__main__":
+    # setup the root of the app
+    root = tk.Tk()
+    root.title("Image Processing App")
+    root.geometry("1280x720")
+    root.state("zoomed")
+
+    # configure styling
+    # ttk.Style().configure("TFrame", background="#121212")
+
+    ##### setup menu buttons
+    menubar = tk.Menu(root)
+    root.config(menu=menubar)
+
+    # File menu to open images
+    file_menu = tk.Menu(menubar, tearoff=False)
+    file_menu.add_command(label="Open image", command=open_file, accelerator="Ctrl+O")
+    file_menu.add_command(
+        label="Save encoded image", command=save_encoded_image, accelerator="Ctrl+S"
+    )
+    menubar.add_cascade(label="File", menu=file_menu)
+
+    # menu button for batch processing
+    batch_menu = tk.Menu(menubar, tearoff=False)
+    batch_menu.add_command(label="Compress folder images", command=open_folder, accelerator="Ctrl+F")
+    batch_menu.add_checkbutton(label="Edit current image", command=update_orig_image, accelerator="Ctrl+U")
+    batch_menu.add_command(label="Filter large image", command=filter_large_image)
+    menubar.add_cascade(label="Batch Processing", menu=batch_menu)
+
+    menubar.add_command(label="About...", command=show_about)
+
+
+    ##### setup status bar of queued operations
+    status_bar = TaskStatusBar(root)
+    status_bar.pack(side="bottom", fill="x")
+    runner = TaskRunner(root, on_update=status_bar.update_status)
+    # worker processes import this script again where they are spawned, which is
+    # why the UI is only built when it runs as the main script
+    scheduler = TileScheduler(processes=True)
+
+    ##### setup main frame
+    main_notebook = ttk.Notebook(root)
+    main_notebook.pack(side="left", fill="both", expand=True)
+
+    main_frame = ImageFrame(main_notebook, closable=False)
+    main_frame.pack(fill="both", expand=True)
+
+    main_notebook.add(main_frame, text="Original")
+    main_notebook.bind("<<NotebookTabChanged>>", show_selected_tab)
+
+    ##### setup sidebar frame
+    sidebar = ttk.Notebook(root, width=200)
+    sidebar.pack(side="right", fill="y")
+
+    buttons_frame = ttk.Frame(sidebar, relief="solid", padding=10)
+    buttons_frame.pack(fill="both", expand=True)
+    metadata_frame = ttk.Frame(sidebar, relief="solid", padding=10)
+    metadata_frame.pack(fill="both", expand=True)
+
+    sidebar.add(buttons_frame, text="Edit")
+    sidebar.add(metadata_frame, text="Metadata")
+
+    # setup sidebar buttons
+    # color buttons
+    dark_btn_icon = IvpBtnIcon.black()
+    color_btn_label = ttk.Label(buttons_frame, text="Color Channels")
+    red_btn_icon = IvpBtnIcon.red()
+    red_btn = ToolTipButton(
+        buttons_frame,
+        image=red_btn_icon,
+        tooltip="Red Channel",
+        command=lambda: process_image("Red Channel"),
+    )
+    green_btn_icon = IvpBtnIcon.green()
+    green_btn = ToolTipButton(
+        buttons_frame,
+        image=green_btn_icon,
+        tooltip="Green Channel",
+        command=lambda: process_image("Green Channel"),
+    )
+    blue_btn_icon = IvpBtnIcon.blue()
+    blue_btn = ToolTipButton(
+        buttons_frame,
+        image=blue_btn_icon,
+        tooltip="Blue Channel",
+        command=lambda: process_image("Blue Channel"),
+    )
+    # image transform buttons
+    img_trans_label = ttk.Label(buttons_frame, text="Image Transformation")
+    gray_btn_icon = IvpBtnIcon.grayscale()
+    gray_btn = ToolTipButton(
+        buttons_frame,
+        image=gray_btn_icon,
+        tooltip="Grayscale Transform",
+        command=lambda: process_image("Grayscale Transform"),
+    )
+    neg_btn_icon = IvpBtnIcon.black()
+    neg_btn = ToolTipButton(
+        buttons_frame,
+        image=neg_btn_icon,
+        tooltip="Negative Transform",
+        text="+/-",
+        command=lambda: process_image("Negative Transform"),
+    )
+    bnw_btn_icon = IvpBtnIcon.black_and_white()
+    bnw_btn = ToolTipButton(
+        buttons_frame,
+        image=bnw_btn_icon,
+        tooltip="Black and White Transform",
+        command=lambda: process_image("Black and White Transform"),
+    )
+    gamma_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Gamma Transform",
+        text="γ",
+        command=lambda: process_image("Gamma Transform"),
+    )
+    # spatial filter buttons
+    filter_label = ttk.Label(buttons_frame, text="Spatial Filtering")
+    ave_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Averaging Filter",
+        text="x̄",
+        command=lambda: process_image("Averaging Filter"),
+    )
+    med_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Median Filter",
+        text="x͂",
+        command=lambda: process_image("Median Filter"),
+    )
+    hipass_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Highpass Filter",
+        text="HI",
+        command=lambda: process_image("Highpass Filter"),
+    )
+    unsharp_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Unsharp Masking",
+        text="U",
+        command=lambda: process_image("Unsharp Masking"),
+    )
+    hiboost_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Highboost Filter",
+        text="HB",
+        command=lambda: process_image("Highboost Filter"),
+    )
+    gradient_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Image Gradient",
+        text="G",
+        command=lambda: process_image("Image Gradient"),
+    )
+    # image degradation buttons
+    img_deg_label = ttk.Label(buttons_frame, text="Image Degradation")
+    salt_pepper_btn_icon = IvpBtnIcon.salt_and_pepper()
+    salt_pepper_btn = ToolTipButton(
+        buttons_frame,
+        image=salt_pepper_btn_icon,
+        tooltip="Salt and Pepper Noise",
+        command=lambda: process_image("Salt and Pepper Noise"),
+    )
+    gauss_btn_icon = IvpBtnIcon.gauss()
+    gauss_btn = ToolTipButton(
+        buttons_frame,
+        image=gauss_btn_icon,
+        tooltip="Gaussian Noise",
+        command=lambda: process_image("Gaussian Noise"),
+    )
+    erlang_btn_icon = IvpBtnIcon.erlang()
+    erlang_btn = ToolTipButton(
+        buttons_frame,
+        image=erlang_btn_icon,
+        tooltip="Erlang Noise",
+        command=lambda: process_image("Erlang Noise"),
+    )
+    # image restoration buttons
+    img_res_label = ttk.Label(buttons_frame, text="Image Restoration")
+    geometric_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Geometric Mean Filter",
+        text="Π",
+        command=lambda: process_image("Geometric Mean Filter"),
+    )
+    contraharm_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Contraharmonic Mean Filter",
+        text="Σ/Σ",
+        command=lambda: process_image("Contraharmonic Mean Filter"),
+    )
+    ordstat_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Order-Statistics Filter",
+        text="x͂",
+        command=lambda: process_image("Order-Statistics Filter"),
+    )
+    # image compression buttons
+    img_comp_label = ttk.Label(buttons_frame, text="Image Compression")
+    rle_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Run-length Encoding",
+        text="RLE",
+        command=lambda: process_image("Run-length Encoding"),
+    )
+    huffman_btn = ToolTipButton(
+        buttons_frame,
+        image=dark_btn_icon,
+        tooltip="Huffman Coding",
+        text="HC",
+        command=lambda: process_image("Huffman Coding"),
+    )
+
+    # display the sidebar elements
+    pady = 2
+    color_btn_label.grid(column=0, row=0, columnspan=3, pady=5, sticky="w")
+    red_btn.grid(column=0, row=1, padx=5, pady=pady)
+    green_btn.grid(column=1, row=1, padx=5, pady=pady)
+    blue_btn.grid(column=2, row=1, padx=5, pady=pady)
+    img_trans_label.grid(column=0, row=2, columnspan=3, pady=5, sticky="w")
+    gray_btn.grid(column=0, row=3, padx=5, pady=pady)
+    neg_btn.grid(column=1, row=3, padx=5, pady=pady)
+    bnw_btn.grid(column=2, row=3, padx=5, pady=pady)
+    gamma_btn.grid(column=0, row=4, padx=5, pady=pady)
+    filter_label.grid(column=0, row=5, columnspan=3, pady=5, sticky="w")
+    ave_btn.grid(column=0, row=6, padx=5, pady=pady)
+    med_btn.grid(column=1, row=6, padx=5, pady=pady)
+    hipass_btn.grid(column=2, row=6, padx=5, pady=pady)
+    unsharp_btn.grid(column=0, row=7, padx=5, pady=pady)
+    hiboost_btn.grid(column=1, row=7, padx=5, pady=pady)
+    gradient_btn.grid(column=2, row=7, padx=5, pady=pady)
+    img_deg_label.grid(column=0, row=8, columnspan=3, pady=5, sticky="w")
+    salt_pepper_btn.grid(column=0, row=9, padx=5, pady=pady)
+    gauss_btn.grid(column=1, row=9, padx=5, pady=pady)
+    erlang_btn.grid(column=2, row=9, padx=5, pady=pady)
+    img_res_label.grid(column=0, row=10, columnspan=3, pady=5, sticky="w")
+    geometric_btn.grid(column=0, row=11, padx=5, pady=pady)
+    contraharm_btn.grid(column=1, row=11, padx=5, pady=pady)
+    ordstat_btn.grid(column=2, row=11, padx=5, pady=pady)
+    img_comp_label.grid(column=0, row=12, columnspan=3, pady=5, sticky="w")
+    rle_btn.grid(column=0, row=13, padx=5, pady=pady)
+    huffman_btn.grid(column=1, row=13, padx=5, pady=pady)
+
+    # setup metadata elements
+    metadata_title = ttk.Label(metadata_frame, text="Open an image first")
+    metadata_label = ttk.Label(metadata_frame, wraplength=170)
+    palette_title = ttk.Label(metadata_frame)
+    palette_image = ImageFrame(metadata_frame, closable=False)
+    metadata_title.pack(anchor="nw")
+    metadata_label.pack(anchor="nw", pady=(10, 25))
+    palette_title.pack(anchor="nw")
+
+    # setup keyboard shortcuts
+    root.bind("<Control-o>", lambda event: open_file())
+    root.bind("<Control-O>", lambda event: open_file())
+    root.bind("<Control-s>", lambda event: save_encoded_image())
+    root.bind("<Control-S>", lambda event: save_encoded_image())
+    root.bind("<Control-f>", lambda event: open_folder())
+    root.bind("<Control-F>", lambda event: open_folder())
+    root.bind("<Control-u>", lambda event: update_orig_image())
+    root.bind("<Control-U>", lambda event: update_orig_image())
+    root.bind("<Escape>", lambda event: runner.cancel_current())
+
+    # start app
+    root.mainloop()
+    scheduler.close()
@@ -0,0 +1,105 @@
+from utils.encoded_image import EncodedImage, EncodedImageHeader, EncodedImageReader
+from utils.image_parser import ImageParser
+from zipfile import ZipFile
+import io
+import numpy as np
+import pytest
+
+codecs = list(EncodedImageHeader.codecs)
+
+
+def get_images() -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(4)
+    palette = rng.integers(0, 256, (30, 3), dtype=np.uint8)
+    runs = np.repeat(rng.integers(0, 30, 400), rng.integers(1, 40, 400))
+
+    return {
+        "runs": palette[runs[: len(runs) // 53 * 53].reshape(-1, 53)],
+        "noise": rng.integers(0, 256, (21, 34, 3), dtype=np.uint8),
+        "single color": np.full((6, 5, 3), 200, dtype=np.uint8),
+        "1x1": np.array([[[4, 5, 6]]], dtype=np.uint8),
+    }
+
+
+def encode(image_data, codec, chunk_pixels=None) -> bytes:
+    file = io.BytesIO()
+    size = EncodedImage.encode(image_data, file, codec, chunk_pixels)
+    assert size == len(file.getvalue())
+
+    return file.getvalue()
+
+
+@pytest.mark.parametrize("codec", codecs)
+@pytest.mark.parametrize("name", list(get_images()))
+@pytest.mark.parametrize("chunk_pixels", [None, 1, 7, 53])
+def test_round_trip(codec, name, chunk_pixels):
+    image_data = get_images()[name]
+
+    data = encode(image_data, codec, chunk_pixels)
+    reader = EncodedImageReader(io.BytesIO(data))
+
+    assert reader.codec == codec
+    assert (reader.width, reader.height) == image_data.shape[1::-1]
+    assert np.array_equal(reader.read_image(), image_data)
+
+
+@pytest.mark.parametrize("codec", codecs)
+def test_save_and_load(tmp_path, codec):
+    image_data = get_images()["runs"]
+    location = str(tmp_path / f"image{EncodedImage.extension}")
+
+    size = EncodedImage.save(image_data, location, codec)
+    image_info = ImageParser.parse_image(location)
+
+    assert size == (tmp_path / f"image{EncodedImage.extension}").stat().st_size
+    assert image_info["width"] == 53
+    assert np.array_equal(image_info["pixel_data"], image_data)
+    assert f"Colors: {len(np.unique(image_data.reshape(-1, 3), axis=0))}" in (
+        image_info["metadata"]
+    )
+
+
+@pytest.mark.parametrize("codec", codecs)
+def test_truncated_file(codec):
+    data = encode(get_images()["noise"], codec, 100)
+
+    for size in [0, 5, EncodedImageHeader.layout.size, 200, len(data) // 2]:
+        with pytest.raises(Exception, match="File is truncated"):
+            EncodedImageReader(io.BytesIO(data[:size])).read_image()
+    # only the end marker is missing
+    with pytest.raises(Exception, match="File is truncated"):
+        EncodedImage.load("image.ivc", data=data[:-1])
+
+
+@pytest.mark.parametrize(
+    "offset, value, message",
+    [
+        (0, b"X", "Unsupported file format"),
+        (4, b"\x02", "Unsupported file format"),
+        (5, b"\x02", "Unknown codec 2"),
+    ],
+)
+def test_bad_header(offset, value, message):
+    data = bytearray(encode(get_images()["runs"], "rle"))
+    data[offset : offset + 1] = value
+
+    with pytest.raises(Exception, match=message):
+        EncodedImage.load("image.ivc", data=bytes(data))
+
+
+def test_archive_refuses_duplicate_names(tmp_path):
+    archive = str(tmp_path / "images.ivp")
+    images = get_images()
+
+    EncodedImage.save(images["runs"], "a.ivc", "rle", archive)
+    EncodedImage.save(images["noise"], "b.ivc", "huffman", archive)
+    with pytest.raises(Exception, match="already has an entry named a.ivc"):
+        EncodedImage.save(images["noise"], "a.ivc", "huffman", archive)
+
+    with ZipFile(archive) as zip:
+        assert zip.namelist() == ["a.ivc", "b.ivc"]
+        assert zip.testzip() is None
+    image_info = EncodedImage.load("a.ivc", archive)
+    assert np.array_equal(image_info["pixel_data"], images["runs"])
+    image_info = EncodedImage.load("b.ivc", archive)
+    assert np.array_equal(image_info["pixel_data"], images["noise"])
@@ -0,0 +1,185 @@
+from PIL import Image
+from utils.image_parser import ImageParser, PcxHeader, PcxImage
+from utils.large_image import PcxWriter
+import numpy as np
+import pytest
+
+# (bits per pixel, number of planes) of every format the decoder supports
+formats = [(1, 1), (2, 1), (4, 1), (1, 4), (8, 1), (8, 3), (8, 4)]
+
+
+def write_pcx(location, values, bits_per_pixel, color_map=bytes(48), tail=b""):
+    """writes (height, n_planes, width) plane values as a run length encoded pcx"""
+    height, n_planes, width = values.shape
+    pixels_per_byte = 8 // bits_per_pixel
+    line_bytes = -(-width // pixels_per_byte)
+    bytes_per_line = line_bytes + line_bytes % 2
+
+    # pack the values most significant bits first, the padding stays zero
+    padded = np.zeros(
+        (height, n_planes, bytes_per_line * pixels_per_byte), dtype=np.uint8
+    )
+    padded[:, :, :width] = values
+    padded = padded.reshape(height, n_planes, bytes_per_line, pixels_per_byte)
+    shifts = np.arange(8 - bits_per_pixel, -1, -bits_per_pixel, dtype=np.uint8)
+    scanlines = np.bitwise_or.reduce(padded << shifts, axis=-1).astype(np.uint8)
+
+    header = PcxHeader.layout.pack(
+        10, 5, 1, bits_per_pixel, 0, 0, width - 1, height - 1, 72, 72, color_map,
+        0, n_planes, bytes_per_line, 1, 0, 0, bytes(54),
+    )  # fmt: skip
+    with open(location, "wb") as file:
+        file.write(header)
+        file.write(PcxWriter.encode_scanlines(scanlines.reshape(-1, bytes_per_line)))
+        file.write(tail)
+
+
+def make_image(tmp_path, bits_per_pixel, n_planes, width=13, height=7):
+    """writes a random pcx, returns its location & the rgb pixels it should decode to"""
+    rng = np.random.default_rng(bits_per_pixel * 10 + n_planes)
+    values = rng.integers(0, 2**bits_per_pixel, (height, n_planes, width), np.uint8)
+    # a few runs, some longer than the 63 bytes a marker can count
+    values[: height // 2, :, : width // 2] = values[0, :, :1]
+    color_map = rng.integers(0, 256, 48, np.uint8).tobytes()
+    palette = rng.integers(0, 256, (256, 3), np.uint8)
+    location = str(tmp_path / f"{bits_per_pixel}x{n_planes}.pcx")
+
+    match (bits_per_pixel, n_planes):
+        case (1, 1):
+            expected = np.array([[0, 0, 0], [255, 255, 255]])[values[:, 0]]
+            write_pcx(location, values, 1, color_map)
+        case (8, 1):
+            expected = palette[values[:, 0]]
+            write_pcx(location, values, 8, tail=b"\x0c" + palette.tobytes())
+        case (8, _):
+            expected = values[:, :3].transpose(0, 2, 1)
+            write_pcx(location, values, 8)
+        case _:
+            indices = np.zeros((height, width), dtype=np.uint8)
+            for plane in range(n_planes):
+                indices |= values[:, plane] << (bits_per_pixel * plane)
+            expected = np.frombuffer(color_map, np.uint8).reshape(-1, 3)[indices]
+            write_pcx(location, values, bits_per_pixel, color_map)
+
+    return location, expected
+
+
+@pytest.mark.parametrize("bits_per_pixel, n_planes", formats)
+@pytest.mark.parametrize("width", [1, 13, 200])
+def test_decode_formats(tmp_path, bits_per_pixel, n_planes, width):
+    location, expected = make_image(tmp_path, bits_per_pixel, n_planes, width)
+
+    image_info = ImageParser.parse_image(location)
+
+    assert image_info["width"] == width and image_info["height"] == 7
+    assert image_info["pixel_data"].dtype == np.uint8
+    assert np.array_equal(image_info["pixel_data"], expected)
+
+
+@pytest.mark.parametrize("bits_per_pixel, n_planes", [(1, 1), (1, 4), (8, 1), (8, 3)])
+def test_decode_matches_pil(tmp_path, bits_per_pixel, n_planes):
+    location, _ = make_image(tmp_path, bits_per_pixel, n_planes, width=45)
+
+    image_info = ImageParser.parse_image(location)
+
+    with Image.open(location) as img:
+        assert np.array_equal(image_info["pixel_data"], np.asarray(img.convert("RGB")))
+
+
+def test_decode_in_memory_data(tmp_path):
+    location, expected = make_image(tmp_path, 4, 1)
+    with open(location, "rb") as file:
+        data = file.read()
+
+    image_info = ImageParser.parse_image("archive/image.pcx", data=data)
+
+    assert np.array_equal(image_info["pixel_data"], expected)
+    assert "File Name: image.pcx" in image_info["metadata"]
+
+
+def test_header_fields(tmp_path):
+    location, _ = make_image(tmp_path, 1, 4, width=30, height=20)
+
+    with PcxImage(location) as pcx_image:
+        assert pcx_image.get_window() == [0, 0, 29, 19]
+        assert pcx_image.get_bits_per_pixel() == 1
+        assert pcx_image.get_n_planes() == 4
+        assert pcx_image.get_bytes_per_line() == 4
+        assert pcx_image.get_hdpi() == pcx_image.get_vdpi() == 72
+        assert len(pcx_image.get_color_map()) == 16
+
+    assert ImageParser.probe(location) == {
+        "width": 30,
+        "height": 20,
+        "bits_per_pixel": 1,
+        "n_planes": 4,
+        "has_palette": True,
+        "metadata": pcx_image.get_metadata(),
+    }
+
+
+def test_short_and_unsupported_files(tmp_path):
+    location = tmp_path / "short.pcx"
+    location.write_bytes(bytes(100))
+    with pytest.raises(Exception, match="File is too short"):
+        PcxImage(str(location))
+
+    location = str(tmp_path / "unsupported.pcx")
+    write_pcx(location, np.zeros((2, 2, 4), np.uint8), 2)
+    with pytest.raises(Exception, match="2-bit images with 2 color planes"):
+        ImageParser.parse_image(location)
+
+
+def test_close_unmaps_the_file(tmp_path):
+    location, expected = make_image(tmp_path, 8, 3)
+
+    with PcxImage(location) as pcx_image:
+        pixels = pcx_image.process_image_data()["pixel_data"]
+
+    assert pcx_image.mapping.closed
+    assert np.array_equal(pixels, expected)
+
+
+@pytest.mark.parametrize("chunk_size", [7, 65536])
+def test_eof_palette_detection(tmp_path, chunk_size):
+    palette = np.random.default_rng(3).integers(0, 256, (256, 3), np.uint8)
+    gray = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+    # neighbouring values differ and stay below 0xC0, so every byte is a literal
+    values = (np.arange(1200) * 7 % 0xC0).astype(np.uint8).reshape(30, 40)
+    values.ravel()[-769] = 0x0C
+    cases = {
+        "palette": (b"\x0c" + palette.tobytes(), palette),
+        "padding before the palette": (bytes(5) + b"\x0c" + palette.tobytes(), palette),
+        # some writers leave out the marker, the palette still follows the image data
+        "palette without marker": (palette.tobytes(), palette),
+        # the 0x0C byte before the last 768 bytes belongs to the image data
+        "no palette": (b"", gray),
+        "no marker": (b"\x0d" + palette.tobytes(), gray),
+    }
+
+    for name, (tail, palette) in cases.items():
+        location = str(tmp_path / f"{name}.pcx")
+        write_pcx(location, values[:, None], 8, tail=tail)
+        with open(location, "rb") as file:
+            assert (file.read()[-769] == 0x0C) == ("marker" not in name)
+
+        with PcxImage(location) as pcx_image:
+            image_info = pcx_image.process_image_data()
+            bands = list(pcx_image.iter_scanlines(7, chunk_size))
+
+        assert np.array_equal(image_info["palette_data"], palette), name
+        assert np.array_equal(image_info["pixel_data"], palette[values]), name
+        assert np.array_equal(np.concatenate(bands), image_info["pixel_data"]), name
+
+
+def test_truncated_file_is_zero_filled(tmp_path):
+    location, expected = make_image(tmp_path, 8, 3, 50, 10)
+    with open(location, "rb+") as file:
+        file.truncate(128 + 200)
+
+    with PcxImage(location) as pcx_image:
+        pixels = pcx_image.process_image_data()["pixel_data"]
+        bands = list(pcx_image.iter_scanlines(3, chunk_size=64))
+
+    assert np.array_equal(np.concatenate(bands), pixels)
+    assert not pixels[5:].any()
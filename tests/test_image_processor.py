@@ -0,0 +1,323 @@
+from fractions import Fraction
+from utils.image_processor import ImageProcessor
+from utils.sorting_network import SortingNetwork
+import itertools
+import math
+import numpy as np
+import pytest
+
+
+def get_contraharmonic(data: np.ndarray, q: int, radius: int) -> np.ndarray:
+    """exact contraharmonic mean of every neighborhood, leaving zeros out and
+    rounding to 9 decimals before truncating like the filter"""
+    height, width = data.shape
+    filtered_image = np.zeros((height, width), dtype=np.uint8)
+    for y in range(height):
+        for x in range(width):
+            window = data[
+                max(y - radius, 0) : y + radius + 1, max(x - radius, 0) : x + radius + 1
+            ]
+            values = [Fraction(int(value)) for value in window.ravel() if value]
+            if values:
+                mean = sum(value ** (q + 1) for value in values) / sum(
+                    value**q for value in values
+                )
+                filtered_image[y, x] = min(int(round(mean, 9)), 255)
+
+    return filtered_image
+
+
+@pytest.mark.parametrize("q", [-8, -5, 5, 8])
+@pytest.mark.parametrize("radius", [1, 2])
+def test_contraharmonic_mixed_regions(q, radius):
+    # bright and dark halves, in both orders, with a few zeros
+    rng = np.random.default_rng(abs(q) * radius)
+    data = np.full((48, 40), 255, dtype=np.uint8)
+    data[24:] = rng.integers(1, 4, (24, 40))
+    data[rng.random(data.shape) < 0.02] = 0
+    for image in (data, data[::-1].copy()):
+        height, width = image.shape
+        filtered_image = ImageProcessor().add_contraharmonic(
+            width, height, image, q, radius
+        )
+
+        assert np.array_equal(
+            np.asarray(filtered_image), get_contraharmonic(image, q, radius)
+        )
+
+
+def get_geometric_mean(data: np.ndarray, radius: int, epsilon: int) -> np.ndarray:
+    """exact truncated geometric mean of every neighborhood of the zero padded image,
+    with epsilon added to every pixel, from integer roots of the products"""
+    side = 2 * radius + 1
+    padded = np.pad(data, radius).astype(int) + epsilon
+    filtered_image = np.zeros(data.shape, dtype=np.uint8)
+    for y, x in np.ndindex(data.shape):
+        product = math.prod(padded[y : y + side, x : x + side].ravel().tolist())
+        root = int(product ** (1 / side**2))
+        while root**side**2 > product:
+            root -= 1
+        while (root + 1) ** side**2 <= product:
+            root += 1
+        filtered_image[y, x] = max(root - epsilon, 0)
+
+    return filtered_image
+
+
+@pytest.mark.parametrize("epsilon", [0, 1])
+@pytest.mark.parametrize("radius", [1, 2])
+def test_geometric_mean_matches_products(epsilon, radius):
+    rng = np.random.default_rng(radius)
+    data = rng.integers(1, 256, (21, 17), dtype=np.uint8)
+    # constant regions have exact means, and zeros are the pepper noise
+    data[:8, :9] = 200
+    data[12:, 10:] = 3
+    data[rng.random(data.shape) < 0.05] = 0
+
+    image = ImageProcessor().add_geometric_filter(17, 21, data, radius, epsilon)
+
+    assert np.array_equal(np.asarray(image), get_geometric_mean(data, radius, epsilon))
+
+
+def test_geometric_mean_keeps_the_old_filter():
+    data = np.random.default_rng(0).integers(0, 256, (30, 30), dtype=np.uint8)
+    data[10:20, 10:20] = 77
+    processor = ImageProcessor()
+    neighbors = processor.get_neighbors(data, 30, 30)
+    products = neighbors.prod(axis=(2, 3), dtype=np.float64)
+    old = ImageProcessor.clip_to_uint8(products ** (1 / 9))
+
+    image = np.asarray(processor.add_geometric_filter(30, 30, data))
+
+    # only exact means, which the old filter truncated to one less, differ
+    changed = image != old
+    assert np.array_equal(image[changed], old[changed] + 1)
+    for y, x in zip(*np.nonzero(changed)):
+        assert int(image[y, x]) ** 9 == math.prod(neighbors[y, x].ravel().tolist())
+    assert (image[10 + 1 : 20 - 1, 10 + 1 : 20 - 1] == 77).all()
+
+
+def get_median(data: np.ndarray, radius: int) -> np.ndarray:
+    """median of every neighborhood of the zero padded image"""
+    side = 2 * radius + 1
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.pad(data, radius), (side, side)
+    )
+    return np.median(windows, axis=(2, 3)).astype(np.uint8)
+
+
+@pytest.mark.parametrize("radius", [1, 2, 3, 4, 6])
+@pytest.mark.parametrize("shape", [(1, 1), (2, 9), (9, 2), (31, 23)])
+def test_median_matches_padded_windows(radius, shape):
+    rng = np.random.default_rng(radius)
+    data = rng.integers(0, 256, shape, dtype=np.uint8)
+    # flat and dark areas make ties and zero padded borders matter
+    data[: shape[0] // 2, : shape[1] // 3] = 7
+    data[rng.random(shape) < 0.2] = 0
+    expected = get_median(data, radius)
+    height, width = shape
+
+    image = ImageProcessor().get_median_filtered_image(data, width, height, radius)
+
+    assert np.array_equal(np.asarray(image), expected)
+    assert np.array_equal(ImageProcessor.get_sliding_median(data, radius), expected)
+    # bands of a single tile
+    assert np.array_equal(SortingNetwork.get_median(data, radius, 1), expected)
+
+
+def test_median_of_large_masks():
+    data = np.random.default_rng(0).integers(0, 256, (40, 45), dtype=np.uint8)
+    radius = SortingNetwork.max_radius + 1
+
+    image = ImageProcessor().get_median_filtered_image(data, 45, 40, radius)
+
+    assert np.array_equal(np.asarray(image), get_median(data, radius))
+
+
+def get_old_huffman_sizes(image_data: np.ndarray) -> dict[str, float]:
+    """size info of the huffman coding the app used to do, from its code lengths"""
+    pixels = list(map(tuple, image_data.reshape(-1, 3).tolist()))
+    frequencies = {}
+    for pixel in pixels:
+        frequencies[pixel] = frequencies.get(pixel, 0) + 1
+    # [frequency, depth of each color below the node]
+    queue = [
+        [frequency, {color: 0}]
+        for color, frequency in sorted(frequencies.items(), key=lambda item: item[1])
+    ]
+    while len(queue) > 1:
+        left, right = queue.pop(0), queue.pop(0)
+        depths = {color: depth + 1 for color, depth in {**left[1], **right[1]}.items()}
+        node = [left[0] + right[0], depths]
+        # after the nodes of equal frequency
+        index = next((i for i, item in enumerate(queue) if item[0] > node[0]), None)
+        queue.insert(len(queue) if index is None else index, node)
+    code_lengths = {color: max(depth, 1) for color, depth in queue[0][1].items()}
+
+    return {
+        "image size": sum(code_lengths[pixel] for pixel in pixels) / 8,
+        "huffman codes size": sum(code_lengths.values()) / 8 + len(code_lengths) * 3,
+    }
+
+
+def get_skewed_image() -> np.ndarray:
+    """colors with fibonacci frequencies, which give codes of up to 20 bits"""
+    frequencies = [1, 1]
+    while len(frequencies) < 21:
+        frequencies.append(frequencies[-1] + frequencies[-2])
+    colors = np.repeat(np.arange(21), frequencies)
+    np.random.default_rng(0).shuffle(colors)
+    colors = colors[: len(colors) // 97 * 97]
+
+    return (
+        np.stack([colors * 10, 255 - colors, colors], -1)
+        .astype(np.uint8)
+        .reshape(97, -1, 3)
+    )
+
+
+def get_coding_images() -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(1)
+    palette = rng.integers(0, 256, (40, 3), dtype=np.uint8)
+
+    return {
+        "random": palette[rng.integers(0, 40, (37, 23))],
+        "noise": rng.integers(0, 256, (16, 19, 3), dtype=np.uint8),
+        "single color": np.full((5, 7, 3), 9, dtype=np.uint8),
+        "1x1": np.array([[[1, 2, 3]]], dtype=np.uint8),
+        "skewed": get_skewed_image(),
+    }
+
+
+@pytest.mark.parametrize("name", list(get_coding_images()))
+def test_huffman_round_trip(name):
+    image_data = get_coding_images()[name]
+    height, width = image_data.shape[:2]
+
+    huffman_data, huffman_codes, size_info = ImageProcessor.huffman_coding(image_data)
+    decoded = ImageProcessor.huffman_decode(huffman_data, huffman_codes, width, height)
+
+    assert np.array_equal(np.asarray(decoded), image_data)
+    assert len(huffman_data) == -(-size_info["bit length"] // 8)
+    old_sizes = get_old_huffman_sizes(image_data)
+    assert size_info["image size"] == old_sizes["image size"]
+    assert size_info["huffman codes size"] == old_sizes["huffman codes size"]
+
+
+def test_huffman_long_codes():
+    code_lengths = ImageProcessor.huffman_coding(get_skewed_image())[1]["code lengths"]
+    tables = ImageProcessor.get_huffman_decode_tables(code_lengths)
+
+    # the longest codes are past the lookup table
+    assert code_lengths.max() > tables["lookup bits"] == 12
+
+
+@pytest.mark.parametrize("name", list(get_coding_images()))
+def test_canonical_codes_are_prefix_free(name):
+    _, code_lengths, _ = ImageProcessor.get_huffman_codebook(get_coding_images()[name])
+
+    codes = ImageProcessor.get_canonical_codes(code_lengths)
+
+    words = [
+        format(int(code), f"0{length}b") for code, length in zip(codes, code_lengths)
+    ]
+    assert all(len(word) == length for word, length in zip(words, code_lengths))
+    assert words == sorted(words, key=lambda word: (len(word), word))
+    for i, word in enumerate(words):
+        assert not any(other.startswith(word) for other in words[i + 1 :])
+    # a complete code uses every bit pattern, apart from a lone 1-bit code
+    assert sum(2.0 ** -int(length) for length in code_lengths) == (
+        0.5 if len(words) == 1 else 1
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 18])
+def test_pack_codes(chunk_size):
+    rng = np.random.default_rng(chunk_size)
+    code_lengths = rng.integers(1, 58, 200)
+    codes = (rng.integers(0, 1 << 62, 200) >> (62 - code_lengths)).astype(np.uint64)
+
+    packed = ImageProcessor.pack_codes(codes, code_lengths, chunk_size)
+
+    bits = "".join(
+        format(int(code), f"0{length}b") for code, length in zip(codes, code_lengths)
+    )
+    bits += "0" * (-len(bits) % 8)
+    assert packed == int(bits, 2).to_bytes(len(bits) // 8, "big")
+
+
+def get_rle_images() -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(2)
+    palette = rng.integers(0, 256, (5, 3), dtype=np.uint8)
+    # runs of random length, most of them crossing rows
+    runs = np.repeat(rng.integers(0, 5, 300), rng.integers(1, 60, 300))
+    long_run = np.full((300, 301, 3), 7, dtype=np.uint8)
+    long_run[150, 2] = 8
+
+    return {
+        "runs": palette[runs[: len(runs) // 41 * 41].reshape(-1, 41)],
+        "noise": rng.integers(0, 2, (19, 17, 3), dtype=np.uint8) * 255,
+        "1x1": np.array([[[1, 2, 3]]], dtype=np.uint8),
+        # runs longer than a 16-bit count
+        "long runs": long_run,
+    }
+
+
+@pytest.mark.parametrize("name", list(get_rle_images()))
+def test_run_length_round_trip(name):
+    image_data = get_rle_images()[name]
+    height, width = image_data.shape[:2]
+    pixels = list(map(tuple, image_data.reshape(-1, 3).tolist()))
+
+    rle_data, palette, size_info = ImageProcessor.run_length_encoding(image_data)
+    decoded = ImageProcessor.run_length_decode(rle_data, palette, width, height)
+
+    runs = [(color, len(list(group))) for color, group in itertools.groupby(pixels)]
+    assert rle_data["counts"].tolist() == [count for _, count in runs]
+    assert [tuple(palette[i]) for i in rle_data["indices"]] == [c for c, _ in runs]
+    assert np.array_equal(np.asarray(decoded), image_data)
+    highest_count_bits = max(count for _, count in runs).bit_length()
+    assert size_info == {
+        "image size": highest_count_bits * 2 * len(runs) / 8,
+        "palette size": len(set(pixels)) * 3,
+    }
+
+
+@pytest.mark.parametrize("name", list(get_rle_images()))
+def test_iter_run_length_decode(name):
+    image_data = get_rle_images()[name]
+    height, width = image_data.shape[:2]
+    rle_data, palette, _ = ImageProcessor.run_length_encoding(image_data)
+    # split the runs into chunks of random size, some of them empty
+    rng = np.random.default_rng(len(name))
+    splits = np.sort(rng.integers(0, len(rle_data["counts"]) + 1, 6))
+    counts, indices = np.split(rle_data["counts"], splits), np.split(
+        rle_data["indices"], splits
+    )
+    chunks = [{"counts": c, "indices": i} for c, i in zip(counts, indices)]
+
+    decoded = list(
+        ImageProcessor.iter_run_length_decode(chunks, palette, width, height)
+    )
+
+    ends = np.cumsum(rle_data["counts"], dtype=np.int64)
+    assert [position for _, position in decoded] == [
+        int(ends[split - 1]) if split else 0 for split in splits
+    ] + [width * height]
+    image = np.asarray(decoded[-1][0])
+    assert np.array_equal(image[:, :, :3], image_data)
+    assert (image[:, :, 3] == 255).all()
+
+
+def test_decode_runs_checks_the_image_size():
+    rle_data = {
+        "counts": np.array([3, 4], dtype=np.uint32),
+        "indices": np.array([0, 1], dtype=np.uint32),
+    }
+    palette = np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+    pixels = np.zeros((8, 3), dtype=np.uint8)
+
+    assert ImageProcessor.decode_runs(rle_data, palette, pixels, 1) == 8
+    assert pixels[:, 0].tolist() == [0, 0, 0, 0, 255, 255, 255, 255]
+    with pytest.raises(Exception, match="more pixels than the image"):
+        ImageProcessor.decode_runs(rle_data, palette, pixels, 2)
@@ -0,0 +1,154 @@
+from PIL import Image
+from utils.image_parser import ImageParser
+from utils.ivp_archive import IvpArchive, IvpArchiveReader, IvpArchiveWriter
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+import numpy as np
+import os
+import pytest
+import shutil
+import struct
+
+
+def make_folder(tmp_path) -> dict[str, np.ndarray]:
+    """writes a folder of images, returns the pixels of each file"""
+    rng = np.random.default_rng(5)
+    folder = tmp_path / "images"
+    folder.mkdir()
+    images = {}
+    for i, name in enumerate(["b.png", "a.bmp", "c.pcx", "é.png"]):
+        images[name] = rng.integers(0, 4, (10 + i, 12, 3), dtype=np.uint8) * 60
+        Image.fromarray(images[name]).save(folder / name)
+    shutil.copy(folder / "b.png", folder / "d.png")
+    images["d.png"] = images["b.png"]
+
+    return images
+
+
+@pytest.mark.parametrize("method", ["lzma", "deflate"])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_build(tmp_path, method, workers):
+    images = make_folder(tmp_path)
+    archive = str(tmp_path / "images" / "images.ivp")
+    progress = []
+
+    report = IvpArchive.build(
+        str(tmp_path / "images"),
+        archive,
+        method,
+        workers,
+        lambda written, total: progress.append((written, total)),
+    )
+
+    # byte-identical files are stored once, the archive itself is left out
+    assert report["files"] == 5
+    assert report["entries"] == 4
+    assert report["duplicates"] == ["d.png"]
+    assert report["bytes out"] == os.path.getsize(archive)
+    assert progress == [(i, 4) for i in range(1, 5)]
+    with ZipFile(archive) as zip:
+        assert zip.testzip() is None
+        assert zip.namelist() == ["a.bmp", "b.png", "c.pcx", "é.png"]
+        compression = {"lzma": ZIP_LZMA, "deflate": ZIP_DEFLATED}[method]
+        assert [info.compress_type for info in zip.infolist()] == [
+            compression,
+            ZIP_STORED,
+            compression,
+            ZIP_STORED,
+        ]
+        for name in zip.namelist():
+            with open(tmp_path / "images" / name, "rb") as file:
+                assert zip.read(name) == file.read()
+
+    with IvpArchiveReader(archive) as reader:
+        assert reader.get_names() == ["a.bmp", "b.png", "c.pcx", "é.png"]
+        for name in reader.get_names():
+            assert np.array_equal(reader.load(name)["pixel_data"], images[name])
+
+
+def test_build_refuses_other_files(tmp_path):
+    make_folder(tmp_path)
+    (tmp_path / "images" / "notes.txt").write_text("")
+
+    with pytest.raises(Exception, match="only contain image files"):
+        IvpArchive.build(str(tmp_path / "images"), str(tmp_path / "images.ivp"))
+
+
+def test_zip64_offsets(tmp_path):
+    make_folder(tmp_path)
+    locations = [str(tmp_path / "images" / name) for name in ["a.bmp", "b.png"]]
+    archive = str(tmp_path / "large.ivp")
+
+    with IvpArchiveWriter(archive) as writer:
+        writer.write_entry(IvpArchive.compress_entry(locations[0], ZIP_DEFLATED))
+        # leave a sparse hole, so the next entry and the directory are past 4 GiB
+        writer.file.seek(5 << 30)
+        writer.bytes_written = 5 << 30
+        writer.write_entry(IvpArchive.compress_entry(locations[1], ZIP_STORED))
+
+    with open(archive, "rb") as file:
+        file.seek(-IvpArchiveWriter.end_record.size, os.SEEK_END)
+        end_record = IvpArchiveWriter.end_record.unpack(file.read())
+    assert end_record[-2] == 0xFFFFFFFF
+    with ZipFile(archive) as zip:
+        assert zip.testzip() is None
+        assert zip.infolist()[1].header_offset == 5 << 30
+        for location in locations:
+            with open(location, "rb") as file:
+                assert zip.read(os.path.basename(location)) == file.read()
+
+
+def test_zip64_entry_count(tmp_path):
+    archive = str(tmp_path / "many.ivp")
+    entry = {
+        "data": b"",
+        "crc": 0,
+        "size": 0,
+        "compress type": ZIP_STORED,
+        "dos time": 0,
+        "dos date": 33,
+    }
+
+    with IvpArchiveWriter(archive) as writer:
+        for i in range(0xFFFF + 1):
+            writer.write_entry({**entry, "name": f"{i}.png"})
+
+    with open(archive, "rb") as file:
+        file.seek(-IvpArchiveWriter.end_record.size, os.SEEK_END)
+        assert struct.unpack("<H", file.read()[10:12]) == (0xFFFF,)
+    with ZipFile(archive) as zip:
+        assert len(zip.infolist()) == 0xFFFF + 1
+        assert zip.infolist()[-1].filename == "65535.png"
+
+
+def test_reader_cache_budget(tmp_path, monkeypatch):
+    images = make_folder(tmp_path)
+    archive = str(tmp_path / "images.ivp")
+    IvpArchive.build(str(tmp_path / "images"), archive)
+    decoded = []
+    parse_image = ImageParser.parse_image
+
+    def counting_parse_image(location, data=None):
+        decoded.append(location)
+        return parse_image(location, data=data)
+
+    monkeypatch.setattr(ImageParser, "parse_image", counting_parse_image)
+    # room for two of the images, which are 360 to 468 bytes
+    with IvpArchiveReader(archive, cache_bytes=900) as reader:
+        for name in ["a.bmp", "b.png", "a.bmp", "c.pcx", "é.png", "c.pcx", "b.png"]:
+            image_info = reader.load(name)
+            assert np.array_equal(image_info["pixel_data"], images[name])
+            assert reader.cached_bytes <= reader.cache_bytes
+            assert reader.cached_bytes == sum(
+                info["pixel_data"].nbytes for info in reader.cache.values()
+            )
+            assert next(reversed(reader.cache)) == name
+
+        # cached images are not decoded again, evicted ones are
+        assert decoded == ["a.bmp", "b.png", "c.pcx", "é.png", "b.png"]
+
+    # an image over the budget alone is still kept
+    with IvpArchiveReader(archive, cache_bytes=100) as reader:
+        reader.load("a.bmp")
+        reader.load("b.png")
+        assert list(reader.cache) == ["b.png"]
+        assert reader.cached_bytes == images["b.png"].nbytes
@@ -0,0 +1,119 @@
+from PIL import Image
+from utils.image_parser import PcxImage
+from utils.large_image import LargeImage, PcxWriter, PngReader, PngWriter
+import io
+import numpy as np
+import pytest
+import struct
+
+
+@pytest.mark.parametrize("extension", ["png", "bmp", "pcx"])
+@pytest.mark.parametrize("mode", ["RGB", "L", "P"])
+def test_from_file_matches_pil(tmp_path, monkeypatch, extension, mode):
+    # a gradient makes PIL pick several png row filters
+    y, x = np.mgrid[0:90, 0:70]
+    pixels = np.stack([(x * 3 + y) % 256, (x * y) % 256, (x + 2 * y) % 256], -1)
+    image = Image.fromarray(pixels.astype(np.uint8)).convert(mode)
+    location = str(tmp_path / f"image.{extension}")
+    image.save(location)
+    # bands of a few rows, so rows are filtered against another band
+    monkeypatch.setattr(LargeImage, "band_pixels", 70 * 3 * 8)
+
+    large_image = LargeImage.from_file(location, str(tmp_path / "image.raw"))
+
+    with Image.open(location) as img:
+        assert np.array_equal(
+            np.asarray(large_image.data), np.asarray(img.convert("RGB"))
+        )
+    large_image.close()
+
+
+def test_pcx_width_limit(tmp_path):
+    location = str(tmp_path / "wide.pcx")
+    rows = np.arange(65534, dtype=np.uint32).astype(np.uint8)[None]
+
+    with PcxWriter(location, 65534, 1) as writer:
+        writer.write_rows(rows)
+
+    with PcxImage(location) as pcx_image:
+        assert pcx_image.get_bytes_per_line() == 65534
+        assert np.array_equal(
+            pcx_image.process_image_data()["pixel_data"][..., 0], rows
+        )
+    for width in [65535, 65536]:
+        with pytest.raises(Exception, match="at most 65534 x 65536 pixels"):
+            PcxWriter(location, width, 1)
+
+
+def write_png(location, pixels):
+    """writes a png with its compressed pixels split in IDAT chunks of 100 bytes"""
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG")
+    data = buffer.getvalue()
+    ihdr = data[8 : 8 + 25]
+    compressed = b""
+    position = 33
+    while position < len(data):
+        (length,) = struct.unpack(">I", data[position : position + 4])
+        if data[position + 4 : position + 8] == b"IDAT":
+            compressed += data[position + 8 : position + 8 + length]
+        position += length + 12
+
+    with open(location, "wb") as file:
+        file.write(data[:8] + ihdr)
+        for start in range(0, len(compressed), 100):
+            file.write(PngWriter.get_chunk(b"IDAT", compressed[start : start + 100]))
+        file.write(PngWriter.get_chunk(b"IEND", b""))
+
+
+def test_png_chunk_crc(tmp_path):
+    location = str(tmp_path / "image.png")
+    pixels = np.random.default_rng(6).integers(0, 256, (20, 30, 3), dtype=np.uint8)
+    write_png(location, pixels)
+    with open(location, "rb") as file:
+        data = bytearray(file.read())
+
+    # a bit of the last IDAT chunk, read after the first bands are decoded
+    data[data.rindex(b"IDAT") + 10] ^= 1
+    with open(location, "wb") as file:
+        file.write(data)
+    with PngReader(location) as reader:
+        bands = reader.iter_rows(5)
+        assert np.array_equal(next(bands), pixels[:5])
+        with pytest.raises(Exception, match="The IDAT chunk is corrupted"):
+            list(bands)
+
+    data[16] ^= 1
+    with open(location, "wb") as file:
+        file.write(data)
+    with pytest.raises(Exception, match="The IHDR chunk is corrupted"):
+        PngReader(location)
+
+
+def test_from_file_releases_a_partial_image(tmp_path, monkeypatch):
+    location = str(tmp_path / "image.png")
+    pixels = np.random.default_rng(7).integers(0, 256, (20, 30, 3), dtype=np.uint8)
+    write_png(location, pixels)
+    with open(location, "rb+") as file:
+        file.truncate(file.seek(0, 2) - 200)
+    monkeypatch.setattr(LargeImage, "band_pixels", 30 * 3 * 4)
+    created = []
+    create = LargeImage.create
+
+    def recording_create(*args):
+        created.append(create(*args))
+        return created[-1]
+
+    monkeypatch.setattr(LargeImage, "create", recording_create)
+    progress = []
+
+    with pytest.raises(Exception, match="File is too short"):
+        LargeImage.from_file(
+            location,
+            str(tmp_path / "image.raw"),
+            lambda done, total: progress.append(done),
+        )
+
+    # some bands were decoded before the error, and the mapping is released
+    assert progress and progress[-1] < 20
+    assert created[0].data is None
@@ -0,0 +1,164 @@
+from utils.task_runner import Task, TaskRunner
+import pytest
+import threading
+import time
+
+
+class FakeRoot:
+    """records the callbacks scheduled with after, instead of a Tk root"""
+
+    def __init__(self) -> None:
+        self.scheduled = []
+
+    def after(self, interval, callback) -> None:
+        self.scheduled.append((interval, callback))
+
+
+def wait(runner: TaskRunner, timeout: float = 5) -> None:
+    """poll until every submitted task has been handed back"""
+    deadline = time.monotonic() + timeout
+    while runner.pending:
+        assert time.monotonic() < deadline, "tasks did not finish"
+        runner.poll()
+        time.sleep(0.001)
+
+
+def test_tasks_finish_in_order():
+    root = FakeRoot()
+    updates = []
+    runner = TaskRunner(root, on_update=updates.append, interval=10)
+    started = []
+    results = []
+
+    def make_function(i):
+        def function(task):
+            started.append(i)
+            task.report(1, 1)
+            return i * i
+
+        return function
+
+    tasks = [
+        runner.submit(f"task {i}", make_function(i), results.append) for i in range(8)
+    ]
+    assert runner.pending == tasks
+    wait(runner)
+
+    assert started == list(range(8))
+    assert results == [i * i for i in range(8)]
+    assert all((task.done, task.total) == (1, 1) for task in tasks)
+    assert updates and all(update is runner for update in updates)
+    assert root.scheduled[0] == (10, runner.poll)
+    # every poll schedules the next one
+    assert len(root.scheduled) == len(updates) + 1
+
+
+def test_errors_are_passed_back():
+    runner = TaskRunner(FakeRoot())
+    error = ValueError("bad pixel")
+    results = []
+    errors = []
+
+    def fail(task):
+        raise error
+
+    runner.submit("fail", fail, results.append, errors.append)
+    runner.submit("after the error", lambda task: "ok", results.append, errors.append)
+    wait(runner)
+
+    assert errors == [error]
+    assert results == ["ok"]
+
+
+def test_errors_in_callbacks_keep_polling():
+    root = FakeRoot()
+    runner = TaskRunner(root)
+
+    def on_done(result):
+        raise RuntimeError("broken callback")
+
+    runner.submit("task", lambda task: None, on_done)
+    while runner.results.empty():
+        time.sleep(0.001)
+    with pytest.raises(RuntimeError):
+        runner.poll()
+
+    assert root.scheduled[-1] == (runner.interval, runner.poll)
+    assert not runner.pending
+
+
+def test_cancel():
+    runner = TaskRunner(FakeRoot())
+    started = threading.Event()
+    calls = []
+    errors = {}
+
+    def blocking(task):
+        started.set()
+        while True:
+            time.sleep(0.001)
+            task.report(0, 1)
+
+    def queued(task):
+        calls.append(task.name)
+
+    def on_error(name):
+        return lambda error: errors.setdefault(name, str(error))
+
+    runner.submit("running", blocking, on_error=on_error("running"))
+    started.wait(5)
+    runner.submit("queued", queued, on_error=on_error("queued"))
+    runner.submit("kept", queued, on_error=on_error("kept"))
+    runner.cancel_current()
+    runner.pending[1].cancel()
+    wait(runner)
+
+    # the running task stops at its next report, a queued one never starts
+    assert calls == ["kept"]
+    assert errors == {
+        "running": "Cancelled operation",
+        "queued": "Cancelled operation",
+    }
+
+
+def test_cancel_all():
+    runner = TaskRunner(FakeRoot())
+    results = []
+    errors = []
+
+    # a task cancelled after it finished is not handed back as done either
+    task = runner.submit("finished", lambda task: 1, results.append, errors.append)
+    while runner.results.empty():
+        time.sleep(0.001)
+    task.cancel()
+    wait(runner)
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked(task):
+        started.set()
+        return release.wait(5)
+
+    runner.submit("blocked", blocked, results.append, errors.append)
+    for i in range(3):
+        runner.submit(f"queued {i}", lambda task: 2, results.append, errors.append)
+    started.wait(5)
+    runner.cancel_all()
+    release.set()
+    wait(runner)
+
+    assert results == []
+    assert [str(error) for error in errors] == ["Cancelled operation"] * 5
+
+
+def test_task_report():
+    task = Task("task", lambda task: None)
+
+    task.report(3, 10)
+    task.cancel()
+
+    assert (task.done, task.total) == (3, 10)
+    with pytest.raises(Exception, match="Cancelled operation"):
+        task.report(4, 10)
+    assert task.is_cancelled()
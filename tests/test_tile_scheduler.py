@@ -0,0 +1,33 @@
+from utils.tile_scheduler import TileScheduler, apply_filter
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize(
+    "name, options",
+    [
+        ("average", {"radius": 3}),
+        ("median", {"radius": 4}),
+        ("highpass", {"filter": 2}),
+        ("unsharp", {}),
+        ("highboost", {"A": 2}),
+        ("gradient", {"mode": 1}),
+        ("geometric", {"radius": 2}),
+        ("contraharmonic", {"q": 8}),
+        ("contraharmonic", {"q": -8, "radius": 2}),
+        ("contraharmonic", {"q": 5}),
+    ],
+)
+@pytest.mark.parametrize("workers", [1, 3])
+def test_bands_match_whole_image(name, options, workers):
+    # bright and dark halves, in both orders, cut into bands across the edge
+    rng = np.random.default_rng(0)
+    data = np.full((150, 80), 255, dtype=np.uint8)
+    data[75:] = rng.integers(1, 4, (75, 80))
+    with TileScheduler(workers) as scheduler:
+        for image in (data, data[::-1].copy()):
+            filtered_image = scheduler.filter(name, image, band_rows=37, **options)
+
+            assert np.array_equal(
+                np.asarray(filtered_image), apply_filter(name, image, options)
+            )
@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
+from utils.image_processor import ImageProcessor
 import matplotlib.pyplot as plt
+import numpy as np
 
 
 class CreateToolTip(object):
@@ -88,12 +90,24 @@ class ToolTipButton(ttk.Button):
 
 
 class ImageFrame(ttk.Frame):
-    def __init__(self, parent, closable=True, title=None, info=None):
+    def __init__(
+        self,
+        parent,
+        closable=True,
+        title=None,
+        info=None,
+        parsable_image_data=None,
+        image_loader=None,
+    ):
         super().__init__(parent, relief="solid")
         self.parent = parent
         self.image = None
         self.image_data = None
         self.title = title
+        self.closable = closable
+        # parsed original image, given directly or loaded on demand
+        self.parsable_image_data = parsable_image_data
+        self.image_loader = image_loader
         self.image_label = ttk.Label(self, anchor="center")
         self.image_label.pack(expand=True, fill="both", padx=10, pady=10)
         self.histogram_button = ttk.Button(
@@ -116,7 +130,9 @@ class ImageFrame(ttk.Frame):
 
     def display_image(self, image: Image, resize=True, show_histogram=True):
         if show_histogram:
-            self.image_data = list(image.getdata())
+            # loaded images are fetched again for the histogram instead of kept
+            if self.image_loader is None:
+                self.image_data = image
             self.histogram_button.pack(anchor="ne")
         if resize:
             # resize image first to fit frame
@@ -136,6 +152,11 @@ class ImageFrame(ttk.Frame):
         self.image = ImageTk.PhotoImage(image)
         self.image_label.configure(image=self.image)
 
+    def get_parsable_image_data(self):
+        if self.image_loader:
+            return self.image_loader()
+        return self.parsable_image_data
+
     def remove_image(self):
         self.image_data = None
         self.image = None
@@ -153,20 +174,28 @@ class ImageFrame(ttk.Frame):
         fig = plt.figure()
         ax = fig.add_subplot()
 
-        if type(self.image_data[0]) is int:
-            ax.hist(self.image_data, 256, (0, 255))
+        image = self.image_data
+        if image is None:
+            image_info = self.get_parsable_image_data()
+            image = ImageProcessor.get_displayable_image(
+                image_info["pixel_data"], image_info["width"], image_info["height"]
+            )
+        histogram = ImageProcessor.get_histogram(image)
+        values = np.arange(256)
+        if len(histogram) == 1:
+            ax.hist(values, 256, (0, 255), weights=histogram[0])
         else:
-            r, g, b = zip(*self.image_data)
+            r, g, b = histogram[:3]
             if self.title == "Red Channel":
-                ax.hist(r, 256, (0, 255))
+                ax.hist(values, 256, (0, 255), weights=r)
             elif self.title == "Green Channel":
-                ax.hist(g, 256, (0, 255))
+                ax.hist(values, 256, (0, 255), weights=g)
             elif self.title == "Blue Channel":
-                ax.hist(b, 256, (0, 255))
+                ax.hist(values, 256, (0, 255), weights=b)
             else:
-                ax.hist(r, 256, (0, 255), label="Red Channel")
-                ax.hist(g, 256, (0, 255), label="Green Channel")
-                ax.hist(b, 256, (0, 255), label="Blue Channel")
+                ax.hist(values, 256, (0, 255), weights=r, label="Red Channel")
+                ax.hist(values, 256, (0, 255), weights=g, label="Green Channel")
+                ax.hist(values, 256, (0, 255), weights=b, label="Blue Channel")
         self.stop_loading()
 
         if self.title:
@@ -188,6 +217,72 @@ class ImageFrame(ttk.Frame):
         self.progress_bar.pack_forget()
 
 
+class TaskStatusBar(ttk.Frame):
+    """
+    shows the progress of the running operation of a TaskRunner, with buttons
+    to cancel it or everything queued
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent, padding=(10, 2))
+        self.runner = None
+        self.status_label = ttk.Label(self)
+        self.progress_bar = ttk.Progressbar(
+            self, orient="horizontal", mode="determinate", length=280, maximum=1
+        )
+        self.cancel_button = ttk.Button(self, text="Cancel", command=self.cancel)
+        self.cancel_all_button = ttk.Button(
+            self, text="Cancel all", command=self.cancel_all
+        )
+        self.status_label.pack(side="left")
+        self.showing = False
+
+    def cancel(self):
+        if self.runner:
+            self.runner.cancel_current()
+
+    def cancel_all(self):
+        if self.runner:
+            self.runner.cancel_all()
+
+    def update_status(self, runner):
+        self.runner = runner
+        task = runner.current
+        if not runner.pending:
+            if self.showing:
+                self.status_label.configure(text="")
+                self.progress_bar.stop()
+                self.progress_bar.pack_forget()
+                self.cancel_button.pack_forget()
+                self.cancel_all_button.pack_forget()
+                self.showing = False
+            return
+
+        if not self.showing:
+            self.cancel_all_button.pack(side="right", padx=(5, 0))
+            self.cancel_button.pack(side="right", padx=(5, 0))
+            self.progress_bar.pack(side="right")
+            self.showing = True
+
+        queued = len(runner.pending) - (task is not None)
+        text = task.name if task else "Waiting"
+        if task and task.is_cancelled():
+            text += " (cancelling)"
+        if queued:
+            text += f", {queued} queued"
+        self.status_label.configure(text=text)
+
+        # operations without row progress show a moving bar instead
+        if task and task.total:
+            if str(self.progress_bar["mode"]) != "determinate":
+                self.progress_bar.stop()
+                self.progress_bar.configure(mode="determinate")
+            self.progress_bar["value"] = task.done / task.total
+        elif str(self.progress_bar["mode"]) != "indeterminate":
+            self.progress_bar.configure(mode="indeterminate")
+            self.progress_bar.start(10)
+
+
 class ChoiceDialog(tk.Toplevel):
     def __init__(self, root, title, prompt, choices, map_val=None):
         super().__init__(root)
@@ -0,0 +1,447 @@
+from collections.abc import Iterator
+from typing import BinaryIO
+from utils.image_processor import ImageProcessor
+from zipfile import ZipFile, ZIP_STORED
+import io
+import numpy as np
+import struct
+
+
+class EncodedImageHeader:
+    """
+    The header of an encoded image file (.ivc)
+
+    File layout, all integers little-endian:
+        header      magic b"IVPC", version, codec, width, height, number of
+                    colors and pixels per chunk
+        palette     3 bytes per color
+        code table  1 code length per color, huffman only (palette is in
+                    canonical order)
+        chunks      chunk header (pixels, runs, count bits, payload size) and
+                    bit-packed payload, ended by a chunk with 0 pixels
+
+    Every chunk starts on a byte boundary and is decodable on its own.
+    """
+
+    __slots__ = (
+        "magic",
+        "version",
+        "codec",
+        "width",
+        "height",
+        "n_colors",
+        "chunk_pixels",
+    )
+
+    layout = struct.Struct("<4sBBIIII")
+    chunk_layout = struct.Struct("<IIBI")
+    codecs = ("rle", "huffman")
+
+    def __init__(self, header: bytes | None = None) -> None:
+        self.magic = b"IVPC"
+        self.version = 1
+        self.codec = 0
+        self.width = 0
+        self.height = 0
+        self.n_colors = 0
+        self.chunk_pixels = 0
+
+        if header is not None:
+            if len(header) < self.layout.size:
+                raise Exception("Error opening the encoded image. File is too short.")
+            for name, value in zip(self.__slots__, self.layout.unpack_from(header)):
+                setattr(self, name, value)
+            if self.magic != b"IVPC" or self.version != 1:
+                raise Exception(
+                    "Error opening the encoded image. Unsupported file format."
+                )
+            if self.codec >= len(self.codecs):
+                raise Exception(
+                    f"Error opening the encoded image. Unknown codec {self.codec}."
+                )
+
+    def pack(self) -> bytes:
+        """pack the header into its on-disk form
+
+        Returns:
+            bytes: packed header
+        """
+        return self.layout.pack(*(getattr(self, name) for name in self.__slots__))
+
+    def get_codec(self) -> str:
+        """get the codec name
+
+        Returns:
+            str: "rle" or "huffman"
+        """
+        return self.codecs[self.codec]
+
+
+class EncodedImageWriter:
+    """
+    Streaming writer of encoded image files. The palette (and huffman code
+    lengths) are written first, then pixels are encoded chunk by chunk as their
+    palette indices are written.
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        codec: str,
+        width: int,
+        height: int,
+        palette: np.ndarray,
+        code_lengths: np.ndarray | None = None,
+        chunk_pixels: int | None = None,
+    ) -> None:
+        """
+        Args:
+            file (BinaryIO): writable binary file, does not need to be seekable
+            codec (str): "rle" or "huffman"
+            width (int): image width
+            height (int): image height
+            palette (np.ndarray): (colors, 3) palette, in canonical order for huffman
+            code_lengths (np.ndarray | None, optional): canonical huffman code
+                lengths. Required for huffman. Defaults to None.
+            chunk_pixels (int | None, optional): pixels per chunk. Defaults to
+                the square root of the pixel count (at least 4096) for huffman,
+                so chunks can be decoded side by side, and whole rows up to 64k
+                pixels for rle.
+        """
+        if codec not in EncodedImageHeader.codecs:
+            raise Exception(f"Unknown codec: {codec}")
+        if codec == "huffman" and code_lengths is None:
+            raise Exception("Huffman encoding needs the code lengths.")
+        if chunk_pixels is None:
+            if codec == "huffman":
+                chunk_pixels = max(1 << 12, int(np.ceil(np.sqrt(width * height))))
+            else:
+                chunk_pixels = width * max(1, (1 << 16) // width)
+
+        self.file = file
+        self.header = EncodedImageHeader()
+        self.header.codec = EncodedImageHeader.codecs.index(codec)
+        self.header.width = width
+        self.header.height = height
+        self.header.n_colors = len(palette)
+        self.header.chunk_pixels = chunk_pixels
+
+        self.index_bits = max((len(palette) - 1).bit_length(), 1)
+        self.code_lengths = code_lengths
+        if code_lengths is not None:
+            self.codes = ImageProcessor.get_canonical_codes(code_lengths)
+        self.pending = np.zeros(0, dtype=np.int64)
+        self.pixels_written = 0
+        self.bytes_written = 0
+
+        self.write_bytes(self.header.pack())
+        self.write_bytes(np.ascontiguousarray(palette, dtype=np.uint8).tobytes())
+        if codec == "huffman":
+            self.write_bytes(np.asarray(code_lengths, dtype=np.uint8).tobytes())
+
+    def __enter__(self) -> "EncodedImageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+
+    def write_bytes(self, data: bytes) -> None:
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, indices: np.ndarray) -> None:
+        """encode the next pixels, given as palette indices in row-major order
+
+        Args:
+            indices (np.ndarray): palette index of each pixel
+        """
+        indices = np.concatenate([self.pending, np.ravel(indices)])
+        chunk_pixels = self.header.chunk_pixels
+        n_full = len(indices) // chunk_pixels * chunk_pixels
+        for start in range(0, n_full, chunk_pixels):
+            self.write_chunk(indices[start : start + chunk_pixels])
+        self.pending = indices[n_full:]
+
+    def write_chunk(self, indices: np.ndarray) -> None:
+        """encode one chunk of pixels
+
+        Args:
+            indices (np.ndarray): palette index of each pixel of the chunk
+        """
+        n_runs = count_bits = 0
+        if self.header.get_codec() == "rle":
+            run_starts = np.concatenate([[0], np.flatnonzero(np.diff(indices)) + 1])
+            counts = np.diff(np.append(run_starts, len(indices)))
+            n_runs = len(counts)
+            count_bits = int(counts.max()).bit_length()
+
+            # (count, index) pairs with fixed bit widths
+            values = np.column_stack([counts, indices[run_starts]]).ravel()
+            lengths = np.tile(
+                np.array([count_bits, self.index_bits], dtype=np.uint8), n_runs
+            )
+            payload = ImageProcessor.pack_codes(values.astype(np.uint64), lengths)
+        else:
+            payload = ImageProcessor.pack_codes(
+                self.codes[indices], self.code_lengths[indices]
+            )
+
+        self.write_bytes(
+            EncodedImageHeader.chunk_layout.pack(
+                len(indices), n_runs, count_bits, len(payload)
+            )
+        )
+        self.write_bytes(payload)
+        self.pixels_written += len(indices)
+
+    def close(self) -> None:
+        """encode the remaining pixels and end the file"""
+        if len(self.pending):
+            self.write_chunk(self.pending)
+            self.pending = self.pending[:0]
+        if self.pixels_written != self.header.width * self.header.height:
+            raise Exception("Encoded image does not have width x height pixels.")
+        self.write_bytes(EncodedImageHeader.chunk_layout.pack(0, 0, 0, 0))
+
+
+class EncodedImageReader:
+    """
+    Streaming reader of encoded image files
+    """
+
+    def __init__(self, file: BinaryIO) -> None:
+        """
+        Args:
+            file (BinaryIO): readable binary file, does not need to be seekable
+        """
+        self.file = file
+        self.header = EncodedImageHeader(
+            self.read_bytes(EncodedImageHeader.layout.size)
+        )
+        self.width = self.header.width
+        self.height = self.header.height
+        self.codec = self.header.get_codec()
+
+        n_colors = self.header.n_colors
+        self.palette = np.frombuffer(self.read_bytes(n_colors * 3), dtype=np.uint8)
+        self.palette = self.palette.reshape(n_colors, 3)
+        self.index_bits = max((n_colors - 1).bit_length(), 1)
+        self.code_lengths = None
+        if self.codec == "huffman":
+            self.code_lengths = np.frombuffer(self.read_bytes(n_colors), dtype=np.uint8)
+
+    def read_bytes(self, size: int) -> bytes:
+        data = self.file.read(size)
+        if len(data) != size:
+            raise Exception("Error opening the encoded image. File is truncated.")
+
+        return data
+
+    def iter_chunks(self) -> Iterator[dict[str, int | bytes | np.ndarray]]:
+        """read the chunks one at a time
+
+        Yields:
+            Iterator[dict[str, int | bytes | np.ndarray]]: "pixels" in the chunk
+                and its "payload", plus the run "counts" and palette "indices"
+                for rle
+        """
+        while True:
+            n_pixels, n_runs, count_bits, payload_size = (
+                EncodedImageHeader.chunk_layout.unpack(
+                    self.read_bytes(EncodedImageHeader.chunk_layout.size)
+                )
+            )
+            if n_pixels == 0:
+                return
+
+            chunk = {"pixels": n_pixels, "payload": self.read_bytes(payload_size)}
+            if self.codec == "rle":
+                # unpack the fixed width (count, index) pairs
+                pair_bits = count_bits + self.index_bits
+                bits = np.unpackbits(np.frombuffer(chunk["payload"], dtype=np.uint8))
+                bits = bits[: n_runs * pair_bits].reshape(n_runs, pair_bits)
+                weights = np.uint64(1) << np.arange(
+                    pair_bits - 1, -1, -1, dtype=np.uint64
+                )
+                counts = bits[:, :count_bits] @ weights[self.index_bits :]
+                indices = bits[:, count_bits:] @ weights[count_bits:]
+                if counts.sum() != n_pixels or indices.max(initial=0) >= len(
+                    self.palette
+                ):
+                    raise Exception("Error opening the encoded image. Corrupted chunk.")
+                chunk["counts"] = counts.astype(np.int64)
+                chunk["indices"] = indices.astype(np.int64)
+            yield chunk
+
+    def read_image(self) -> np.ndarray:
+        """decode the whole image
+
+        Returns:
+            np.ndarray: (height, width, 3) image data
+        """
+        n_pixels = self.width * self.height
+        if self.codec == "rle":
+            image_data = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            pixels = image_data.reshape(-1, 3)
+            position = 0
+            for chunk in self.iter_chunks():
+                position = ImageProcessor.decode_runs(
+                    chunk, self.palette, pixels, position
+                )
+        else:
+            # the chunks are decoded side by side, starting at each chunk
+            chunks = list(self.iter_chunks())
+            position = sum(chunk["pixels"] for chunk in chunks)
+            if any(
+                chunk["pixels"] != self.header.chunk_pixels for chunk in chunks[:-1]
+            ):
+                raise Exception("Error opening the encoded image. Corrupted chunk.")
+            payload_sizes = [len(chunk["payload"]) for chunk in chunks]
+            huffman_codes = {
+                "palette": self.palette,
+                "code lengths": self.code_lengths,
+                "sync interval": self.header.chunk_pixels,
+                "sync offsets": np.cumsum([0] + payload_sizes[:-1]) * 8,
+            }
+            if position == n_pixels:
+                image_data = np.asarray(
+                    ImageProcessor.huffman_decode(
+                        b"".join(chunk["payload"] for chunk in chunks),
+                        huffman_codes,
+                        self.width,
+                        self.height,
+                    )
+                )
+
+        if position != n_pixels:
+            raise Exception("Error opening the encoded image. Missing pixels.")
+
+        return image_data
+
+
+class EncodedImage:
+    extension = ".ivc"
+
+    def encode(
+        image_data: np.ndarray,
+        file: BinaryIO,
+        codec: str,
+        chunk_pixels: int | None = None,
+    ) -> int:
+        """encode an image into a binary file
+
+        Args:
+            image_data (np.ndarray): (height, width, 3) image data
+            file (BinaryIO): writable binary file
+            codec (str): "rle" or "huffman"
+            chunk_pixels (int | None, optional): pixels per chunk. Defaults to None.
+
+        Returns:
+            int: number of bytes written
+        """
+        height, width = image_data.shape[:2]
+        if codec == "huffman":
+            palette, code_lengths, indices = ImageProcessor.get_huffman_codebook(
+                image_data
+            )
+        else:
+            palette_keys, indices = np.unique(
+                ImageProcessor.get_color_keys(image_data), return_inverse=True
+            )
+            palette = ImageProcessor.get_key_colors(palette_keys)
+            code_lengths = None
+
+        with EncodedImageWriter(
+            file, codec, width, height, palette, code_lengths, chunk_pixels
+        ) as writer:
+            writer.write(indices)
+
+        return writer.bytes_written
+
+    def save(
+        image_data: np.ndarray, location: str, codec: str, archive: str | None = None
+    ) -> int:
+        """save an encoded image to a file, or as an entry of an .ivp archive
+
+        Args:
+            image_data (np.ndarray): (height, width, 3) image data
+            location (str): file location, or entry name inside the archive
+            codec (str): "rle" or "huffman"
+            archive (str | None, optional): .ivp archive to add the entry to,
+                created if missing. Defaults to None.
+
+        Raises:
+            Exception: when the archive already has an entry with that name
+
+        Returns:
+            int: size of the encoded image in bytes
+        """
+        if archive is None:
+            with open(location, "wb") as file:
+                return EncodedImage.encode(image_data, file, codec)
+
+        # the payload is already compressed, so the entry is stored as is
+        with ZipFile(archive, "a", ZIP_STORED) as zip:
+            # appending never replaces an entry, it would add a second one
+            if location in zip.namelist():
+                raise Exception(f"The archive already has an entry named {location}")
+            with zip.open(location, "w") as file:
+                return EncodedImage.encode(image_data, file, codec)
+
+    def load(
+        location: str, archive: str | None = None, data: bytes | None = None
+    ) -> dict[str, int | np.ndarray | str]:
+        """load an encoded image from a file, or from an entry of an .ivp archive
+
+        Args:
+            location (str): file location, or entry name inside the archive
+            archive (str | None, optional): .ivp archive holding the entry.
+                Defaults to None.
+            data (bytes | None, optional): content of the file if it is already
+                in memory. Defaults to None.
+
+        Returns:
+            dict[str, int | np.ndarray | str]: image information, like
+                ImageParser.parse_image
+        """
+        if data is not None:
+            reader = EncodedImageReader(io.BytesIO(data))
+            pixel_data = reader.read_image()
+        elif archive is None:
+            with open(location, "rb") as file:
+                reader = EncodedImageReader(file)
+                pixel_data = reader.read_image()
+        else:
+            with ZipFile(archive, "r") as zip, zip.open(location, "r") as file:
+                reader = EncodedImageReader(file)
+                pixel_data = reader.read_image()
+
+        return {
+            "width": reader.width,
+            "height": reader.height,
+            "pixel_data": pixel_data,
+            "palette_data": None,
+            "metadata": EncodedImage.get_metadata(location, reader),
+        }
+
+    def get_metadata(location: str, reader: EncodedImageReader) -> str:
+        """Returns the displayable information of an encoded image
+
+        Args:
+            location (str): location of the image
+            reader (EncodedImageReader): reader of the image
+
+        Returns:
+            str: image metadata
+        """
+        codec = {"rle": "Run-length Encoding", "huffman": "Huffman Coding"}[
+            reader.codec
+        ]
+
+        return (
+            f"File Name: {location.split('/')[-1]}\n"
+            f"Dimensions: {reader.width} x {reader.height}\n"
+            f"Codec: {codec}\n"
+            f"Colors: {reader.header.n_colors}"
+        )
@@ -1,34 +1,103 @@
 from PIL import Image
+from collections.abc import Iterator
+from functools import cache
+from utils.encoded_image import EncodedImage, EncodedImageReader
+import io
+import itertools
+import mmap
+import numpy as np
+import struct
+
+
+class PcxHeader:
+    """
+    The 128 byte header of a pcx file, unpacked with a single struct call
+    """
+
+    __slots__ = (
+        "manufacturer",
+        "version",
+        "encoding",
+        "bits_per_pixel",
+        "x_min",
+        "y_min",
+        "x_max",
+        "y_max",
+        "hdpi",
+        "vdpi",
+        "color_map",
+        "reserved",
+        "n_planes",
+        "bytes_per_line",
+        "palette_info",
+        "h_screen_size",
+        "v_screen_size",
+        "filler",
+    )
+
+    # little-endian bytes, 2-byte words and the raw color map and filler bytes
+    layout = struct.Struct("<4B6H48s2B4H54s")
+
+    def __init__(self, header: bytes) -> None:
+        if len(header) < PcxHeader.layout.size:
+            raise Exception("Error opening the pcx file. File is too short.")
+
+        for name, value in zip(
+            PcxHeader.__slots__, PcxHeader.layout.unpack_from(header)
+        ):
+            setattr(self, name, value)
 
 
 class PcxImage:
-    def __init__(self, location: str) -> None:
-        pcx_file = open(location, mode="br")
+    # (bits per pixel, number of planes) -> how the decoded planes become pixels,
+    # "indexed" planes hold palette index bits and "rgb" planes hold color channels
+    pixel_formats = {
+        (1, 1): "indexed",  # monochrome
+        (2, 1): "indexed",  # 4 colors
+        (4, 1): "indexed",  # 16 colors
+        (1, 4): "indexed",  # 16 colors as EGA bit planes
+        (8, 1): "indexed",  # 256 colors, grayscale without an eof palette
+        (8, 3): "rgb",  # 24-bit color
+        (8, 4): "rgb",  # 32-bit color, the alpha plane is dropped
+    }
+
+    def __init__(self, location: str, data: bytes | None = None) -> None:
+        if data is None:
+            with open(location, mode="br") as pcx_file:
+                try:
+                    self.mapping = mmap.mmap(
+                        pcx_file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                except ValueError:
+                    raise Exception("Error opening the pcx file. File is empty.")
+        elif len(data) == 0:
+            raise Exception("Error opening the pcx file. File is empty.")
+        else:
+            # file content already in memory, e.g. read from an archive
+            self.mapping = data
 
+        self.path = location
         self.location = location.split("/")[-1]
-        self.manufacturer = pcx_file.read(1)
-        self.version = pcx_file.read(1)
-        self.encoding = pcx_file.read(1)
-        self.bits_per_pixel = pcx_file.read(1)
-        self.window = pcx_file.read(8)
-        self.hdpi = pcx_file.read(2)
-        self.vdpi = pcx_file.read(2)
-        self.color_map = pcx_file.read(48)
-        self.reserved = pcx_file.read(1)
-        self.n_planes = pcx_file.read(1)
-        self.bytes_per_line = pcx_file.read(2)
-        self.palette_info = pcx_file.read(2)
-        self.h_screen_size = pcx_file.read(2)
-        self.v_screen_size = pcx_file.read(2)
-        self.filler = pcx_file.read(54)
-        self.image_buffer = pcx_file.read()
+        self.header = PcxHeader(self.mapping)
+        # run length encoded image data (and eof palette), viewed without copying
+        self.image_buffer = memoryview(self.mapping)[PcxHeader.layout.size :]
 
         self.image_data = None
         self.eof_palette = None
 
         self.grayscale_image_data = None
 
-        pcx_file.close()
+    def __enter__(self) -> "PcxImage":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the view of the file and unmaps it, decoded image data stays valid"""
+        self.image_buffer.release()
+        if isinstance(self.mapping, mmap.mmap):
+            self.mapping.close()
 
     def get_manufacturer(self) -> str:
         """
@@ -40,7 +109,7 @@ class PcxImage:
             mostly 'Zshoft .pcx (10)'
         """
 
-        match self.manufacturer[0]:
+        match self.header.manufacturer:
             case 10:
                 return "Zshoft .pcx (10)"
             case _:
@@ -56,8 +125,8 @@ class PcxImage:
             version number
         """
 
-        return self.version[0]
-        # match self.version[0]:
+        return self.header.version
+        # match self.header.version:
         #     case 0:
         #         return 'Ver. 2.5 of PC Paintbrush'
         #     case 2:
@@ -81,8 +150,8 @@ class PcxImage:
             encoding
         """
 
-        return self.encoding[0]
-        # match self.encoding[0]:
+        return self.header.encoding
+        # match self.header.encoding:
         #     case 0:
         #         return 'No encoding'
         #     case 1:
@@ -100,7 +169,7 @@ class PcxImage:
             bits per pixel
         """
 
-        return self.bits_per_pixel[0]
+        return self.header.bits_per_pixel
 
     def get_window(self) -> list:
         """
@@ -112,16 +181,8 @@ class PcxImage:
             [x_min, y_min, x_max, y_max]
         """
 
-        first_val = 0
-        values = list()
-        for i, byte in enumerate(self.window):
-            if i % 2 == 1:
-                left_side = byte << 8
-                values.append(left_side + first_val)
-            else:
-                first_val = byte
-
-        return values
+        header = self.header
+        return [header.x_min, header.y_min, header.x_max, header.y_max]
 
     def get_hdpi(self) -> int:
         """
@@ -133,8 +194,7 @@ class PcxImage:
             hdpi
         """
 
-        left_side = self.hdpi[1] << 8
-        return left_side + self.hdpi[0]
+        return self.header.hdpi
 
     def get_vdpi(self) -> int:
         """
@@ -146,8 +206,7 @@ class PcxImage:
             vdpi
         """
 
-        left_side = self.vdpi[1] << 8
-        return left_side + self.vdpi[0]
+        return self.header.vdpi
 
     def get_color_map(self) -> list:
         """
@@ -161,7 +220,7 @@ class PcxImage:
 
         palette = list()
         rgb = list()
-        for i, byte in enumerate(self.color_map):
+        for i, byte in enumerate(self.header.color_map):
             rgb.append(byte)
             if i % 3 == 2:
                 palette.append(rgb)
@@ -178,7 +237,7 @@ class PcxImage:
             should be 0
         """
 
-        return self.reserved[0]
+        return self.header.reserved
 
     def get_n_planes(self) -> int:
         """
@@ -190,7 +249,7 @@ class PcxImage:
             number of planes
         """
 
-        return self.n_planes[0]
+        return self.header.n_planes
 
     def get_bytes_per_line(self) -> int:
         """
@@ -202,8 +261,7 @@ class PcxImage:
             bytes per line
         """
 
-        left_side = self.bytes_per_line[1] << 8
-        return left_side + self.bytes_per_line[0]
+        return self.header.bytes_per_line
 
     def get_palette_info(self) -> int:
         """
@@ -215,9 +273,8 @@ class PcxImage:
             palette info
         """
 
-        left_side = self.palette_info[1] << 8
-        return left_side + self.palette_info[0]
-        # match left_side + self.palette_info[0]:
+        return self.header.palette_info
+        # match self.header.palette_info:
         #     case 1:
         #         return 'Color.BW'
         #     case 2:
@@ -235,8 +292,7 @@ class PcxImage:
             horizontal screen size
         """
 
-        left_side = self.h_screen_size[1] << 8
-        return left_side + self.h_screen_size[0]
+        return self.header.h_screen_size
 
     def get_v_screen_size(self) -> int:
         """
@@ -248,8 +304,7 @@ class PcxImage:
             vertical screen size
         """
 
-        left_side = self.v_screen_size[1] << 8
-        return left_side + self.v_screen_size[0]
+        return self.header.v_screen_size
 
     def get_filler(self) -> bytes:
         """
@@ -261,16 +316,356 @@ class PcxImage:
             filler bytes, should be 0
         """
 
-        return self.filler
+        return self.header.filler
+
+    def get_metadata(self) -> str:
+        """
+        Returns the header information of the pcx file as displayable text
+
+        Returns
+        -------
+        str
+            one header field per line
+        """
+
+        return (
+            f"File Name: {self.location}\n"
+            f"Manufacturer: {self.get_manufacturer()}\n"
+            f"Version: {self.get_version()}\n"
+            f"Encoding: {self.get_encoding()}\n"
+            f"Bits per Pixel: {self.get_bits_per_pixel()}\n"
+            f"Image Dimensions: {self.get_window()}\n"
+            f"HDPI: {self.get_hdpi()}\n"
+            f"VDPI: {self.get_vdpi()}\n"
+            f"Number of Color Planes: {self.get_n_planes()}\n"
+            f"Bytes per Line: {self.get_bytes_per_line()}\n"
+            f"Palette Information: {self.get_palette_info()}\n"
+            f"Horizontal Screen Size: {self.get_h_screen_size()}\n"
+            f"Vertical Screen Size: {self.get_v_screen_size()}"
+        )
+
+    def find_rle_tokens(buffer: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Finds the tokens of a run length encoded buffer that starts on a token
+
+        A byte with the top 2 bits set is a run marker whose lower 6 bits count
+        how many times the next byte repeats, any other byte is a literal.
+        Markers are found with array operations: a stretch of bytes with the top
+        2 bits set always starts a new token, so within the stretch every other
+        byte is a marker and the rest are the repeated values.
+
+        Args:
+            buffer (np.ndarray): uint8 run length encoded bytes
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: positions of the tokens & whether each token is a run marker
+        """
+
+        positions = np.arange(len(buffer))
+
+        is_high = buffer >= 192
+        stretch_start = is_high & ~np.concatenate(([False], is_high[:-1]))
+        stretch_start = np.maximum.accumulate(np.where(stretch_start, positions, 0))
+        is_marker = is_high & ((positions - stretch_start) % 2 == 0)
+        is_literal = ~is_high & ~np.concatenate(([False], is_marker[:-1]))
+
+        tokens = np.flatnonzero(is_marker | is_literal)
+
+        return tokens, is_marker[tokens]
+
+    def decode_image_buffer(self, total_bytes: int) -> tuple[np.ndarray, int]:
+        """Decodes the run length encoded image buffer of the pcx file
+
+        Args:
+            total_bytes (int): number of decoded bytes to produce
+
+        Returns:
+            tuple[np.ndarray, int]: decoded bytes (zero filled if the buffer is short)
+                & index of the first image buffer byte after the image data
+        """
+
+        buffer = np.frombuffer(self.image_buffer, dtype=np.uint8)
+        tokens, token_is_marker = PcxImage.find_rle_tokens(buffer)
+        counts = np.where(token_is_marker, buffer[tokens] & 63, 1)
+        # a trailing marker without a value byte repeats 0
+        value_index = np.where(token_is_marker, tokens + 1, tokens)
+        values = np.where(
+            value_index < len(buffer),
+            buffer[np.minimum(value_index, len(buffer) - 1)],
+            0,
+        )
+
+        # stop at the token that completes the image data
+        last_token = np.searchsorted(np.cumsum(counts), total_bytes)
+        if last_token < len(tokens):
+            index = int(tokens[last_token]) + (2 if token_is_marker[last_token] else 1)
+            index = min(index, len(self.image_buffer))
+        else:
+            index = len(self.image_buffer)
+
+        decoded = np.zeros(total_bytes, dtype=np.uint8)
+        expanded = np.repeat(values[: last_token + 1], counts[: last_token + 1])
+        decoded[: min(len(expanded), total_bytes)] = expanded[:total_bytes]
+
+        return decoded, index
+
+    def iter_rle_tokens(
+        self, chunk_size: int = 65536
+    ) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Reads the run length encoded image buffer of the file a chunk at a time
+
+        Args:
+            chunk_size (int, optional): bytes read from the file at a time. Defaults to 65536.
+
+        Yields:
+            Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]: values & counts of the
+                tokens of a chunk, and the image buffer index after each token
+        """
+
+        if isinstance(self.mapping, mmap.mmap):
+            pcx_file = open(self.path, mode="br")
+        else:
+            pcx_file = io.BytesIO(self.mapping)
+
+        with pcx_file:
+            pcx_file.seek(PcxHeader.layout.size)
+            carry = b""
+            # image buffer index of the first byte of the chunk
+            position = 0
+
+            while True:
+                chunk = pcx_file.read(chunk_size)
+                at_eof = len(chunk) < chunk_size
+                buffer = np.frombuffer(carry + chunk + b"\x00", dtype=np.uint8)
+                tokens, token_is_marker = PcxImage.find_rle_tokens(buffer[:-1])
+
+                # a marker on the last byte gets its value from the next chunk
+                carry = b""
+                if not at_eof and len(tokens) and token_is_marker[-1]:
+                    if tokens[-1] == len(buffer) - 2:
+                        carry = buffer[-2:-1].tobytes()
+                        tokens, token_is_marker = tokens[:-1], token_is_marker[:-1]
+
+                # a trailing marker without a value byte repeats 0
+                counts = np.where(token_is_marker, buffer[tokens] & 63, 1)
+                values = np.where(token_is_marker, buffer[tokens + 1], buffer[tokens])
+                ends = np.minimum(
+                    position + tokens + 1 + token_is_marker,
+                    position + len(buffer) - 1,
+                )
+                yield values, counts, ends
+
+                if at_eof:
+                    return
+                position += len(buffer) - 1 - len(carry)
+
+    def find_image_data_end(self, total_bytes: int, chunk_size: int = 65536) -> int:
+        """Finds where the image data ends without decoding it
+
+        Args:
+            total_bytes (int): number of decoded bytes of the image
+            chunk_size (int, optional): bytes read from the file at a time. Defaults to 65536.
+
+        Returns:
+            int: index of the first image buffer byte after the image data, the
+                same index decode_image_buffer returns
+        """
+
+        decoded = 0
+        for _, counts, ends in self.iter_rle_tokens(chunk_size):
+            totals = decoded + np.cumsum(counts)
+            last_token = np.searchsorted(totals, total_bytes)
+            if last_token < len(totals):
+                return int(ends[last_token])
+            if len(totals):
+                decoded = totals[-1]
+
+        return len(self.image_buffer)
+
+    def get_eof_palette(self, data_end: int | None = None) -> np.ndarray | None:
+        """Reads the 768 byte palette at the end of 8-bit single plane pcx files.
+        The palette follows the image data after a 0x0C marker byte, or right
+        after the image data in files written without the marker. Otherwise the
+        last bytes are image data and the image is grayscale.
+
+        Args:
+            data_end (int | None, optional): index of the first image buffer byte
+                after the image data, found by scanning the file if None. Defaults to None.
+
+        Returns:
+            np.ndarray | None: (256, 3) palette, None if the file has no eof palette
+        """
+
+        if self.get_bits_per_pixel() != 8 or self.get_n_planes() != 1:
+            return None
+        palette_start = len(self.image_buffer) - 768
+        if palette_start < 0:
+            return None
+
+        if data_end is None:
+            dimensions = self.get_window()
+            height = dimensions[3] - dimensions[1] + 1
+            data_end = self.find_image_data_end(height * self.get_bytes_per_line())
+        has_marker = (
+            data_end < palette_start and self.image_buffer[palette_start - 1] == 0x0C
+        )
+        if data_end != palette_start and not has_marker:
+            return None
+
+        return (
+            np.frombuffer(self.image_buffer[palette_start:], dtype=np.uint8)
+            .reshape(-1, 3)
+            .copy()
+        )
+
+    def get_palette(self, eof_palette: np.ndarray | None) -> np.ndarray | None:
+        """Returns the palette that the pixel values of the pcx file index into
+
+        Args:
+            eof_palette (np.ndarray | None): (256, 3) eof palette of the file, if any
+
+        Returns:
+            np.ndarray | None: (n_colors, 3) palette, None for rgb images
+        """
+
+        bits_per_pixel = self.get_bits_per_pixel()
+        n_planes = self.get_n_planes()
+
+        if PcxImage.pixel_formats.get((bits_per_pixel, n_planes)) != "indexed":
+            return None
+        if bits_per_pixel == 8:
+            if eof_palette is not None:
+                return eof_palette
+            return np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+        if n_planes == 1 and bits_per_pixel == 1:
+            return np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+
+        color_map = np.frombuffer(self.header.color_map, dtype=np.uint8).reshape(-1, 3)
+        return color_map[: 2 ** (bits_per_pixel * n_planes)].copy()
+
+    @cache
+    def get_unpack_table(bits_per_pixel: int) -> np.ndarray:
+        """Returns a table that splits a byte into its packed pixel values,
+        most significant bits first
+
+        Args:
+            bits_per_pixel (int): 1, 2 or 4
+
+        Returns:
+            np.ndarray: (256, 8 / bits_per_pixel) pixel values of each byte value
+        """
+
+        shifts = np.arange(8 - bits_per_pixel, -1, -bits_per_pixel, dtype=np.uint8)
+        table = (np.arange(256, dtype=np.uint8)[:, None] >> shifts) & (
+            (1 << bits_per_pixel) - 1
+        )
+        table.flags.writeable = False
+
+        return table
+
+    def scanlines_to_pixels(
+        self, scanlines: np.ndarray, palette: np.ndarray | None
+    ) -> np.ndarray:
+        """Converts decoded scanlines into rgb pixels
+
+        Args:
+            scanlines (np.ndarray): (lines, n_planes, bytes_per_line) decoded scanline bytes
+            palette (np.ndarray | None): palette from get_palette
+
+        Raises:
+            Exception: pcx file cannot be parsed by the program
+
+        Returns:
+            np.ndarray: (lines, width, 3) pixels
+        """
+
+        dimensions = self.get_window()
+        width = dimensions[2] - dimensions[0] + 1
+        bits_per_pixel = self.get_bits_per_pixel()
+        n_planes = self.get_n_planes()
+        pixel_format = PcxImage.pixel_formats.get((bits_per_pixel, n_planes))
+
+        if pixel_format is None:
+            raise Exception(
+                "Error opening the pcx file. App does not support "
+                f"{bits_per_pixel}-bit images with {n_planes} color planes."
+            )
+
+        # split packed bytes into one value per pixel and drop the line padding
+        if bits_per_pixel < 8:
+            values = PcxImage.get_unpack_table(bits_per_pixel)[scanlines]
+            values = values.reshape(scanlines.shape[0], n_planes, -1)[:, :, :width]
+        else:
+            values = scanlines[:, :, :width]
+
+        if pixel_format == "rgb":
+            # interleave the color planes into (r, g, b) pixels
+            return np.ascontiguousarray(values[:, :3].transpose(0, 2, 1))
+
+        # combine the planes into palette indices, the first plane holds the lowest bits
+        indices = values[:, 0]
+        for plane in range(1, n_planes):
+            indices = indices | (values[:, plane] << (bits_per_pixel * plane))
+
+        return palette[indices]
+
+    def iter_scanlines(
+        self, band_height: int = 1, chunk_size: int = 65536
+    ) -> Iterator[np.ndarray]:
+        """Decodes the pcx file one band of scanlines at a time
+
+        The file is read in chunks of chunk_size bytes, so memory stays
+        proportional to one band and one chunk instead of the whole image.
+
+        Args:
+            band_height (int, optional): scanlines per band. Defaults to 1.
+            chunk_size (int, optional): bytes read from the file at a time. Defaults to 65536.
+
+        Yields:
+            Iterator[np.ndarray]: (lines, width, 3) pixels, the last band may be shorter
+        """
+
+        dimensions = self.get_window()
+        height = dimensions[3] - dimensions[1] + 1
+        n_planes = self.get_n_planes()
+        bytes_per_line = self.get_bytes_per_line()
+        total_bytes = n_planes * bytes_per_line
+        palette = self.get_palette(self.get_eof_palette())
+
+        band = np.zeros(band_height * total_bytes, dtype=np.uint8)
+        filled = 0
+        lines_left = height
 
-    def process_image_data(self) -> dict[str, int | list[tuple[int, int, int]] | str]:
+        chunks = (
+            np.repeat(values, counts)
+            for values, counts, _ in self.iter_rle_tokens(chunk_size)
+        )
+        # an exhausted file leaves the rest of the image zero filled
+        chunks = itertools.chain(chunks, itertools.repeat(np.zeros_like(band)))
+
+        while lines_left > 0:
+            expanded = next(chunks)
+
+            while len(expanded) and lines_left > 0:
+                lines = min(band_height, lines_left)
+                taken = min(lines * total_bytes - filled, len(expanded))
+                band[filled : filled + taken] = expanded[:taken]
+                expanded = expanded[taken:]
+                filled += taken
+
+                if filled == lines * total_bytes:
+                    scanlines = band[:filled].reshape(lines, n_planes, bytes_per_line)
+                    yield self.scanlines_to_pixels(scanlines, palette)
+                    filled = 0
+                    lines_left -= lines
+
+    def process_image_data(self) -> dict[str, int | np.ndarray | str | None]:
         """Processes the pcx file
 
         Raises:
             Exception: pcx file cannot be parsed by the program
 
         Returns:
-            dict[str, int | list[tuple[int, int, int]] | str]: image information
+            dict[str, int | np.ndarray | str | None]: image information
         """
 
         # https://people.sc.fsu.edu/~jburkardt/txt/pcx_format.txt
@@ -283,112 +678,158 @@ class PcxImage:
         bytes_per_line = self.get_bytes_per_line()
         total_bytes = n_planes * bytes_per_line
 
-        image_buffer = self.image_buffer
-        image_data = list()
-
-        index = 0
-        current_line_bytes = 0
-        current_lines = 0
-
-        while index < len(image_buffer):
-            # track how many lines are written
-            if current_line_bytes >= total_bytes:
-                current_line_bytes = 0
-                current_lines += 1
-
-            # stop if all image data is read
-            if current_lines == height:
-                break
-
-            if image_buffer[index] & 192 == 192:  # if top 2 bits are set
-                count = image_buffer[index] & 63  # lower 6 bits as count
-                current_line_bytes += count
-                for x in range(count):
-                    image_data.append(image_buffer[index + 1])
-                index += 2
-            else:
-                image_data.append(image_buffer[index])
-                current_line_bytes += 1
-                index += 1
+        decoded, index = self.decode_image_buffer(height * total_bytes)
 
-        palette = list()
-        rgb_image_data = list()
-
-        if index < len(image_buffer):  # eof palette exist
-            image_buffer = image_buffer[-768:]
-
-            palette = [
-                (image_buffer[i], image_buffer[i + 1], image_buffer[i + 2])
-                for i in range(0, len(image_buffer), 3)
-            ]
-
-            for j in range(len(image_data)):
-                rgb_image_data.append(palette[image_data[j]])
-        elif self.get_bits_per_pixel() == 8 and n_planes == 3:
-            # convert list of data into an rgb tuple
-            for i in range(0, len(image_data), total_bytes):
-                for j in range(i, i + int(total_bytes / n_planes)):
-                    color_tuple = list()
-                    offset = 0
-                    for k in range(n_planes):
-                        color_tuple.append(image_data[j + offset])
-                        offset += bytes_per_line
-                    rgb_image_data.append(tuple(color_tuple))
-        else:
-            raise Exception(
-                "Error opening the pcx file. App only supports opening rgb images."
-            )
+        # arrange the decoded bytes as (scanline, plane, byte)
+        scanlines = decoded.reshape(height, n_planes, bytes_per_line)
 
-        self.image_data = rgb_image_data
-        self.eof_palette = palette
+        eof_palette = self.get_eof_palette(index)
+        palette = self.get_palette(eof_palette)
+        rgb_image_data = self.scanlines_to_pixels(scanlines, palette)
 
-        all_data = (
-            f"File Name: {self.location}\n"
-            f"Manufacturer: {self.get_manufacturer()}\n"
-            f"Version: {self.get_version()}\n"
-            f"Encoding: {self.get_encoding()}\n"
-            f"Bits per Pixel: {self.get_bits_per_pixel()}\n"
-            f"Image Dimensions: {self.get_window()}\n"
-            f"HDPI: {self.get_hdpi()}\n"
-            f"VDPI: {self.get_vdpi()}\n"
-            f"Number of Color Planes: {self.get_n_planes()}\n"
-            f"Bytes per Line: {self.get_bytes_per_line()}\n"
-            f"Palette Information: {self.get_palette_info()}\n"
-            f"Horizontal Screen Size: {self.get_h_screen_size()}\n"
-            f"Vertical Screen Size: {self.get_v_screen_size()}"
-        )
+        self.image_data = rgb_image_data
+        self.eof_palette = eof_palette
 
         return {
             "width": width,
             "height": height,
             "pixel_data": rgb_image_data,
             "palette_data": palette,
-            "metadata": all_data,
+            "metadata": self.get_metadata(),
         }
 
 
 class ImageParser:
     def parse_image(
-        location: str,
-    ) -> dict[str, int | list[tuple[int, int, int] | int] | str]:
+        location: str, legacy_pixel_list: bool = False, data: bytes | None = None
+    ) -> dict[str, int | np.ndarray | list[tuple[int, int, int]] | str | None]:
         """General image parser function
 
+        The pixel data is a (height, width, 3) uint8 array and the palette, if any,
+        is a (n_colors, 3) uint8 array.
+
         Args:
             location (str): location of the image
+            legacy_pixel_list (bool, optional): return the pixel data as a list of
+                (r, g, b) tuples instead. Defaults to False.
+            data (bytes | None, optional): content of the file if it is already in
+                memory, the location then only gives the file type and name.
+                Defaults to None.
 
         Returns:
-            dict[str, int | list[tuple[int, int, int] | int] | str]: image information
+            dict[str, int | np.ndarray | list[tuple[int, int, int]] | str | None]: image information
         """
         if location.endswith("pcx"):
-            return PcxImage(location).process_image_data()
+            with PcxImage(location, data) as pcx_image:
+                image_info = pcx_image.process_image_data()
+        elif location.endswith(EncodedImage.extension):
+            image_info = EncodedImage.load(location, data=data)
+        else:
+            img = Image.open(location if data is None else io.BytesIO(data))
+            width, height = img.size
+
+            image_info = {
+                "width": width,
+                "height": height,
+                "pixel_data": np.asarray(img.convert("RGB")),
+                "palette_data": None,
+                "metadata": ImageParser.get_pil_metadata(location, img),
+            }
+
+        if legacy_pixel_list:
+            image_info["pixel_data"] = ImageParser.to_pixel_list(
+                image_info["pixel_data"]
+            )
+
+        return image_info
+
+    def to_pixel_list(pixel_data: np.ndarray) -> list[tuple[int, int, int] | int]:
+        """Converts array pixel data to the old flat list of pixels
+
+        Args:
+            pixel_data (np.ndarray): (height, width, 3) color or (height, width) grayscale data
 
-        img = Image.open(location)
+        Returns:
+            list[tuple[int, int, int] | int]: pixels in row-major order
+        """
+        if pixel_data.ndim == 2:
+            return pixel_data.ravel().tolist()
+
+        return list(map(tuple, pixel_data.reshape(-1, pixel_data.shape[-1]).tolist()))
+
+    def probe(location: str) -> dict[str, int | bool | str]:
+        """Reads the image information without decoding the pixels. Only the pcx
+        header is read, and PIL images are opened lazily without loading them.
+
+        Args:
+            location (str): location of the image
+
+        Returns:
+            dict[str, int | bool | str]: width, height, bits per pixel, number of planes,
+                whether the image has a palette and the metadata text
+        """
+        if location.endswith("pcx"):
+            with PcxImage(location) as pcx_image:
+                dimensions = pcx_image.get_window()
+
+                return {
+                    "width": dimensions[2] - dimensions[0] + 1,
+                    "height": dimensions[3] - dimensions[1] + 1,
+                    "bits_per_pixel": pcx_image.get_bits_per_pixel(),
+                    "n_planes": pcx_image.get_n_planes(),
+                    "has_palette": PcxImage.pixel_formats.get(
+                        (pcx_image.get_bits_per_pixel(), pcx_image.get_n_planes())
+                    )
+                    == "indexed",
+                    "metadata": pcx_image.get_metadata(),
+                }
+
+        if location.endswith(EncodedImage.extension):
+            with open(location, "rb") as file:
+                reader = EncodedImageReader(file)
+
+            return {
+                "width": reader.width,
+                "height": reader.height,
+                "bits_per_pixel": 8,
+                "n_planes": 3,
+                "has_palette": True,
+                "metadata": EncodedImage.get_metadata(location, reader),
+            }
+
+        with Image.open(location) as img:
+            width, height = img.size
+            bands = img.getbands()
+
+            match img.mode:
+                case "1":
+                    bits_per_pixel = 1
+                case "I;16" | "I;16B" | "I;16L":
+                    bits_per_pixel = 16
+                case "I" | "F":
+                    bits_per_pixel = 32
+                case _:
+                    bits_per_pixel = 8
+
+            return {
+                "width": width,
+                "height": height,
+                "bits_per_pixel": bits_per_pixel,
+                "n_planes": len(bands),
+                "has_palette": img.mode in ("P", "PA"),
+                "metadata": ImageParser.get_pil_metadata(location, img),
+            }
+
+    def get_pil_metadata(location: str, img: Image) -> str:
+        """Returns the displayable information of an image opened with PIL
+
+        Args:
+            location (str): location of the image
+            img (Image): opened image, does not need to be loaded
+
+        Returns:
+            str: image metadata
+        """
         width, height = img.size
 
-        return {
-            "width": width,
-            "height": height,
-            "pixel_data": list(img.getdata()),
-            "palette_data": None,
-            "metadata": f"File Name: {location.split("/")[-1]}\nDimensions: {width} x {height}",
-        }
+        return f"File Name: {location.split("/")[-1]}\nDimensions: {width} x {height}"
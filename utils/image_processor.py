@@ -1,34 +1,42 @@
 from PIL import Image, ImageDraw
-import random
+from collections.abc import Iterable, Iterator
+from functools import cache
+from utils.sorting_network import SortingNetwork
+import heapq
 import numpy as np
 
 
 class ImageProcessor:
-    def get_displayable_image(
-        image_data: list[tuple[int, int, int]], width: int, height: int
-    ) -> Image:
+    def clip_to_uint8(data: np.ndarray) -> np.ndarray:
+        """clip computed pixel values into the displayable 0-255 range,
+        truncating floats the same way Image.putdata does
+
+        Args:
+            data (np.ndarray): computed pixel values
+
+        Returns:
+            np.ndarray: uint8 pixel values
+        """
+        return np.clip(data, 0, 255).astype(np.uint8)
+
+    def get_displayable_image(image_data: np.ndarray, width: int, height: int) -> Image:
         """get displayable image
 
         Args:
-            image_data (list[tuple[int, int, int]]): image data
+            image_data (np.ndarray): (height, width, 3) image data
             width (int): image width
             height (int): image height
 
         Returns:
             Image: displayable image
         """
-        img = Image.new("RGB", (width, height))
-        img.putdata(image_data)
+        return Image.fromarray(image_data)
 
-        return img
-
-    def get_displayable_palette(
-        palette_data: list[tuple[int, int, int]], pixel_length: int
-    ) -> Image:
+    def get_displayable_palette(palette_data: np.ndarray, pixel_length: int) -> Image:
         """get displayable palette
 
         Args:
-            palette_data (list[tuple[int, int, int]]): palette data
+            palette_data (np.ndarray): (n_colors, 3) palette data, up to 256 colors
             pixel_length (int): pixel size for each color in palette
 
         Returns:
@@ -44,6 +52,8 @@ class ImageProcessor:
 
         for y in range(target_size):
             for x in range(target_size):
+                if y * target_size + x >= len(palette_data):
+                    break
                 draw.rectangle(
                     [
                         x * pixel_length,
@@ -51,18 +61,21 @@ class ImageProcessor:
                         x * pixel_length + pixel_length,
                         y * pixel_length + pixel_length,
                     ],
-                    fill=palette_data[y * target_size + x],
+                    fill=tuple(palette_data[y * target_size + x].tolist()),
                 )
 
         return image
 
     def show_color_channel_images(
-        image_data: list[tuple[int, int, int]], width: int, height: int, color: str
+        image_data: np.ndarray, width: int, height: int, color: str
     ) -> Image:
         """Returns a color channel of the pcx image as displayable image
 
+        The channel band is taken from the image with Image.split and merged
+        back with black bands for the other two channels.
+
         Args:
-            image_data (list[tuple[int, int, int]]): image data
+            image_data (np.ndarray): (height, width, 3) image data
             width (int): image width
             height (int): image height
             color (str): color channel
@@ -70,41 +83,64 @@ class ImageProcessor:
         Returns:
             Image: image using one color channel
         """
-        color_data = []
+        channel = ["red", "green", "blue"].index(color)
+
+        bands = list(Image.fromarray(image_data).split())
+        black = Image.new("L", (width, height))
+        for i in range(3):
+            if i != channel:
+                bands[i] = black
+
+        return Image.merge("RGB", bands)
+
+    def get_histogram(image: Image) -> np.ndarray:
+        """count the occurrences of each value in every band of the image
+
+        Args:
+            image (Image): grayscale or RGB image
+
+        Returns:
+            np.ndarray: (bands, 256) counts, one row per band in band order
+        """
+        return np.array(image.histogram()).reshape(-1, 256)
 
-        for pixel in image_data:
-            match color:
-                case "red":
-                    color_data.append(pixel[0])
-                case "green":
-                    color_data.append(pixel[1])
-                case "blue":
-                    color_data.append(pixel[2])
+    @cache
+    def get_point_lut(operation: str, parameter: float | None = None) -> np.ndarray:
+        """build the lookup table of a point operation, cached per (operation, parameter)
+        so repeated calls with the same settings reuse it
 
-        for i in range(len(color_data)):
-            if color == "red":
-                color_data[i] = (color_data[i], 0, 0)
-            elif color == "green":
-                color_data[i] = (0, color_data[i], 0)
-            elif color == "blue":
-                color_data[i] = (0, 0, color_data[i])
+        Args:
+            operation (str): "grayscale", "negative", "black and white" or "gamma"
+            parameter (float | None, optional): threshold or gamma value. Defaults to None.
 
-        disp_img = Image.new("RGB", (width, height))
+        Returns:
+            np.ndarray: uint8 output value for each input value, indexed by r + g + b
+                for "grayscale" and by the gray level for the other operations
+        """
+        match operation:
+            case "grayscale":
+                lut = np.arange(3 * 255 + 1) // 3
+            case "negative":
+                lut = 255 - np.arange(256)
+            case "black and white":
+                lut = np.where(np.arange(256) > parameter, 255, 0)
+            case "gamma":
+                c = 255  # scaling constant
+                lut = c * ((np.arange(256) / c) ** parameter)
+            case _:
+                raise Exception(f"Unknown point operation: {operation}")
 
-        for y in range(height):
-            for x in range(width):
-                disp_img.putpixel((x, y), color_data[y * width + x])
+        lut = ImageProcessor.clip_to_uint8(lut)
+        lut.flags.writeable = False
 
-        return disp_img
+        return lut
 
-    def get_grayscale_image(
-        image_data: list[tuple[int, int, int]], width: int, height: int
-    ) -> Image:
+    def get_grayscale_image(image_data: np.ndarray, width: int, height: int) -> Image:
         """Returns a grayscale transformed version of the pcx image as a displayable image
         & the data of the grayscale transformed image
 
         Args:
-            image_data (list[tuple[int, int, int]]): image data
+            image_data (np.ndarray): (height, width, 3) image data
             width (int): image width
             height (int): image height
 
@@ -112,23 +148,17 @@ class ImageProcessor:
             Image: grayscale image
         """
 
-        grayscale_image_data = list()
-
-        for pixel in image_data:
-            grayscale_image_data.append(int((pixel[0] + pixel[1] + pixel[2]) / 3))
+        lut = ImageProcessor.get_point_lut("grayscale")
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(grayscale_image_data)
-
-        return disp_img
+        return Image.fromarray(lut[image_data.sum(axis=2, dtype=np.uint16)])
 
     def get_negative_image(
-        grayscale_data: list[tuple[int, int, int]], width: int, height: int
+        grayscale_data: np.ndarray, width: int, height: int
     ) -> Image:
         """Returns a negative transformed version of the pcx image as a displayable image
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
 
@@ -136,18 +166,12 @@ class ImageProcessor:
             Image: negative image
         """
 
-        negative_image_data = list()
-
-        for pixel in grayscale_data:
-            negative_image_data.append(255 - pixel)
-
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(negative_image_data)
+        lut = ImageProcessor.get_point_lut("negative")
 
-        return disp_img
+        return Image.fromarray(lut[grayscale_data])
 
     def get_black_and_white_image(
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
         threshold: int,
@@ -155,7 +179,7 @@ class ImageProcessor:
         """Returns a black and white transformed version of the pcx image as a displayable image
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
             threshold (int): black and white threshold
@@ -164,21 +188,12 @@ class ImageProcessor:
             Image: black and white image
         """
 
-        bnw_image_data = list()
+        lut = ImageProcessor.get_point_lut("black and white", threshold)
 
-        for pixel in grayscale_data:
-            if pixel > threshold:
-                bnw_image_data.append(255)
-            else:
-                bnw_image_data.append(0)
-
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(bnw_image_data)
-
-        return disp_img
+        return Image.fromarray(lut[grayscale_data])
 
     def get_gamma_transformed_image(
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
         gamma: float,
@@ -186,7 +201,7 @@ class ImageProcessor:
         """Returns a gamma transformed version of the pcx image as a displayable image
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
             gamma (float): gamma value
@@ -195,65 +210,170 @@ class ImageProcessor:
             Image: gamma transformed image
         """
 
-        gamma_image_data = list()
-
-        for pixel in grayscale_data:
-            c = 255  # scaling constant
-            gamma_image_data.append(c * ((pixel / c) ** gamma))
-
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(gamma_image_data)
+        lut = ImageProcessor.get_point_lut("gamma", gamma)
 
-        return disp_img
+        return Image.fromarray(lut[grayscale_data])
 
     def get_neighbors(
         self,
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
-        coordinates: tuple,
         radius: int = 1,
         pad: int = 0,
-    ) -> list:
-        """Returns the neighboring pixels of a given pixel coordinate
+    ) -> np.ndarray:
+        """Returns the neighboring pixels of every pixel of the image
+
+        The result is a read-only strided view over a padded copy of the image,
+        so the neighborhoods are not copied per pixel.
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
-            coordinates (tuple): coordinates of the pixel as (x, y)
             radius (int, optional):  radius of the neighboring area to get. Defaults to 1.
             pad (int, optional): value for out of bounds pixels. Defaults to 0.
 
         Returns:
-            list: the neighboring pixels as a list
+            np.ndarray: (height, width, 2 * radius + 1, 2 * radius + 1) neighborhoods,
+                ordered from the upper-left to the lower-right pixel
         """
 
-        neighbors = list()
-        # traverse each pixel starting from the upper-left to the lower-right pixels
-        for y in range(coordinates[1] - radius, coordinates[1] + radius + 1):
-            for x in range(coordinates[0] - radius, coordinates[0] + radius + 1):
-                if (
-                    x < 0 or x >= width or y < 0 or y >= height
-                ):  # if out of bounds index
-                    neighbors.append(pad)
-                else:
-                    neighbors.append(grayscale_data[y * width + x])
+        padded = np.pad(grayscale_data, radius, constant_values=pad)
+        side = 2 * radius + 1
+
+        return np.lib.stride_tricks.sliding_window_view(padded, (side, side))
+
+    def get_box_sums(data: np.ndarray, radius: int = 1) -> np.ndarray:
+        """sum every (2 * radius + 1) x (2 * radius + 1) neighborhood of the image,
+        counting out of bounds pixels as 0
 
-        return neighbors
+        Integer sums are taken with running sums along each axis, so the cost per
+        pixel does not depend on the radius. Differences of float running sums lose
+        the small values of the image next to the large ones, so float sums add up
+        the shifted rows and then the shifted columns of every window instead, and
+        each sum only depends on the pixels of its window.
+
+        Args:
+            data (np.ndarray): (height, width) pixel values
+            radius (int, optional): neighborhood radius. Defaults to 1.
+
+        Returns:
+            np.ndarray: (height, width) neighborhood sums, int64 for integer data
+                and float64 otherwise
+        """
+        dtype = np.int64 if np.issubdtype(data.dtype, np.integer) else np.float64
+        sums = data.astype(dtype)
+
+        for axis in range(2):
+            length = sums.shape[axis]
+            if dtype == np.float64:
+                padding = [(0, 0), (0, 0)]
+                padding[axis] = (radius, radius)
+                shifted = np.moveaxis(np.pad(sums, padding), axis, 0)
+                sums = np.zeros_like(sums)
+                window_sums = np.moveaxis(sums, axis, 0)
+                for offset in range(2 * radius + 1):
+                    window_sums += shifted[offset : offset + length]
+                continue
+
+            running_sums = np.cumsum(sums, axis=axis)
+            running_sums = np.insert(running_sums, 0, 0, axis=axis)
+            positions = np.arange(length)
+            upper = np.minimum(positions + radius + 1, length)
+            lower = np.maximum(positions - radius, 0)
+            sums = np.take(running_sums, upper, axis=axis) - np.take(
+                running_sums, lower, axis=axis
+            )
+
+        return sums
+
+    def convolve(
+        data: np.ndarray, kernels: list | np.ndarray, padding: str = "zero"
+    ) -> np.ndarray:
+        """apply one or more kernels to every neighborhood of the image
+
+        Kernels are applied as laid out, without flipping, the same way the masks
+        of the spatial filters are written. Small kernels are accumulated as
+        weighted shifted slices of the padded image, and each slice is shared by
+        all kernels. Kernels with more than 64 weights are applied through the FFT.
+
+        Args:
+            data (np.ndarray): (height, width) pixel values
+            kernels (list | np.ndarray): (rows, columns) kernel, or (n, rows, columns)
+                kernels of the same size. Both sides must be odd.
+            padding (str, optional): value of out of bounds pixels, "zero", "reflect"
+                (mirrored without repeating the edge) or "replicate" (nearest edge
+                pixel). Defaults to "zero".
+
+        Returns:
+            np.ndarray: (height, width) result, or (n, height, width) for several kernels.
+                int64 when the data and kernels are integers, float64 otherwise.
+        """
+        kernels = np.asarray(kernels)
+        single_kernel = kernels.ndim == 2
+        if single_kernel:
+            kernels = kernels[None]
+
+        n_kernels, rows, columns = kernels.shape
+        height, width = data.shape
+        is_integer = np.issubdtype(data.dtype, np.integer) and np.issubdtype(
+            kernels.dtype, np.integer
+        )
+        dtype = np.int64 if is_integer else np.float64
+
+        match padding:
+            case "zero":
+                pad_options = {"mode": "constant", "constant_values": 0}
+            case "reflect":
+                pad_options = {"mode": "reflect"}
+            case "replicate":
+                pad_options = {"mode": "edge"}
+            case _:
+                raise Exception(f"Unknown padding: {padding}")
+        padded = np.pad(
+            data.astype(dtype), ((rows // 2,) * 2, (columns // 2,) * 2), **pad_options
+        )
+
+        if rows * columns > 64:
+            shape = padded.shape
+            # correlation is convolution with the kernel turned around
+            spectrum = np.fft.rfft2(padded) * np.fft.rfft2(
+                kernels[:, ::-1, ::-1], shape
+            )
+            result = np.fft.irfft2(spectrum, shape)[
+                :, rows - 1 : rows - 1 + height, columns - 1 : columns - 1 + width
+            ]
+            if is_integer:
+                result = np.rint(result).astype(np.int64)
+        else:
+            result = np.zeros((n_kernels, height, width), dtype=dtype)
+            for y in range(rows):
+                for x in range(columns):
+                    weights = kernels[:, y, x]
+                    if not weights.any():
+                        continue
+                    shifted = padded[y : y + height, x : x + width]
+                    for i in np.flatnonzero(weights):
+                        result[i] += weights[i] * shifted
+
+        return result[0] if single_kernel else result
 
     # Image functions
     def get_average_filtered_image(
         self,
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
         radius: int = 1,
     ) -> Image:
         """Function to get the average-filtered (blur) image
 
+        Out of bounds pixels count as 0 and every sum is divided by the full mask
+        area, for any radius.
+
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
             radius (int, optional): filter radius. Defaults to 1.
@@ -261,24 +381,112 @@ class ImageProcessor:
         Returns:
             Image: average filtered image
         """
-        # stores the calculated values of the average-filtered image
-        filtered_image = list()
+        filtered_image = ImageProcessor.get_box_sums(grayscale_data, radius) // (
+            (2 * radius + 1) ** 2
+        )
 
-        for y in range(height):
-            for x in range(width):
-                neighbors = self.get_neighbors(
-                    grayscale_data, width, height, (x, y), radius
+        return Image.fromarray(filtered_image.astype(np.uint8))
+
+    def get_sliding_median(grayscale_data: np.ndarray, radius: int = 1) -> np.ndarray:
+        """median of every (2 * radius + 1) x (2 * radius + 1) neighborhood of an 8-bit
+        image, counting out of bounds pixels as 0
+
+        The window slides left to right keeping a 256-bin histogram per pixel row
+        plus 16 coarse bins (Huang's algorithm), so each step only adds the entering
+        column and removes the leaving one. The median is found by summing the 16
+        coarse bins and then the 16 fine bins of the chosen coarse bin. The image is
+        cut into vertical strips that slide side by side so every step updates a few
+        thousand histograms at once. The work per pixel grows with the mask side, not
+        its area, so this is used for masks too large for SortingNetwork.get_median.
+
+        Args:
+            grayscale_data (np.ndarray): (height, width) uint8 grayscale data
+            radius (int, optional): mask radius. Defaults to 1.
+
+        Returns:
+            np.ndarray: (height, width) median filtered data
+        """
+        height, width = grayscale_data.shape
+        side = 2 * radius + 1
+        middle_index = side**2 // 2
+
+        # strips of equal width, zero padded on the right when the width does not divide
+        strips = max(1, min(width, -(-4096 // height)))
+        strip_width = -(-width // strips)
+        padded = np.pad(
+            grayscale_data,
+            ((radius, radius), (radius, radius + strips * strip_width - width)),
+        )
+        strip_view = np.lib.stride_tricks.sliding_window_view(
+            padded, strip_width + side - 1, axis=1
+        )[:, : strips * strip_width : strip_width]
+
+        # one row of 256 fine bins and 16 coarse bins per (pixel row, strip), counts
+        # wrap around in the smallest unsigned type that holds a whole window
+        n_histograms = height * strips
+        dtype = np.min_scalar_type(side**2)
+        shift = (side - 1) * strips * 272
+        bins = np.zeros(shift + n_histograms * 272, dtype=dtype)
+        histograms = bins[shift:].reshape(n_histograms, 272)
+        coarse_bins = histograms[:, 256:].T
+        fine_bins = histograms[:, :256].reshape(n_histograms, 16, 16)
+        # a pixel of padded row r goes to the histogram of row r - y for every y, so
+        # the bins are seen shifted by y rows instead of shifting every index
+        shifted_bins = [bins[shift - y * strips * 272 :] for y in range(side)]
+        row_offsets = np.arange(padded.shape[0] * strips).reshape(-1, strips, 1) * 272
+        add = np.ones(2 * n_histograms, dtype=dtype)
+        remove = np.negative(add)
+
+        def get_indices(column: int) -> np.ndarray:
+            # fine and coarse bin of every pixel of the column, next to each other
+            values = strip_view[:, :, column, None]
+            indices = np.empty((padded.shape[0], strips, 2), dtype=np.intp)
+            indices[:, :, :1] = values
+            indices[:, :, 1:] = values >> 4
+            indices[:, :, 1] += 256
+            indices += row_offsets
+            return indices.reshape(padded.shape[0], -1)
+
+        def update(indices: np.ndarray, counts: np.ndarray) -> None:
+            for y in range(side):
+                np.add.at(shifted_bins[y], indices[y : y + height].ravel(), counts)
+
+        columns = []
+        for column in range(side - 1):
+            columns.append(get_indices(column))
+            update(columns[-1], add)
+
+        histogram_index = np.arange(n_histograms)
+        totals = np.zeros((17, n_histograms), dtype=dtype)
+        fine_totals = np.empty((16, n_histograms), dtype=dtype)
+        filtered_image = np.empty((height, strips, strip_width), dtype=np.uint8)
+        for x in range(strip_width):
+            columns.append(get_indices(x + side - 1))
+            update(columns[-1], add)
+
+            # coarse bin holding the median, and how many pixels are below it
+            for level in range(16):
+                np.add(totals[level], coarse_bins[level], out=totals[level + 1])
+            block = np.count_nonzero(totals[1:] <= middle_index, axis=0)
+            below = totals.ravel()[block * n_histograms + histogram_index]
+
+            # fine bin holding the median
+            block_bins = fine_bins[histogram_index, block].T
+            np.add(below, block_bins[0], out=fine_totals[0])
+            for level in range(1, 16):
+                np.add(
+                    fine_totals[level - 1], block_bins[level], out=fine_totals[level]
                 )
-                filtered_image.append(int(sum(neighbors) / len(neighbors)))
+            median = block * 16 + np.count_nonzero(fine_totals <= middle_index, axis=0)
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(filtered_image)
+            filtered_image[:, :, x] = median.reshape(height, strips)
+            update(columns.pop(0), remove)
 
-        return disp_img
+        return filtered_image.reshape(height, -1)[:, :width]
 
     def get_median_filtered_image(
         self,
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
         radius: int = 1,
@@ -286,7 +494,7 @@ class ImageProcessor:
         """Creates an median-filtered version of a grayscale version of an image
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
             radius (int, optional): mask radius. Defaults to 1.
@@ -295,31 +503,16 @@ class ImageProcessor:
             Image: median filtered image
         """
 
-        filtered_image = []
-
-        middle_index = int(((2 * radius + 1) ** 2) / 2)
-        # 2*radius+1 is side of mask, square and you get the area or total number of pixels in mask
-        # divide by 2, and getting the floor, you get the middle index (no need +1 since index starts from 0)
-        # (optimization) this is calculated once here instead of everytime in the for loop below
-
-        for y in range(height):
-            for x in range(width):
-                neighbors = self.get_neighbors(
-                    grayscale_data, width, height, (x, y), radius
-                )
-                neighbors.sort()
-                filtered_image.append(
-                    neighbors[middle_index]
-                )  # median is middle index of sorted list
-
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(filtered_image)
+        if radius <= SortingNetwork.max_radius:
+            filtered_image = SortingNetwork.get_median(grayscale_data, radius)
+        else:
+            filtered_image = ImageProcessor.get_sliding_median(grayscale_data, radius)
 
-        return disp_img
+        return Image.fromarray(filtered_image)
 
     def get_highpass_filtered_image(
         self,
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
         filter: int = 1,
@@ -327,7 +520,7 @@ class ImageProcessor:
         """Returns a laplacian transformed version of the image
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
             filter (int, optional): laplacian filter to use. Defaults to 1.
@@ -340,93 +533,47 @@ class ImageProcessor:
         match filter:
             case 1:
                 filter_used = [
-                    0,
-                    1,
-                    0,
-                    1,
-                    -4,
-                    1,
-                    0,
-                    1,
-                    0,
+                    [0, 1, 0],
+                    [1, -4, 1],
+                    [0, 1, 0],
                 ]  # First filter where the center value is negative 4
             case 2:
                 filter_used = [
-                    0,
-                    -1,
-                    0,
-                    -1,
-                    4,
-                    -1,
-                    0,
-                    -1,
-                    0,
+                    [0, -1, 0],
+                    [-1, 4, -1],
+                    [0, -1, 0],
                 ]  # Second filter. Positive counterpart to the first one
             case 3:
                 filter_used = [
-                    1,
-                    1,
-                    1,
-                    1,
-                    -8,
-                    1,
-                    1,
-                    1,
-                    1,
+                    [1, 1, 1],
+                    [1, -8, 1],
+                    [1, 1, 1],
                 ]  # Third filter where the center value is negative 8
             case 4:
                 filter_used = [
-                    -1,
-                    -1,
-                    -1,
-                    -1,
-                    8,
-                    -1,
-                    -1,
-                    -1,
-                    -1,
+                    [-1, -1, -1],
+                    [-1, 8, -1],
+                    [-1, -1, -1],
                 ]  # Fourth filter. Positive counterpart to the first one
             case _:
                 filter_used = [
-                    0,
-                    1,
-                    0,
-                    1,
-                    -4,
-                    1,
-                    0,
-                    1,
-                    0,
+                    [0, 1, 0],
+                    [1, -4, 1],
+                    [0, 1, 0],
                 ]  # Default filter: first filter
 
-        filtered_image = (
-            []
-        )  # stores the calculated values of the average-filtered image
-
-        for y in range(height):
-            for x in range(width):
-                neighbors = self.get_neighbors(
-                    grayscale_data, width, height, (x, y)
-                )  # using default 3x3 mask
-                filtered_image.append(
-                    sum(
-                        [neighbors[i] * filter_used[i] for i in range(len(filter_used))]
-                    )
-                )
-
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(filtered_image)
+        filtered_image = ImageProcessor.convolve(grayscale_data, filter_used)
 
-        return disp_img
+        return Image.fromarray(ImageProcessor.clip_to_uint8(filtered_image))
 
     def get_unsharp_masked_image(
-        self, grayscale_data: list[tuple[int, int, int]], width: int, height: int
+        self, grayscale_data: np.ndarray, width: int, height: int
     ) -> Image:
         """Unsharps (sharpens) an image using the formula
         Unsharped_image = Grayscale_image + k * (Grayscale_image - average_filtered_image())
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
 
@@ -434,28 +581,22 @@ class ImageProcessor:
             Image: unsharped image
         """
 
-        blurred_image = list(
-            self.get_average_filtered_image(grayscale_data, width, height).getdata()
+        # 3x3 average filter
+        blurred_image = (
+            ImageProcessor.convolve(grayscale_data, np.ones((3, 3), dtype=int)) // 9
         )
-        original_image = grayscale_data
+        original_image = grayscale_data.astype(np.int64)
         # mask is subtracting the blurred image from the original image
-        mask = [
-            original_image[i] - blurred_image[i] for i in range(len(original_image))
-        ]
+        mask = original_image - blurred_image
 
         k = 1  # for unsharp masking
-        unsharped_image = [
-            original_image[i] + k * mask[i] for i in range(len(original_image))
-        ]  # apply the mask on all pixels
+        unsharped_image = original_image + k * mask  # apply the mask on all pixels
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(unsharped_image)
-
-        return disp_img
+        return Image.fromarray(ImageProcessor.clip_to_uint8(unsharped_image))
 
     def get_highboost_filtered_image(
         self,
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
         A: float = 1,
@@ -464,7 +605,7 @@ class ImageProcessor:
         highboosted_image = (A-1)Original + Highpass(1) where A is the intensity
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
             A (float, optional): highboost filter intensity. Defaults to 1.
@@ -473,23 +614,17 @@ class ImageProcessor:
             Image: highboost filtered image
         """
 
-        highpassed_image = list(
-            self.get_highpass_filtered_image(grayscale_data, width, height, 2).getdata()
+        highpassed_image = np.asarray(
+            self.get_highpass_filtered_image(grayscale_data, width, height, 2)
         )  # store the highpassed version of the image using the second filter
-        original_image = grayscale_data  # apply the function for each
-        highboosted_image = [
-            (A - 1) * original_image[i] + highpassed_image[i]
-            for i in range(len(original_image))
-        ]
-
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(highboosted_image)
+        original_image = grayscale_data.astype(np.float64)
+        highboosted_image = (A - 1) * original_image + highpassed_image
 
-        return disp_img
+        return Image.fromarray(ImageProcessor.clip_to_uint8(highboosted_image))
 
     def get_image_gradient(
         self,
-        grayscale_data: list[tuple[int, int, int]],
+        grayscale_data: np.ndarray,
         width: int,
         height: int,
         mode: int = 1,
@@ -497,7 +632,7 @@ class ImageProcessor:
         """Returns an image processed with Sobel operator
 
         Args:
-            grayscale_data (list[tuple[int, int, int]]): grayscale data
+            grayscale_data (np.ndarray): (height, width) grayscale data
             width (int): image width
             height (int): image height
             mode (int, optional): gradient direction. Defaults to 1.
@@ -506,428 +641,743 @@ class ImageProcessor:
             Image: image gradient
         """
 
-        sobel_operator_x = [-1, 0, 1, -2, 0, 2, -1, 0, 1]
-        sobel_operator_y = [-1, -2, -1, 0, 0, 0, 1, 2, 1]
-
-        x_gradient = []  # stores the calculated values of the x gradient
-        y_gradient = []  # stores the calculated values of the y gradient
-
-        for y in range(height):
-            for x in range(width):
-                neighbors = self.get_neighbors(
-                    grayscale_data, width, height, (x, y)
-                )  # using default 3x3 mask
-                if mode != 3:
-                    x_gradient.append(
-                        sum(
-                            [
-                                neighbors[i] * sobel_operator_x[i]
-                                for i in range(len(sobel_operator_x))
-                            ]
-                        )
-                    )
-                if mode != 2:
-                    y_gradient.append(
-                        sum(
-                            [
-                                neighbors[i] * sobel_operator_y[i]
-                                for i in range(len(sobel_operator_y))
-                            ]
-                        )
-                    )
+        sobel_operator_x = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
+        sobel_operator_y = np.array([[-1, -2, -1], [0, 0, 0], [1, 2, 1]])
+
+        # both directions are computed in one pass over the image
+        x_gradient, y_gradient = ImageProcessor.convolve(
+            grayscale_data, [sobel_operator_x, sobel_operator_y]
+        )
 
         if mode == 2:
             gradient_data = x_gradient
         elif mode == 3:
             gradient_data = y_gradient
         else:
-            gradient_data = [
-                abs(x_gradient[i]) + abs(y_gradient[i]) for i in range(len(x_gradient))
-            ]
+            gradient_data = np.abs(x_gradient) + np.abs(y_gradient)
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(gradient_data)
+        return Image.fromarray(ImageProcessor.clip_to_uint8(gradient_data))
 
-        return disp_img
+    def get_noise_generator(seed: int | None = None) -> np.random.Generator:
+        """create the random generator used by the noise functions
+
+        Args:
+            seed (int | None, optional): seed for a reproducible degradation.
+                Defaults to None (fresh entropy on every call).
+
+        Returns:
+            np.random.Generator: random generator
+        """
+        return np.random.default_rng(seed)
 
     def apply_salt_pepper(
-        grayscale_data: list[int], width: int, height: int, probability: float
+        grayscale_data: np.ndarray,
+        width: int,
+        height: int,
+        probability: float,
+        seed: int | None = None,
     ) -> Image:
         """Apply salt and pepper noise to the image
 
         Args:
-            grayscale_data (list[int]): grayscale image data
+            grayscale_data (np.ndarray): (height, width) grayscale image data
             width (int): width of the image
             height (int): height of the image
-            probability (float): probability for the noise
+            probability (float): probability for each of salt and pepper
+            seed (int | None, optional): seed of the noise. Defaults to None.
 
         Returns:
             Image: noised image
         """
 
-        salt_pepper_values = []
-
-        for pixel in grayscale_data:
-            a = random.random()
+        rng = ImageProcessor.get_noise_generator(seed)
+        a = rng.random(grayscale_data.shape, dtype=np.float32)
 
-            if a < probability:
-                salt_pepper_values.append(255)
-            elif a < (2 * probability):
-                salt_pepper_values.append(0)
-            else:
-                salt_pepper_values.append(pixel)
+        salt_pepper_values = ImageProcessor.clip_to_uint8(grayscale_data)
+        salt_pepper_values[a < 2 * probability] = 0
+        salt_pepper_values[a < probability] = 255
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(salt_pepper_values)
+        return Image.fromarray(salt_pepper_values)
 
-        return disp_img
-
-    def apply_gaussian(grayscale_data: list[int], width: int, height: int) -> Image:
+    def apply_gaussian(
+        grayscale_data: np.ndarray,
+        width: int,
+        height: int,
+        mean: float = 35,
+        variance: float = 100,
+        seed: int | None = None,
+    ) -> Image:
         """Apply gaussian noise to the image
 
         Args:
-            grayscale_data (list[int]): grayscale image data
+            grayscale_data (np.ndarray): (height, width) grayscale image data
             width (int): width of the image
             height (int): height of the image
+            mean (float, optional): shifts the overall brightness of the image.
+                Defaults to 35.
+            variance (float, optional): spread of the noise values, a higher
+                variance gives a noisier image. Defaults to 100.
+            seed (int | None, optional): seed of the noise. Defaults to None.
 
         Returns:
             Image: noised image
         """
 
-        mean = 35  # responsible for the bell curved shape of the distribution
-        var = 10  # controls the amount of noise | variance determines the spread of the noise values | ^ Variance = Noisier Image
-
-        gaussian_values = []
+        rng = ImageProcessor.get_noise_generator(seed)
+        noise = rng.standard_normal(grayscale_data.shape, dtype=np.float32)
+        noise *= np.sqrt(variance)
+        noise += mean
+        noise += grayscale_data
 
-        # creating and storing the noise applied values
-        for pixel in grayscale_data:
-            noise = np.random.normal(mean, var, size=None)
-            gaussian_values.append(pixel + noise)
+        return Image.fromarray(ImageProcessor.clip_to_uint8(noise))
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(gaussian_values)
-
-        return disp_img
-
-    def apply_erlang(grayscale_data: list[int], width: int, height: int) -> Image:
+    def apply_erlang(
+        grayscale_data: np.ndarray,
+        width: int,
+        height: int,
+        alpha: float = 2,
+        beta: float = 10,
+        seed: int | None = None,
+    ) -> Image:
         """Apply erlang noise to the image
 
         Args:
-            grayscale_data (list[int]): grayscale image data
+            grayscale_data (np.ndarray): (height, width) grayscale image data
             width (int): width of the image
             height (int): height of the image
+            alpha (float, optional): shape of the noise distribution, the amount
+                of noise. Defaults to 2.
+            beta (float, optional): scale of the noise distribution, the overall
+                brightness of the image. Defaults to 10.
+            seed (int | None, optional): seed of the noise. Defaults to None.
 
         Returns:
             Image: noised image
         """
 
-        alpha = 2  # controls the shape of the noise distribution | amount of noise
-        beta = 10  # Adjust the beta value to control the scale of the noise distribution (overall brightness of the image)
-
-        erlang_values = []
-
-        # creating and storing the noise applied values
-        for pixel in grayscale_data:
-            # noise =  np.random.normal(alpha, beta, size=None)
-            noise = np.random.gamma(alpha, beta)
-            erlang_values.append(pixel + noise)
+        rng = ImageProcessor.get_noise_generator(seed)
+        noise = rng.standard_gamma(alpha, grayscale_data.shape, dtype=np.float32)
+        noise *= beta
+        noise += grayscale_data
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(erlang_values)
-
-        return disp_img
+        return Image.fromarray(ImageProcessor.clip_to_uint8(noise))
 
     def add_geometric_filter(
-        self, width: int, height: int, noise_degraded_img: list[int]
+        self,
+        width: int,
+        height: int,
+        noise_degraded_img: np.ndarray,
+        radius: int = 1,
+        epsilon: float = 0.0,
     ) -> Image:
         """performs geometric filter restoration technique to the noised image
 
+        The geometric mean is taken in the log domain as
+        exp(mean(log(x + epsilon))) - epsilon, with the means computed from
+        box sums of the log plane. Out of bounds pixels count as 0.
+
+        The default epsilon of 0 gives the plain geometric mean, where any zero
+        in the neighborhood gives 0. An epsilon of 1 makes zero pixels only pull
+        the mean down instead of zeroing the whole neighborhood.
+
+        Means are truncated like the other filters, after rounding to 9 decimals
+        so float error does not push exact means such as constant regions down.
+        The old product ** (1 / 9) truncated those to one less, which is the only
+        difference from it with an epsilon of 0.
+
         Args:
             width (int): width of the image
             height (int): height of the image
-            noise_degraded_img (list[int]): noised image
+            noise_degraded_img (np.ndarray): (height, width) noised image
+            radius (int, optional): mask radius. Defaults to 1 (3x3 mask).
+            epsilon (float, optional): offset added before taking the log.
+                Defaults to 0.0.
 
         Returns:
             Image: restored image
         """
 
-        geometric_filtered_image = []
+        if epsilon < 0:
+            raise Exception("Epsilon must not be negative.")
+
+        data = np.asarray(noise_degraded_img, dtype=np.float64) + epsilon
+        mask_area = (2 * radius + 1) ** 2
+
+        # log(0) is kept out of the running sums, zero pixels are counted instead
+        has_zero = data <= 0
+        log_plane = np.log(np.where(has_zero, 1, data))
+        log_means = ImageProcessor.get_box_sums(log_plane, radius) / mask_area
+        if epsilon > 0:
+            # out of bounds pixels are 0 + epsilon
+            out_of_bounds = mask_area - ImageProcessor.get_box_sums(
+                np.ones(data.shape, dtype=np.uint8), radius
+            )
+            log_means += out_of_bounds * np.log(epsilon) / mask_area
+            zero_counts = ImageProcessor.get_box_sums(has_zero, radius)
+        else:
+            # out of bounds pixels are zeros, so borders always give 0
+            zero_counts = ImageProcessor.get_box_sums(~has_zero, radius) - mask_area
+
+        geometric_filtered_image = np.where(
+            zero_counts != 0, 0, np.round(np.exp(log_means) - epsilon, 9)
+        )
 
-        for y in range(height):
-            for x in range(width):
-                neighbors = self.get_neighbors(
-                    noise_degraded_img, width, height, (x, y)
-                )  # using default 3x3 mask
+        return Image.fromarray(ImageProcessor.clip_to_uint8(geometric_filtered_image))
 
-                total = 1
-                for (
-                    element
-                ) in neighbors:  # Get the product of the all the neighbouring pixels
-                    total = total * element
+    @cache
+    def get_power_lut(exponent: float) -> np.ndarray:
+        """build the table of gray level powers used by the contraharmonic filter,
+        cached per exponent so sweeping q values reuses earlier tables
 
-                geometric_filtered_image.append(
-                    total ** (1 / 9)
-                )  # raise the total product to 1/9
+        Args:
+            exponent (float): power to raise each gray level to
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(geometric_filtered_image)
+        Returns:
+            np.ndarray: float64 power of each gray level, with 0 ** exponent set
+                to 0 when it is undefined (negative exponents)
+        """
+        lut = np.array(
+            [
+                0.0 if value == 0 and exponent < 0 else float(value) ** exponent
+                for value in range(256)
+            ]
+        )
+        lut.flags.writeable = False
 
-        return disp_img
+        return lut
 
     def add_contraharmonic(
-        self, width: int, height: int, noise_degraded_img: list[int], q: int = 1
+        self,
+        width: int,
+        height: int,
+        noise_degraded_img: np.ndarray,
+        q: float = 1,
+        radius: int = 1,
+        skip_zeros: bool = True,
     ) -> Image:
-        """performs geometric filter restoration technique to the noised image
+        """performs contraharmonic filter restoration technique to the noised image
+
+        The x^(q + 1) and x^q planes are looked up from cached power tables and
+        box summed. Out of bounds pixels are always left out of the sums.
 
         Args:
             width (int): width of the image
             height (int): height of the image
-            noise_degraded_img (list[int]): noised image
-            q (int): order of the filter
+            noise_degraded_img (np.ndarray): (height, width) noised image
+            q (float, optional): order of the filter. Defaults to 1.
+            radius (int, optional): mask radius. Defaults to 1 (3x3 mask).
+            skip_zeros (bool, optional): leave pixels with '0' value out of the
+                sums. Otherwise they are counted, and for negative q any zero in
+                the mask gives 0. Defaults to True.
 
         Returns:
             Image: restored image
         """
 
-        contraharmonic_filtered_image = []
+        data = np.asarray(noise_degraded_img)
+        numerator_lut = ImageProcessor.get_power_lut(q + 1)
+        denominator_lut = ImageProcessor.get_power_lut(q)
+        if skip_zeros:
+            numerator_lut = np.where(np.arange(256) == 0, 0, numerator_lut)
+            denominator_lut = np.where(np.arange(256) == 0, 0, denominator_lut)
+
+        numerator = ImageProcessor.get_box_sums(numerator_lut[data], radius)
+        denominator = ImageProcessor.get_box_sums(denominator_lut[data], radius)
+
+        contraharmonic_filtered_image = np.divide(
+            numerator,
+            denominator,
+            out=np.zeros_like(numerator),
+            where=denominator != 0,
+        )
+        if not skip_zeros and q < 0:
+            zero_counts = ImageProcessor.get_box_sums(data == 0, radius)
+            contraharmonic_filtered_image[zero_counts != 0] = 0
+        # drop the rounding error of the sums before truncating
+        contraharmonic_filtered_image = contraharmonic_filtered_image.round(9)
+
+        return Image.fromarray(
+            ImageProcessor.clip_to_uint8(contraharmonic_filtered_image)
+        )
 
-        for y in range(
-            height
-        ):  # get the neighbouring pixels of all the noised image pixels
-            for x in range(width):
-                neighbors = self.get_neighbors(
-                    noise_degraded_img, width, height, (x, y)
-                )
+    def get_color_keys(image_data: np.ndarray) -> np.ndarray:
+        """pack every rgb pixel into a single 24-bit key (r << 16 | g << 8 | b)
 
-                numerator = 0
-                denominator = 0
-                for element in neighbors:
-                    if (
-                        element == 0
-                    ):  # ignores elements with '0' value to avoid division by zero
-                        continue
-                    numerator = numerator + element ** (q + 1)
-                    denominator = denominator + element**q
+        Args:
+            image_data (np.ndarray): (height, width, 3) image data
 
-                if denominator == 0:
-                    contraharmonic_filtered_image.append(0)
-                else:
-                    contraharmonic_filtered_image.append(numerator / denominator)
+        Returns:
+            np.ndarray: (height * width) uint32 color keys in row-major order
+        """
+        pixels = image_data.reshape(-1, 3).astype(np.uint32)
+
+        return pixels[:, 0] << 16 | pixels[:, 1] << 8 | pixels[:, 2]
+
+    def get_key_colors(keys: np.ndarray) -> np.ndarray:
+        """unpack 24-bit color keys back into rgb colors
+
+        Args:
+            keys (np.ndarray): uint32 color keys
+
+        Returns:
+            np.ndarray: (len(keys), 3) uint8 colors
+        """
+        return np.stack([keys >> 16, keys >> 8, keys], axis=-1).astype(np.uint8)
 
-        disp_img = Image.new("L", (width, height))
-        disp_img.putdata(contraharmonic_filtered_image)
+    def count_colors(image_data: np.ndarray) -> int:
+        """count the unique colors of the image in linear time
 
-        return disp_img
+        Large images mark their packed 24-bit color keys in a bitmap of every
+        possible color instead of sorting them.
+
+        Args:
+            image_data (np.ndarray): (height, width, 3) image data
+
+        Returns:
+            int: number of unique colors
+        """
+        keys = ImageProcessor.get_color_keys(image_data)
+        if len(keys) < 1 << 20:
+            return len(np.unique(keys))
 
-    def get_uncompressed_image_size(
-        image_data: list[tuple[int, int, int]]
-    ) -> dict[str, float]:
+        seen = np.zeros(1 << 24, dtype=bool)
+        seen[keys] = True
+
+        return int(np.count_nonzero(seen))
+
+    def get_uncompressed_image_size(image_data: np.ndarray) -> dict[str, float]:
         """get the uncompressed image size
 
         Args:
-            image_data (list[tuple[int, int, int]]): image data
+            image_data (np.ndarray): (height, width, 3) image data
 
         Returns:
             dict[str, float]: size info
         """
-        palette = []
-        for data in image_data:
-            if data not in palette:
-                palette.append(data)
+        n_pixels = image_data.shape[0] * image_data.shape[1]
+        n_colors = ImageProcessor.count_colors(image_data)
 
-        palette_color_bits = len(bin(len(palette) - 1)) - 2
+        palette_color_bits = max((n_colors - 1).bit_length(), 1)
 
         return {
-            "image size": len(image_data) * palette_color_bits / 8,
-            "palette size": len(palette) * 3,  # 3 byte color
+            "image size": n_pixels * palette_color_bits / 8,
+            "palette size": n_colors * 3,  # 3 byte color
         }
 
     def run_length_encoding(
-        image_data: list[tuple[int, int, int]]
-    ) -> tuple[list[int], list[tuple[int, int, int]], dict[str, float]]:
+        image_data: np.ndarray,
+    ) -> tuple[dict[str, np.ndarray], np.ndarray, dict[str, float]]:
         """apply the run length encoding to the image data
 
+        Runs are found on packed 24-bit color keys, and run colors are mapped to
+        palette indices with np.unique, so the palette is sorted by color.
+
         Args:
-            image_data (list[tuple[int, int, int]]): image data
+            image_data (np.ndarray): (height, width, 3) image data
 
         Returns:
-            tuple[list[int], list[tuple[int, int, int]], dict[str, float]]: rle data
+            tuple[dict[str, np.ndarray], np.ndarray, dict[str, float]]: rle data
+                (uint32 run "counts" and palette "indices"), (colors, 3) palette
+                and size info
         """
-        palette = []
-        rle_encoded_data = list()
-        last_color = -1
-        count = 0
-        highest_count = 1
+        keys = ImageProcessor.get_color_keys(image_data)
 
         # do the run length encoding
-        for data in image_data:
-            if data not in palette:
-                palette.append(data)
-
-            if data == last_color:
-                count += 1
-                if count > highest_count:
-                    highest_count = count
-            else:
-                if last_color != -1:
-                    rle_encoded_data.append(count)
-                    rle_encoded_data.append(palette.index(last_color))
-                last_color = data
-                count = 1
-        rle_encoded_data.append(count)
-        rle_encoded_data.append(palette.index(last_color))
-
-        highest_count_bits = len(bin(highest_count)) - 2
-        # palette_color_bits = len(bin(len(palette) - 1)) - 2
+        run_starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+        counts = np.diff(np.append(run_starts, len(keys))).astype(np.uint32)
+        palette_keys, indices = np.unique(keys[run_starts], return_inverse=True)
+
+        rle_encoded_data = {
+            "counts": counts,
+            "indices": indices.astype(np.uint32),
+        }
+        palette = ImageProcessor.get_key_colors(palette_keys)
+
+        highest_count_bits = int(counts.max()).bit_length()
 
         size_info = {
-            "image size": highest_count_bits * len(rle_encoded_data) / 8,
+            "image size": highest_count_bits * 2 * len(counts) / 8,
             "palette size": len(palette) * 3,  # 3 byte color
         }
 
         return rle_encoded_data, palette, size_info
 
+    def decode_runs(
+        rle_data: dict[str, np.ndarray],
+        palette: np.ndarray,
+        pixels: np.ndarray,
+        position: int = 0,
+    ) -> int:
+        """expand runs into a preallocated pixel buffer
+
+        Args:
+            rle_data (dict[str, np.ndarray]): run "counts" and palette "indices"
+            palette (np.ndarray): (colors, channels) palette
+            pixels (np.ndarray): (width * height, channels) buffer to write to
+            position (int, optional): pixel to start writing at. Defaults to 0.
+
+        Returns:
+            int: pixel after the last written run
+        """
+        indices = np.repeat(rle_data["indices"], rle_data["counts"])
+        end = position + len(indices)
+        if end > len(pixels):
+            raise Exception("Run-length data has more pixels than the image.")
+        np.take(palette, indices, axis=0, out=pixels[position:end])
+
+        return end
+
     def run_length_decode(
-        rle_data: list[int],
-        palette: list[tuple[int, int, int]],
+        rle_data: dict[str, np.ndarray],
+        palette: np.ndarray,
         width: int,
         height: int,
     ) -> Image:
         """decode rle encoded data
 
         Args:
-            rle_data (list[int]): rle encoded data
-            palette (list[tuple[int, int, int]]): image palette
+            rle_data (dict[str, np.ndarray]): rle encoded data
+            palette (np.ndarray): (colors, 3) image palette
             width (int): width of the image
             height (int): height of the image
 
         Returns:
             Image: decoded image
         """
-        image_data = list()
-        for i in range(0, len(rle_data), 2):
-            for j in range(rle_data[i]):
-                image_data.append(palette[rle_data[i + 1]])
+        image_data = np.zeros((height, width, 3), dtype=np.uint8)
+        ImageProcessor.decode_runs(rle_data, palette, image_data.reshape(-1, 3))
 
-        disp_img = Image.new("RGB", (width, height))
-        disp_img.putdata(image_data)
+        return Image.fromarray(image_data)
 
-        return disp_img
+    def iter_run_length_decode(
+        rle_chunks: Iterable[dict[str, np.ndarray]],
+        palette: np.ndarray,
+        width: int,
+        height: int,
+    ) -> Iterator[tuple[Image, int]]:
+        """decode rle encoded data one chunk of runs at a time, for progressive
+        rendering of streamed data
 
-    def huffman_coding(
-        image_data: list[tuple[int, int, int]]
-    ) -> tuple[str, dict[tuple[int, int, int], str], dict[str, float]]:
-        """do the huffman coding for the image data
+        Every chunk is written into the same buffer, which the yielded RGBA image
+        shares, so the image shows all the runs decoded so far without copying.
 
         Args:
-            image_data (list[tuple[int, int, int]]): image data
+            rle_chunks (Iterable[dict[str, np.ndarray]]): consecutive chunks of
+                rle encoded data
+            palette (np.ndarray): (colors, 3) image palette
+            width (int): width of the image
+            height (int): height of the image
 
-        Returns:
-            tuple[str, dict[tuple[int, int, int], str], dict[str, float]]: huffman coded data info
+        Yields:
+            Iterator[tuple[Image, int]]: decoded image and number of decoded
+                pixels after each chunk
         """
+        image_data = np.zeros((height, width, 4), dtype=np.uint8)
+        image_data[:, :, 3] = 255
+        image = Image.frombuffer(
+            "RGBA", (width, height), image_data, "raw", "RGBA", 0, 1
+        )
+        rgba_palette = np.column_stack(
+            [palette, np.full(len(palette), 255, dtype=np.uint8)]
+        )
 
-        class Node:
-            def __init__(self, value, key=None, left=None, right=None) -> None:
-                self.value = value
-                self.key = key
-                self.left = left
-                self.right = right
+        position = 0
+        for rle_data in rle_chunks:
+            position = ImageProcessor.decode_runs(
+                rle_data, rgba_palette, image_data.reshape(-1, 4), position
+            )
+            yield image, position
 
-        # create frequency table
-        freq_table = dict()
-        for data in image_data:
-            if data in freq_table:
-                freq_table[data] += 1
-            else:
-                freq_table[data] = 1
-        freq_table = dict(sorted(freq_table.items(), key=lambda item: item[1]))
+    def get_huffman_code_lengths(frequencies: np.ndarray) -> np.ndarray:
+        """build the huffman tree with a heap and get the depth of every leaf
 
-        # create the huffman codes
-        heap = [Node(freq_table[key], key) for key in freq_table]
-        # create the tree
-        while len(heap) > 1:
-            left = heap.pop(0)
-            right = heap.pop(0)
-            entry = Node(left.value + right.value, left=left, right=right)
-            for i in range(len(heap)):
-                if heap[i].value > entry.value:
-                    heap.insert(i, entry)
-                    break
-                if i == len(heap) - 1:
-                    heap.append(entry)
-            if len(heap) == 0:
-                heap = [entry]
-                break
-
-        # map the codes
-        huffman_codes = dict()
+        Ties are broken by age, leaves first in the given order and then merged
+        nodes in the order they were made, so equal inputs give equal trees.
+
+        Args:
+            frequencies (np.ndarray): frequency of each symbol
+
+        Returns:
+            np.ndarray: uint8 code length of each symbol
+        """
+        n_symbols = len(frequencies)
         # special case when there is only one color to code
-        if not heap[0].left and not heap[0].right:
-            huffman_codes[heap[0].key] = "0"
-        # populate huffman codes dict
-        heap[0].key = ""
-        while len(heap) > 0:
-            node = heap.pop()
-            left = node.left
-            right = node.right
-            if left:
-                if left.key:
-                    huffman_codes[left.key] = "".join([node.key, "0"])
-                else:
-                    left.key = "".join([node.key, "0"])
-                    heap.append(left)
-            if right:
-                if right.key:
-                    huffman_codes[right.key] = "".join([node.key, "1"])
-                else:
-                    right.key = "".join([node.key, "1"])
-                    heap.append(right)
+        if n_symbols == 1:
+            return np.ones(1, dtype=np.uint8)
+
+        parents = np.zeros(2 * n_symbols - 1, dtype=np.int64)
+        heap = [(int(value), node) for node, value in enumerate(frequencies)]
+        heapq.heapify(heap)
+        for node in range(n_symbols, 2 * n_symbols - 1):
+            left_value, left = heapq.heappop(heap)
+            right_value, right = heapq.heappop(heap)
+            parents[left] = parents[right] = node
+            heapq.heappush(heap, (left_value + right_value, node))
+
+        # children are always made before their parent, so walk back from the root
+        depths = np.zeros(2 * n_symbols - 1, dtype=np.int64)
+        for node in range(2 * n_symbols - 3, -1, -1):
+            depths[node] = depths[parents[node]] + 1
+
+        return depths[:n_symbols].astype(np.uint8)
+
+    def get_canonical_codes(code_lengths: np.ndarray) -> np.ndarray:
+        """assign canonical huffman codes, shorter codes first and then in symbol
+        order within a length
+
+        Args:
+            code_lengths (np.ndarray): code length of each symbol, sorted by
+                (length, symbol)
+
+        Returns:
+            np.ndarray: uint64 code of each symbol
+        """
+        codes = np.zeros(len(code_lengths), dtype=np.uint64)
+        code = 0
+        for i in range(1, len(code_lengths)):
+            code = (code + 1) << int(code_lengths[i] - code_lengths[i - 1])
+            codes[i] = code
+
+        return codes
+
+    def pack_codes(
+        codes: np.ndarray, code_lengths: np.ndarray, chunk_size: int = 1 << 18
+    ) -> bytes:
+        """write variable length codes one after another as packed bits, most
+        significant bit first, with the last byte padded with zeros
+
+        Args:
+            codes (np.ndarray): uint64 code of each symbol to write
+            code_lengths (np.ndarray): bit length of each code
+            chunk_size (int, optional): codes expanded to bits at a time.
+                Defaults to 1 << 18.
+
+        Returns:
+            bytes: packed codes
+        """
+        packed = []
+        carry = np.zeros(0, dtype=np.uint8)
+        for start in range(0, len(codes), chunk_size):
+            chunk_codes = codes[start : start + chunk_size]
+            chunk_lengths = code_lengths[start : start + chunk_size].astype(np.int64)
+
+            # right shift that brings every bit of every code down to bit 0
+            shifts = np.repeat(np.cumsum(chunk_lengths) - 1, chunk_lengths)
+            shifts -= np.arange(len(shifts))
+            bits = np.repeat(chunk_codes, chunk_lengths) >> shifts.astype(np.uint64)
+
+            bits = np.concatenate([carry, (bits & 1).astype(np.uint8)])
+            full = len(bits) // 8 * 8
+            packed.append(np.packbits(bits[:full]).tobytes())
+            carry = bits[full:]
+        packed.append(np.packbits(carry).tobytes())
+
+        return b"".join(packed)
+
+    def get_huffman_codebook(
+        image_data: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """count the colors of the image as packed 24-bit keys and give them
+        canonical huffman codes
+
+        Args:
+            image_data (np.ndarray): (height, width, 3) image data
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: (colors, 3) palette and
+                code lengths in canonical order, and the palette index of every
+                pixel
+        """
+        keys, first_index, inverse, frequencies = np.unique(
+            ImageProcessor.get_color_keys(image_data),
+            return_index=True,
+            return_inverse=True,
+            return_counts=True,
+        )
+
+        # build the tree from the least frequent colors, first seen first
+        order = np.lexsort((first_index, frequencies))
+        code_lengths = np.empty(len(keys), dtype=np.uint8)
+        code_lengths[order] = ImageProcessor.get_huffman_code_lengths(
+            frequencies[order]
+        )
+
+        # canonical order: shorter codes first, then by color
+        canonical_order = np.lexsort((keys, code_lengths))
+        ranks = np.empty(len(keys), dtype=np.int64)
+        ranks[canonical_order] = np.arange(len(keys))
+
+        return (
+            ImageProcessor.get_key_colors(keys[canonical_order]),
+            code_lengths[canonical_order],
+            ranks[inverse.ravel()],
+        )
+
+    def huffman_coding(
+        image_data: np.ndarray,
+    ) -> tuple[bytes, dict[str, np.ndarray], dict[str, float]]:
+        """do the huffman coding for the image data
+
+        Colors are given canonical codes, so the codes are fully described by
+        the palette and the code lengths.
+
+        Args:
+            image_data (np.ndarray): (height, width, 3) image data
+
+        Returns:
+            tuple[bytes, dict[str, np.ndarray], dict[str, float]]: packed huffman
+                coded data, huffman codes ("palette" colors and their "code
+                lengths", in canonical order, plus the "sync offsets" bit
+                position of every "sync interval"-th pixel) and size info,
+                including the exact "bit length" of the coded data
+        """
+
+        palette, code_lengths, symbols = ImageProcessor.get_huffman_codebook(image_data)
+        codes = ImageProcessor.get_canonical_codes(code_lengths)
 
         # convert the image pixels to huffman codes
-        huffman_coded_image_data = ""
-        for pixel in image_data:
-            huffman_coded_image_data += huffman_codes[pixel]
+        pixel_code_lengths = code_lengths[symbols]
+        huffman_coded_image_data = ImageProcessor.pack_codes(
+            codes[symbols], pixel_code_lengths
+        )
+        bit_length = int(pixel_code_lengths.sum(dtype=np.int64))
 
-        huffman_codes_size = 0
-        for key in huffman_codes:
-            huffman_codes_size += len(huffman_codes[key])
+        # bit offset of every sync_interval-th pixel, where decoding can start
+        sync_interval = max(1, int(np.ceil(np.sqrt(len(symbols)))))
+        sync_offsets = np.add.reduceat(
+            pixel_code_lengths.astype(np.int64),
+            np.arange(0, len(symbols), sync_interval),
+        )
+        sync_offsets = np.concatenate([[0], np.cumsum(sync_offsets[:-1])])
 
+        huffman_codes = {
+            "palette": palette,
+            "code lengths": code_lengths,
+            "sync interval": sync_interval,
+            "sync offsets": sync_offsets,
+        }
         size_info = {
-            "image size": len(huffman_coded_image_data) / 8,
-            "huffman codes size": huffman_codes_size / 8
-            + len(huffman_codes) * 3,  # 3 byte color
+            "image size": bit_length / 8,
+            "huffman codes size": int(code_lengths.sum(dtype=np.int64)) / 8
+            + len(palette) * 3,  # 3 byte color
+            "bit length": bit_length,
         }
 
         return huffman_coded_image_data, huffman_codes, size_info
 
+    def get_huffman_decode_tables(
+        code_lengths: np.ndarray, lookup_bits: int = 12
+    ) -> dict[str, np.ndarray | int]:
+        """build the tables used to decode canonical huffman codes
+
+        Codes up to lookup_bits long are read with a single lookup on the next
+        lookup_bits bits. Longer codes are found by comparing the next
+        "max length" bits against the upper limit of each code length.
+
+        Args:
+            code_lengths (np.ndarray): code length of each symbol in canonical order
+            lookup_bits (int, optional): bits read per lookup. Defaults to 12.
+
+        Returns:
+            dict[str, np.ndarray | int]: decoding tables
+        """
+        max_length = int(code_lengths.max())
+        if max_length > 57:
+            raise Exception("Huffman codes longer than 57 bits are not supported.")
+        lookup_bits = min(lookup_bits, max_length)
+        codes = ImageProcessor.get_canonical_codes(code_lengths).astype(np.int64)
+        lengths = code_lengths.astype(np.int64)
+        symbols = np.arange(len(code_lengths))
+
+        # every lookup value starting with a short code maps to that code
+        short = lengths <= lookup_bits
+        spans = 1 << (lookup_bits - lengths[short])
+        lookup_length = np.zeros(1 << lookup_bits, dtype=np.int64)
+        lookup_symbol = np.zeros(1 << lookup_bits, dtype=np.int64)
+        lookup_length[: spans.sum()] = np.repeat(lengths[short], spans)
+        lookup_symbol[: spans.sum()] = np.repeat(symbols[short], spans)
+
+        # first code, first symbol and upper limit of every code length
+        counts = np.bincount(lengths, minlength=max_length + 1)[1:]
+        first_symbol = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        first_code = np.zeros(max_length, dtype=np.int64)
+        for length in range(2, max_length + 1):
+            first_code[length - 1] = (first_code[length - 2] + counts[length - 2]) << 1
+        bit_range = np.arange(max_length, 0, -1) - 1
+        limits = (first_code + counts) << bit_range
+
+        return {
+            "lookup bits": lookup_bits,
+            "lookup length": lookup_length,
+            "lookup symbol": lookup_symbol,
+            "max length": max_length,
+            "first code": first_code,
+            "first symbol": first_symbol,
+            "limits": limits,
+        }
+
     def huffman_decode(
-        huffman_data: str,
-        huffman_codes: dict[tuple[int, int, int], str],
+        huffman_data: bytes,
+        huffman_codes: dict[str, np.ndarray],
         width: int,
         height: int,
     ) -> Image:
         """decode the huffman encoded image data
 
+        Decoding starts at every sync offset at once, so each step decodes one
+        pixel of every sync interval with a table lookup.
+
         Args:
-            huffman_data (str): huffman encoded data
-            huffman_codes (dict[tuple[int, int, int], str]): huffman codes
+            huffman_data (bytes): packed huffman encoded data
+            huffman_codes (dict[str, np.ndarray]): canonical huffman codes
             width (int): image width
             height (int): image height
 
         Returns:
             Image: decoded image
         """
-        huffman_codes = {v: k for k, v in huffman_codes.items()}
-        image_data = list()
+        tables = ImageProcessor.get_huffman_decode_tables(huffman_codes["code lengths"])
+        lookup_bits = tables["lookup bits"]
+        max_length = tables["max length"]
+        n_pixels = width * height
+
+        interval = huffman_codes.get("sync interval", n_pixels)
+        positions = np.array(huffman_codes.get("sync offsets", [0]), dtype=np.int64)
+        n_lanes = len(positions)
+        last_lane_pixels = n_pixels - (n_lanes - 1) * interval
+
+        indices = np.empty((n_lanes, interval), dtype=np.int64)
+        data = np.frombuffer(huffman_data + bytes(8), dtype=np.uint8)
+        byte_offsets = np.arange(8)
+        for step in range(interval):
+            if step == last_lane_pixels:
+                positions = positions[:-1]
+
+            # next 64 bits of every lane, most significant bit first
+            window = data[(positions >> 3)[:, None] + byte_offsets].view(">u8")
+            window = window.ravel().astype(np.uint64) << (positions & 7).astype(
+                np.uint64
+            )
+
+            lookup = (window >> np.uint64(64 - lookup_bits)).astype(np.int64)
+            lengths = tables["lookup length"][lookup]
+            symbols = tables["lookup symbol"][lookup]
+
+            long = np.flatnonzero(lengths == 0)
+            if len(long):
+                value = (window[long] >> np.uint64(64 - max_length)).astype(np.int64)
+                length_index = np.searchsorted(tables["limits"], value, side="right")
+                lengths[long] = length_index + 1
+                symbols[long] = (
+                    tables["first symbol"][length_index]
+                    + (value >> (max_length - 1 - length_index))
+                    - tables["first code"][length_index]
+                )
 
-        current_string = ""
-        for bit in huffman_data:
-            current_string += bit
-            if current_string in huffman_codes:
-                image_data.append(huffman_codes[current_string])
-                current_string = ""
+            indices[: len(positions), step] = symbols
+            positions += lengths
 
-        disp_img = Image.new("RGB", (width, height))
-        disp_img.putdata(image_data)
+        indices = indices.ravel()[:n_pixels]
+        image_data = huffman_codes["palette"][indices].reshape(height, width, 3)
 
-        return disp_img
+        return Image.fromarray(image_data)
@@ -0,0 +1,419 @@
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from utils.image_parser import ImageParser
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED, ZIP_LZMA, LZMACompressor
+import hashlib
+import numpy as np
+import os
+import pathlib
+import struct
+import threading
+import time
+import zlib
+
+
+class IvpArchiveWriter:
+    """
+    Writer of .ivp (zip) archives from already compressed entries, so entries
+    can be compressed elsewhere and written in any order. ZIP64 records are
+    added when sizes, offsets or the number of entries need them.
+    """
+
+    local_header = struct.Struct("<4s5H3L2H")
+    central_header = struct.Struct("<4s6H3L5H2L")
+    end_record = struct.Struct("<4s4H2LH")
+    zip64_end_record = struct.Struct("<4sQ2H2L4Q")
+    zip64_locator = struct.Struct("<4sLQL")
+
+    def __init__(self, location: str) -> None:
+        """
+        Args:
+            location (str): location of the archive, overwritten if it exists
+        """
+        self.file = open(location, "wb")
+        self.central_directory = []
+        self.bytes_written = 0
+
+    def __enter__(self) -> "IvpArchiveWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def write_bytes(self, data: bytes) -> None:
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def write_entry(self, entry: dict[str, str | int | bytes]) -> None:
+        """write a compressed entry
+
+        Args:
+            entry (dict[str, str | int | bytes]): entry from IvpArchive.compress_entry
+        """
+        name = entry["name"].encode("utf-8")
+        flags = 0 if entry["name"].isascii() else 0x800  # utf-8 name
+        version = 20
+        if entry["compress type"] == ZIP_LZMA:
+            flags |= 0x02  # end of stream marker, as written by zipfile
+            version = 63
+
+        # sizes go to a zip64 extra field when they do not fit in 32 bits
+        zip64 = max(entry["size"], len(entry["data"])) >= 0xFFFFFFFF
+        extra = b""
+        sizes = (len(entry["data"]), entry["size"])
+        if zip64:
+            extra = struct.pack("<2H2Q", 1, 16, entry["size"], len(entry["data"]))
+            sizes = (0xFFFFFFFF, 0xFFFFFFFF)
+            version = max(version, 45)
+
+        offset = self.bytes_written
+        self.write_bytes(
+            self.local_header.pack(
+                b"PK\x03\x04",
+                version,
+                flags,
+                entry["compress type"],
+                entry["dos time"],
+                entry["dos date"],
+                entry["crc"],
+                *sizes,
+                len(name),
+                len(extra),
+            )
+        )
+        self.write_bytes(name)
+        self.write_bytes(extra)
+        self.write_bytes(entry["data"])
+
+        self.central_directory.append(
+            (name, version, flags, entry, len(entry["data"]), offset)
+        )
+
+    def close(self) -> None:
+        """write the central directory and close the archive"""
+        if self.file.closed:
+            return
+
+        directory_offset = self.bytes_written
+        for (
+            name,
+            version,
+            flags,
+            entry,
+            compressed_size,
+            offset,
+        ) in self.central_directory:
+            fields = [entry["size"], compressed_size, offset]
+            extra_values = [value for value in fields if value >= 0xFFFFFFFF]
+            extra = b""
+            if extra_values:
+                extra = struct.pack(
+                    f"<2H{len(extra_values)}Q", 1, 8 * len(extra_values), *extra_values
+                )
+                fields = [min(value, 0xFFFFFFFF) for value in fields]
+                version = max(version, 45)
+
+            self.write_bytes(
+                self.central_header.pack(
+                    b"PK\x01\x02",
+                    version | 3 << 8,  # made by unix
+                    version,
+                    flags,
+                    entry["compress type"],
+                    entry["dos time"],
+                    entry["dos date"],
+                    entry["crc"],
+                    fields[1],
+                    fields[0],
+                    len(name),
+                    len(extra),
+                    0,
+                    0,
+                    0,
+                    0o100644 << 16,  # regular file, rw-r--r--
+                    fields[2],
+                )
+            )
+            self.write_bytes(name)
+            self.write_bytes(extra)
+
+        n_entries = len(self.central_directory)
+        directory_size = self.bytes_written - directory_offset
+        if (
+            n_entries >= 0xFFFF
+            or directory_size >= 0xFFFFFFFF
+            or directory_offset >= 0xFFFFFFFF
+        ):
+            zip64_offset = self.bytes_written
+            self.write_bytes(
+                self.zip64_end_record.pack(
+                    b"PK\x06\x06",
+                    self.zip64_end_record.size - 12,
+                    45,
+                    45,
+                    0,
+                    0,
+                    n_entries,
+                    n_entries,
+                    directory_size,
+                    directory_offset,
+                )
+            )
+            self.write_bytes(self.zip64_locator.pack(b"PK\x06\x07", 0, zip64_offset, 1))
+
+        self.write_bytes(
+            self.end_record.pack(
+                b"PK\x05\x06",
+                0,
+                0,
+                min(n_entries, 0xFFFF),
+                min(n_entries, 0xFFFF),
+                min(directory_size, 0xFFFFFFFF),
+                min(directory_offset, 0xFFFFFFFF),
+                0,
+            )
+        )
+        self.file.close()
+
+
+class IvpArchive:
+    image_extensions = (".pcx", ".jpg", ".jpeg", ".png", ".bmp", ".ivc")
+    # formats that are already compressed gain almost nothing from lzma
+    stored_extensions = (".jpg", ".jpeg", ".png", ".ivc")
+
+    def get_compress_type(location: str, method: str = "lzma") -> int:
+        """choose the zip compression of an entry from its file type
+
+        Args:
+            location (str): location of the file
+            method (str, optional): "lzma" or "deflate", for files that are not
+                already compressed. Defaults to "lzma".
+
+        Returns:
+            int: zipfile compression constant
+        """
+        if pathlib.Path(location).suffix.lower() in IvpArchive.stored_extensions:
+            return ZIP_STORED
+
+        return {"lzma": ZIP_LZMA, "deflate": ZIP_DEFLATED}[method]
+
+    def hash_file(location: str) -> str:
+        """get the sha256 digest of a file's content
+
+        Args:
+            location (str): location of the file
+
+        Returns:
+            str: hex digest
+        """
+        with open(location, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+
+    def compress_entry(
+        location: str, compress_type: int
+    ) -> dict[str, str | int | bytes]:
+        """read and compress a file into a zip entry
+
+        Args:
+            location (str): location of the file
+            compress_type (int): zipfile compression constant
+
+        Returns:
+            dict[str, str | int | bytes]: entry name, compressed data, crc,
+                uncompressed size, compression and dos timestamp
+        """
+        with open(location, "rb") as file:
+            data = file.read()
+
+        # raw streams, framed the same way zipfile does
+        if compress_type == ZIP_DEFLATED:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            compressed_data = compressor.compress(data) + compressor.flush()
+        elif compress_type == ZIP_LZMA:
+            compressor = LZMACompressor()
+            compressed_data = compressor.compress(data) + compressor.flush()
+        else:
+            compressed_data = data
+
+        year, month, day, hour, minute, second = time.localtime(
+            os.path.getmtime(location)
+        )[:6]
+        year = max(year, 1980)
+
+        return {
+            "name": os.path.basename(location),
+            "data": compressed_data,
+            "crc": zlib.crc32(data),
+            "size": len(data),
+            "compress type": compress_type,
+            "dos time": hour << 11 | minute << 5 | second // 2,
+            "dos date": (year - 1980) << 9 | month << 5 | day,
+        }
+
+    def build(
+        folder_path: str,
+        archive_path: str,
+        method: str = "lzma",
+        workers: int | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> dict[str, int | float | list[str]]:
+        """compress the images of a folder into an .ivp archive
+
+        Files are hashed and compressed on a pool of threads (hashlib, zlib and
+        lzma release the GIL), and byte-identical duplicates are only stored once.
+
+        Args:
+            folder_path (str): folder with only image files
+            archive_path (str): location of the archive
+            method (str, optional): "lzma" or "deflate", for images that are not
+                already compressed. Defaults to "lzma".
+            workers (int | None, optional): number of threads. Defaults to None
+                (the number of processors).
+            progress (Callable[[int, int], None] | None, optional): called with the
+                number of written and unique files after each entry. Defaults to None.
+
+        Returns:
+            dict[str, int | float | list[str]]: archive report
+        """
+        start_time = time.perf_counter()
+        files = sorted(
+            file
+            for file in os.listdir(folder_path)
+            if os.path.isfile(os.path.join(folder_path, file))
+            and os.path.abspath(os.path.join(folder_path, file))
+            != os.path.abspath(archive_path)
+        )
+        for file in files:
+            if pathlib.Path(file).suffix.lower() not in IvpArchive.image_extensions:
+                raise Exception("Folder should only contain image files")
+        locations = [os.path.join(folder_path, file) for file in files]
+
+        workers = workers or os.cpu_count()
+        with ThreadPoolExecutor(workers) as pool:
+            # keep the first file of every content hash
+            unique_files = {}
+            duplicates = []
+            for location, digest in zip(
+                locations, pool.map(IvpArchive.hash_file, locations)
+            ):
+                if digest in unique_files:
+                    duplicates.append(os.path.basename(location))
+                else:
+                    unique_files[digest] = location
+            unique_locations = list(unique_files.values())
+
+            bytes_in = 0
+            with IvpArchiveWriter(archive_path) as writer:
+                # entries are written in order, with a bounded number compressed ahead
+                pending = deque()
+                for i in range(len(unique_locations) + 2 * workers):
+                    if i < len(unique_locations):
+                        location = unique_locations[i]
+                        pending.append(
+                            pool.submit(
+                                IvpArchive.compress_entry,
+                                location,
+                                IvpArchive.get_compress_type(location, method),
+                            )
+                        )
+                    if i >= 2 * workers and pending:
+                        entry = pending.popleft().result()
+                        writer.write_entry(entry)
+                        bytes_in += entry["size"]
+                        if progress:
+                            progress(i - 2 * workers + 1, len(unique_locations))
+
+        seconds = time.perf_counter() - start_time
+
+        return {
+            "files": len(files),
+            "entries": len(unique_locations),
+            "duplicates": duplicates,
+            "bytes in": bytes_in,
+            "bytes out": writer.bytes_written,
+            "seconds": seconds,
+            "throughput": bytes_in / 2**20 / seconds if seconds else 0.0,  # MiB/s
+        }
+
+
+class IvpArchiveReader:
+    """
+    Random-access reader of .ivp archives. Entries are listed from the zip
+    central directory and read straight into memory, and each image is only
+    decoded when it is first loaded. Decoded images are kept in an LRU cache
+    with a byte budget.
+    """
+
+    def __init__(self, location: str, cache_bytes: int = 512 * 2**20) -> None:
+        """
+        Args:
+            location (str): location of the archive
+            cache_bytes (int, optional): pixel bytes of decoded images to keep.
+                Defaults to 512 MiB.
+        """
+        self.location = location
+        self.zip = ZipFile(location, "r")
+        self.entries = [
+            info.filename
+            for info in self.zip.infolist()
+            if not info.is_dir()
+            and pathlib.Path(info.filename).suffix.lower()
+            in IvpArchive.image_extensions
+        ]
+
+        self.cache = OrderedDict()
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "IvpArchiveReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def get_names(self) -> list[str]:
+        """get the image entries in archive order
+
+        Returns:
+            list[str]: entry names
+        """
+        return list(self.entries)
+
+    def load(self, name: str) -> dict[str, int | np.ndarray | str | None]:
+        """decode an image entry, or get it from the cache
+
+        Args:
+            name (str): entry name
+
+        Returns:
+            dict[str, int | np.ndarray | str | None]: image information, like
+                ImageParser.parse_image
+        """
+        with self.lock:
+            if name in self.cache:
+                self.cache.move_to_end(name)
+                return self.cache[name]
+
+            data = self.zip.read(name)
+
+        image_info = ImageParser.parse_image(name, data=data)
+        size = image_info["pixel_data"].nbytes
+
+        with self.lock:
+            if name not in self.cache:
+                self.cache[name] = image_info
+                self.cached_bytes += size
+            # the newest image is kept even if it is over the budget alone
+            while self.cached_bytes > self.cache_bytes and len(self.cache) > 1:
+                _, evicted = self.cache.popitem(last=False)
+                self.cached_bytes -= evicted["pixel_data"].nbytes
+
+            return self.cache[name]
+
+    def close(self) -> None:
+        """close the archive and drop the cache"""
+        self.zip.close()
+        self.cache.clear()
+        self.cached_bytes = 0
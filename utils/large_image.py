@@ -0,0 +1,787 @@
+from collections.abc import Callable, Iterator
+from PIL import Image
+from utils.image_parser import PcxHeader, PcxImage
+from utils.image_processor import ImageProcessor
+from utils.tile_scheduler import TileScheduler
+import io
+import numpy as np
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+
+class PngWriter:
+    """
+    Writer of 8-bit grayscale or rgb png files, a band of rows at a time. Rows
+    are compressed into IDAT chunks as they are written, so the image never has
+    to be in memory as a whole.
+    """
+
+    chunk_size = 1 << 20  # compressed bytes per IDAT chunk
+
+    def __init__(self, location: str, width: int, height: int, channels: int = 1):
+        """
+        Args:
+            location (str): location of the png, overwritten if it exists
+            width (int): image width
+            height (int): image height
+            channels (int, optional): 1 for grayscale or 3 for rgb. Defaults to 1.
+        """
+        self.file = open(location, "wb")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(6)
+        self.pending = b""
+
+        color_type = 0 if channels == 1 else 2
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self.write_chunk(
+            b"IHDR", struct.pack(">2I5B", width, height, 8, color_type, 0, 0, 0)
+        )
+
+    def __enter__(self) -> "PngWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def get_chunk(chunk_type: bytes, data: bytes) -> bytes:
+        """get a png chunk: length, type, data and crc"""
+        crc = zlib.crc32(data, zlib.crc32(chunk_type))
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+    def write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+        self.file.write(PngWriter.get_chunk(chunk_type, data))
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """compress the next rows of the image
+
+        Args:
+            rows (np.ndarray): (lines, width) or (lines, width, 3) uint8 pixels
+        """
+        rows = rows.reshape(len(rows), -1)
+        # every row starts with its filter type, 0 for none
+        filtered = np.zeros((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 1:] = rows
+        self.pending += self.compressor.compress(filtered.tobytes())
+        self.rows_written += len(rows)
+
+        while len(self.pending) >= PngWriter.chunk_size:
+            self.write_chunk(b"IDAT", self.pending[: PngWriter.chunk_size])
+            self.pending = self.pending[PngWriter.chunk_size :]
+
+    def close(self) -> None:
+        """write the remaining data and close the file"""
+        if self.file.closed:
+            return
+
+        if self.rows_written != self.height:
+            self.file.close()
+            raise Exception(
+                f"Only {self.rows_written} of {self.height} rows were written."
+            )
+
+        self.pending += self.compressor.flush()
+        self.write_chunk(b"IDAT", self.pending)
+        self.write_chunk(b"IEND", b"")
+        self.file.close()
+
+
+class PcxWriter:
+    """
+    Writer of 8-bit pcx files, a band of rows at a time. Grayscale images are
+    written as one indexed plane with a gray eof palette, and rgb images as
+    three color planes.
+    """
+
+    def __init__(self, location: str, width: int, height: int, channels: int = 1):
+        """
+        Args:
+            location (str): location of the pcx, overwritten if it exists
+            width (int): image width, at most 65534
+            height (int): image height, at most 65536
+            channels (int, optional): 1 for grayscale or 3 for rgb. Defaults to 1.
+        """
+        # the even number of bytes per line has to fit the 16-bit header field
+        if width > (1 << 16) - 2 or height > 1 << 16:
+            raise Exception("Pcx images can be at most 65534 x 65536 pixels.")
+
+        self.file = open(location, "wb")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        # scanlines hold an even number of bytes
+        self.bytes_per_line = width + width % 2
+        self.rows_written = 0
+
+        self.file.write(
+            PcxHeader.layout.pack(
+                10,  # manufacturer
+                5,  # version
+                1,  # run length encoding
+                8,  # bits per pixel
+                0,
+                0,
+                width - 1,
+                height - 1,
+                72,
+                72,
+                bytes(48),
+                0,
+                channels,
+                self.bytes_per_line,
+                2 if channels == 1 else 1,  # grayscale or color palette info
+                0,
+                0,
+                bytes(54),
+            )
+        )
+
+    def __enter__(self) -> "PcxWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def encode_scanlines(scanlines: np.ndarray) -> bytes:
+        """run length encode scanlines, with runs broken at the end of every line
+
+        Args:
+            scanlines (np.ndarray): (lines, bytes_per_line) uint8 scanline bytes
+
+        Returns:
+            bytes: encoded scanlines
+        """
+        line_length = scanlines.shape[1]
+        values = scanlines.ravel()
+
+        is_start = np.ones(len(values), dtype=bool)
+        is_start[1:] = values[1:] != values[:-1]
+        is_start[::line_length] = True
+        starts = np.flatnonzero(is_start)
+        lengths = np.diff(np.append(starts, len(values)))
+
+        # runs are at most 63 bytes long
+        n_pieces = -(-lengths // 63)
+        values = np.repeat(values[starts], n_pieces)
+        counts = np.full(len(values), 63)
+        counts[np.cumsum(n_pieces) - 1] = lengths - 63 * (n_pieces - 1)
+
+        # single bytes below 0xC0 are written as they are
+        has_marker = (counts > 1) | (values >= 0xC0)
+        positions = np.cumsum(1 + has_marker) - 1 - has_marker
+        encoded = np.empty(len(values) + np.count_nonzero(has_marker), np.uint8)
+        encoded[positions[has_marker]] = 0xC0 | counts[has_marker]
+        encoded[positions + has_marker] = values
+
+        return encoded.tobytes()
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """encode the next rows of the image
+
+        Args:
+            rows (np.ndarray): (lines, width) or (lines, width, 3) uint8 pixels
+        """
+        scanlines = np.zeros(
+            (len(rows), self.channels, self.bytes_per_line), dtype=np.uint8
+        )
+        if self.channels == 1:
+            scanlines[:, 0, : self.width] = rows
+        else:
+            scanlines[:, :, : self.width] = rows.transpose(0, 2, 1)
+
+        self.file.write(
+            PcxWriter.encode_scanlines(scanlines.reshape(-1, self.bytes_per_line))
+        )
+        self.rows_written += len(rows)
+
+    def close(self) -> None:
+        """write the palette and close the file"""
+        if self.file.closed:
+            return
+
+        if self.rows_written != self.height:
+            self.file.close()
+            raise Exception(
+                f"Only {self.rows_written} of {self.height} rows were written."
+            )
+
+        if self.channels == 1:
+            self.file.write(b"\x0c")
+            self.file.write(np.repeat(np.arange(256, dtype=np.uint8), 3).tobytes())
+        self.file.close()
+
+
+class PngReader:
+    """
+    Reader of 8-bit, non interlaced png files, a band of rows at a time. The
+    IDAT chunks are inflated only as far as the next band, and PIL unfilters the
+    band from a small png of its rows, led by the last row of the previous band
+    so rows filtered against the row above decode the same as in the whole image.
+    """
+
+    # png color types and their channels
+    color_channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+    def __init__(self, location: str):
+        """
+        Args:
+            location (str): location of the png
+        """
+        self.file = open(location, "rb")
+        self.palette = None
+        self.first_data = None
+        try:
+            if self.file.read(8) != b"\x89PNG\r\n\x1a\n":
+                raise Exception("Error opening the png. Wrong signature.")
+
+            # the header, and the palette when there is one, come before the pixels
+            while self.first_data is None:
+                chunk_type, data = self.read_chunk()
+                match chunk_type:
+                    case b"IHDR":
+                        (
+                            self.width,
+                            self.height,
+                            bit_depth,
+                            self.color_type,
+                            _,
+                            _,
+                            interlace,
+                        ) = struct.unpack(">2I5B", data)
+                    case b"PLTE":
+                        self.palette = data
+                    case b"IDAT":
+                        self.first_data = data
+                    case b"IEND":
+                        raise Exception("Error opening the png. It has no pixels.")
+        except BaseException:
+            self.file.close()
+            raise
+
+        if bit_depth != 8 or interlace:
+            self.file.close()
+            raise Exception(
+                "Only 8-bit, non interlaced png files can be read a band at a time."
+            )
+        self.channels = PngReader.color_channels[self.color_type]
+
+    def __enter__(self) -> "PngReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def read_chunk(self) -> tuple[bytes, bytes]:
+        header = self.file.read(8)
+        if len(header) < 8:
+            raise Exception("Error opening the png. File is too short.")
+        length, chunk_type = struct.unpack(">I4s", header)
+        data = self.file.read(length)
+        crc = self.file.read(4)
+        if len(crc) < 4:
+            raise Exception("Error opening the png. File is too short.")
+        if struct.unpack(">I", crc)[0] != zlib.crc32(data, zlib.crc32(chunk_type)):
+            raise Exception(
+                f"Error opening the png. The {chunk_type.decode('latin-1')} chunk "
+                "is corrupted."
+            )
+
+        return chunk_type, data
+
+    def iter_data(self) -> Iterator[bytes]:
+        """read the compressed pixels, one IDAT chunk at a time
+
+        Yields:
+            Iterator[bytes]: data of the next IDAT chunk
+        """
+        yield self.first_data
+        while True:
+            chunk_type, data = self.read_chunk()
+            if chunk_type == b"IEND":
+                return
+            if chunk_type == b"IDAT":
+                yield data
+
+    def decode_rows(self, previous: bytes, lines: bytes, n_lines: int) -> Image:
+        """unfilter scanlines with PIL
+
+        Args:
+            previous (bytes): unfiltered scanline above the lines, with its filter
+                type byte
+            lines (bytes): filtered scanlines, with their filter type bytes
+            n_lines (int): number of scanlines in lines
+
+        Returns:
+            Image: the previous scanline and the lines
+        """
+        header = struct.pack(
+            ">2I5B", self.width, n_lines + 1, 8, self.color_type, 0, 0, 0
+        )
+        png = b"\x89PNG\r\n\x1a\n" + PngWriter.get_chunk(b"IHDR", header)
+        if self.palette is not None:
+            png += PngWriter.get_chunk(b"PLTE", self.palette)
+        png += PngWriter.get_chunk(b"IDAT", zlib.compress(previous + lines, 0))
+        png += PngWriter.get_chunk(b"IEND", b"")
+
+        image = Image.open(io.BytesIO(png))
+        image.load()
+
+        return image
+
+    def iter_rows(self, band_rows: int) -> Iterator[np.ndarray]:
+        """decode the png a band of rows at a time
+
+        Args:
+            band_rows (int): rows per band
+
+        Yields:
+            Iterator[np.ndarray]: (lines, width, 3) rgb pixels, the last band may be
+                shorter
+        """
+        line_length = self.width * self.channels + 1
+        decompressor = zlib.decompressobj()
+        data = self.iter_data()
+        # the rows above the image are zeros
+        previous = bytes(line_length)
+
+        for top in range(0, self.height, band_rows):
+            n_lines = min(band_rows, self.height - top)
+            lines = bytearray()
+            while len(lines) < n_lines * line_length:
+                compressed = decompressor.unconsumed_tail or next(data, b"")
+                if not compressed:
+                    raise Exception("Error opening the png. Pixel data is too short.")
+                lines += decompressor.decompress(
+                    compressed, n_lines * line_length - len(lines)
+                )
+
+            image = self.decode_rows(previous, bytes(lines), n_lines)
+            # unfiltered 8-bit samples are the pixel values PIL gives back
+            previous = b"\x00" + np.asarray(image)[-1].tobytes()
+            yield np.asarray(image.convert("RGB"))[1:]
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class BmpReader:
+    """
+    Reader of uncompressed 8-bit palette, 24-bit and 32-bit bmp files, a band of
+    rows at a time. The pixel array is mapped with np.memmap, so only the rows of
+    a band are read.
+    """
+
+    def __init__(self, location: str):
+        """
+        Args:
+            location (str): location of the bmp
+        """
+        with open(location, "rb") as file:
+            header = file.read(14 + 40)
+            if len(header) < 14 + 40 or header[:2] != b"BM":
+                raise Exception("Error opening the bmp. Wrong signature.")
+            pixel_offset, header_size = struct.unpack("<2I", header[10:18])
+            width, height, _, bit_count, compression = struct.unpack(
+                "<2i2HI", header[18:34]
+            )
+            colors_used = struct.unpack("<I", header[46:50])[0]
+            # color masks follow the 40-byte header, or are part of a longer one
+            masks = struct.unpack("<3I", file.read(12)) if compression == 3 else None
+            file.seek(14 + header_size)
+            palette = file.read(4 * (colors_used or 256)) if bit_count == 8 else None
+
+        # bit fields are only read when they are the usual 8 bits per color
+        is_bgr = compression == 0 or (
+            bit_count == 32 and masks == (0xFF0000, 0xFF00, 0xFF)
+        )
+        if header_size < 40 or bit_count not in (8, 24, 32) or not is_bgr:
+            raise Exception(
+                "Only uncompressed 8-bit, 24-bit and 32-bit bmp files can be read "
+                "a band at a time."
+            )
+
+        self.width = width
+        # rows are stored bottom-up unless the height is negative
+        self.height = abs(height)
+        self.bottom_up = height > 0
+        self.bytes_per_pixel = bit_count // 8
+        if palette is not None:
+            # palette entries are blue, green, red and a reserved byte
+            self.palette = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 4)[
+                :, 2::-1
+            ]
+        else:
+            self.palette = None
+
+        # rows are padded to a multiple of 4 bytes
+        row_bytes = (width * bit_count + 31) // 32 * 4
+        self.data = np.memmap(
+            location, np.uint8, "r", pixel_offset, (self.height, row_bytes)
+        )
+
+    def __enter__(self) -> "BmpReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def iter_rows(self, band_rows: int) -> Iterator[np.ndarray]:
+        """read the bmp a band of rows at a time
+
+        Args:
+            band_rows (int): rows per band
+
+        Yields:
+            Iterator[np.ndarray]: (lines, width, 3) rgb pixels, the last band may be
+                shorter
+        """
+        for top in range(0, self.height, band_rows):
+            bottom = min(top + band_rows, self.height)
+            if self.bottom_up:
+                rows = self.data[self.height - bottom : self.height - top][::-1]
+            else:
+                rows = self.data[top:bottom]
+
+            pixels = rows[:, : self.width * self.bytes_per_pixel].reshape(
+                bottom - top, self.width, self.bytes_per_pixel
+            )
+            if self.palette is not None:
+                yield self.palette[pixels[:, :, 0]]
+            else:
+                yield np.array(pixels[:, :, 2::-1])
+
+    def close(self) -> None:
+        self.data = None
+
+
+class LargeImage:
+    """
+    An image kept in a raw np.memmap file of (height, width) grayscale or
+    (height, width, 3) rgb uint8 pixels, for images larger than memory. Every
+    pass over the image goes a band of rows at a time, and filters run in bands
+    with halos through TileScheduler.
+    """
+
+    band_pixels = 1 << 22  # pixels per band when reading and writing
+    output_extensions = (".png", ".pcx", ".raw")
+
+    def __init__(
+        self,
+        location: str,
+        width: int,
+        height: int,
+        channels: int = 1,
+        mode: str = "r",
+    ) -> None:
+        """
+        Args:
+            location (str): location of the raw pixel file
+            width (int): image width
+            height (int): image height
+            channels (int, optional): 1 for grayscale or 3 for rgb. Defaults to 1.
+            mode (str, optional): np.memmap mode, "r", "r+" or "w+" to create
+                the file. Defaults to "r".
+        """
+        self.location = location
+        self.width = width
+        self.height = height
+        self.channels = channels
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        self.data = np.memmap(location, np.uint8, mode, shape=shape)
+
+    def create(
+        location: str, width: int, height: int, channels: int = 1
+    ) -> "LargeImage":
+        """create a raw pixel file of the given size
+
+        Args:
+            location (str): location of the raw pixel file, overwritten if it exists
+            width (int): image width
+            height (int): image height
+            channels (int, optional): 1 for grayscale or 3 for rgb. Defaults to 1.
+
+        Returns:
+            LargeImage: the new image, filled with zeros
+        """
+        return LargeImage(location, width, height, channels, "w+")
+
+    def from_file(
+        location: str,
+        raw_location: str,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> "LargeImage":
+        """decode an image file into a raw rgb pixel file
+
+        Pcx, png and bmp files are decoded a band of rows at a time. Other formats
+        are opened with PIL, which decodes them whole.
+
+        Args:
+            location (str): location of the image
+            raw_location (str): location of the raw pixel file to create
+            progress (Callable[[int, int], None] | None, optional): called with the
+                number of decoded rows and the image height. Defaults to None.
+
+        Returns:
+            LargeImage: the decoded image
+        """
+        extension = os.path.splitext(location)[1].lower()
+        reader = None
+        match extension:
+            case ".pcx":
+                reader = PcxImage(location)
+                dimensions = reader.get_window()
+                width = dimensions[2] - dimensions[0] + 1
+                height = dimensions[3] - dimensions[1] + 1
+                iter_rows = reader.iter_scanlines
+            case ".png" | ".bmp":
+                reader = (PngReader if extension == ".png" else BmpReader)(location)
+                width, height = reader.width, reader.height
+                iter_rows = reader.iter_rows
+            case _:
+                try:
+                    with Image.open(location) as img:
+                        pixels = np.asarray(img.convert("RGB"))
+                except Image.DecompressionBombError:
+                    raise Exception(
+                        f"{extension[1:].upper()} images are decoded whole and this one is "
+                        "too large. Convert it to png, bmp or pcx first."
+                    )
+                height, width = pixels.shape[:2]
+                iter_rows = lambda band_rows: (
+                    pixels[top : top + band_rows] for top in range(0, height, band_rows)
+                )
+
+        image = None
+        try:
+            image = LargeImage.create(raw_location, width, height, 3)
+            top = 0
+            for band in iter_rows(image.get_band_rows()):
+                image.data[top : top + len(band)] = band
+                top += len(band)
+                if progress:
+                    progress(top, height)
+        except BaseException:
+            # release the mapping of a partly decoded image, so its file can be removed
+            if image:
+                image.close()
+            raise
+        finally:
+            if reader:
+                reader.close()
+
+        image.data.flush()
+
+        return image
+
+    def get_band_rows(self) -> int:
+        return max(LargeImage.band_pixels // (self.width * self.channels), 1)
+
+    def get_bands(self) -> list[tuple[int, int]]:
+        """get the (top, bottom) rows of every band of the image"""
+        band_rows = self.get_band_rows()
+        return [
+            (top, min(top + band_rows, self.height))
+            for top in range(0, self.height, band_rows)
+        ]
+
+    def iter_bands(self) -> Iterator[np.ndarray]:
+        """read the image a band of rows at a time
+
+        Yields:
+            Iterator[np.ndarray]: (lines, width) or (lines, width, 3) pixels
+        """
+        for top, bottom in self.get_bands():
+            yield np.array(self.data[top:bottom])
+
+    def to_grayscale(
+        self, location: str, progress: Callable[[int, int], None] | None = None
+    ) -> "LargeImage":
+        """write the grayscale version of an rgb image, (r + g + b) / 3 like
+        ImageProcessor.get_grayscale_image
+
+        Args:
+            location (str): location of the raw grayscale file to create
+            progress (Callable[[int, int], None] | None, optional): called with the
+                number of converted rows and the image height. Defaults to None.
+
+        Returns:
+            LargeImage: grayscale image
+        """
+        lut = ImageProcessor.get_point_lut("grayscale")
+        grayscale = LargeImage.create(location, self.width, self.height)
+
+        for top, bottom in self.get_bands():
+            band = self.data[top:bottom]
+            grayscale.data[top:bottom] = lut[band.sum(axis=2, dtype=np.uint16)]
+            if progress:
+                progress(bottom, self.height)
+        grayscale.data.flush()
+
+        return grayscale
+
+    def filter(
+        self,
+        name: str,
+        location: str,
+        scheduler: TileScheduler | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        **options,
+    ) -> "LargeImage":
+        """apply a neighborhood filter of TileScheduler to a grayscale image
+
+        Args:
+            name (str): filter name, see tile_scheduler.apply_filter
+            location (str): location of the raw output file to create
+            scheduler (TileScheduler | None, optional): workers running the bands.
+                Defaults to None (a single worker).
+            progress (Callable[[int, int], None] | None, optional): called with the
+                number of filtered rows and the image height. Defaults to None.
+            **options: keyword arguments of the filter, like radius or q
+
+        Returns:
+            LargeImage: filtered image
+        """
+        if self.channels != 1:
+            raise Exception("Convert the image to grayscale first.")
+
+        scheduler = scheduler or TileScheduler(1)
+        output = LargeImage.create(location, self.width, self.height)
+        scheduler.filter_into(name, self.data, output.data, progress, **options)
+        output.data.flush()
+
+        return output
+
+    def save(
+        self, location: str, progress: Callable[[int, int], None] | None = None
+    ) -> None:
+        """write the image as png, pcx or raw pixels, a band at a time
+
+        Args:
+            location (str): location of the output, by its extension
+            progress (Callable[[int, int], None] | None, optional): called with the
+                number of written rows and the image height. Defaults to None.
+        """
+        extension = os.path.splitext(location)[1].lower()
+        match extension:
+            case ".png":
+                writer = PngWriter(location, self.width, self.height, self.channels)
+            case ".pcx":
+                writer = PcxWriter(location, self.width, self.height, self.channels)
+            case ".raw":
+                writer = None
+                raw_file = open(location, "wb")
+            case _:
+                raise Exception(f"Cannot save large images as {extension} files.")
+
+        try:
+            top = 0
+            for band in self.iter_bands():
+                if writer:
+                    writer.write_rows(band)
+                else:
+                    raw_file.write(band.tobytes())
+                top += len(band)
+                if progress:
+                    progress(top, self.height)
+        except BaseException:
+            # an unfinished output is not left behind
+            (writer.file if writer else raw_file).close()
+            os.remove(location)
+            raise
+
+        if writer:
+            writer.close()
+        else:
+            raw_file.close()
+
+    def close(self) -> None:
+        """write pending changes and release the mapping"""
+        if self.data is not None:
+            if self.data.mode != "r":
+                self.data.flush()
+            self.data = None
+
+    def process(
+        source: "str | LargeImage",
+        location: str,
+        name: str,
+        scheduler: TileScheduler | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        work_folder: str | None = None,
+        **options,
+    ) -> None:
+        """filter an image larger than memory and save the result
+
+        The image is decoded, converted to grayscale and filtered into raw pixel
+        files in a temporary folder, and the output is written from the last one.
+
+        Args:
+            source (str | LargeImage): location of the image, or an opened raw image
+            location (str): location of the output, see save
+            name (str): filter name, see tile_scheduler.apply_filter
+            scheduler (TileScheduler | None, optional): workers running the bands.
+                Defaults to None (a single worker).
+            progress (Callable[[int, int], None] | None, optional): called with the
+                finished and total rows of all the passes. Defaults to None.
+            work_folder (str | None, optional): folder of the temporary files, which
+                needs room for the image about three times. Defaults to None (the
+                system temporary folder).
+            **options: keyword arguments of the filter, like radius or q
+        """
+        if os.path.splitext(location)[1].lower() not in LargeImage.output_extensions:
+            raise Exception("Save large images as png, pcx or raw files.")
+
+        work_folder = tempfile.mkdtemp(prefix="ivp-", dir=work_folder)
+        opened = []
+        try:
+            # decoding, grayscale, filter and save passes over the rows
+            passes = 4
+
+            def get_pass_progress(done_passes: int):
+                if progress is None:
+                    return None
+                return lambda done, total: progress(
+                    done_passes * total + done, passes * total
+                )
+
+            image = source
+            if isinstance(source, str):
+                image = LargeImage.from_file(
+                    source,
+                    os.path.join(work_folder, "source.raw"),
+                    get_pass_progress(0),
+                )
+                opened.append(image)
+
+            if image.channels != 1:
+                image = image.to_grayscale(
+                    os.path.join(work_folder, "grayscale.raw"), get_pass_progress(1)
+                )
+                opened.append(image)
+
+            output = image.filter(
+                name,
+                os.path.join(work_folder, "filtered.raw"),
+                scheduler,
+                get_pass_progress(2),
+                **options,
+            )
+            opened.append(output)
+            output.save(location, get_pass_progress(3))
+        finally:
+            # mappings have to be released before their files can be removed
+            for image in opened:
+                image.close()
+            image = output = None
+            shutil.rmtree(work_folder, ignore_errors=True)
@@ -0,0 +1,388 @@
+from functools import cache
+import numpy as np
+
+
+class SortingNetwork:
+    """
+    Median filter of 8-bit images built from min / max operations on whole arrays
+    (separable sorting networks). A sorted list is a dict of rank -> array holding
+    that rank of the list for every pixel, and only the ranks that can still reach
+    the median are ever computed.
+
+    The columns of every window are sorted first, then sorted runs of 2, 4, 8, ...
+    adjacent columns are merged once and shared by all the windows that contain
+    them. A few output rows also share the rows their windows have in common, so
+    each output row only merges in the rows of its own window that the others lack.
+    """
+
+    # masks up to this radius are faster here than with sliding histograms
+    max_radius = 16
+
+    @cache
+    def get_merge_network(
+        a: int, b: int, ranks: tuple[int, ...]
+    ) -> tuple[int, int, int, tuple, tuple[int, ...], tuple[int, ...]]:
+        """Builds Batcher's odd-even merge of two sorted lists, keeping only the
+        comparators that lead to the given ranks of the merged list. Inputs below
+        or above every wanted rank cannot change it and are left out.
+
+        Args:
+            a (int): length of the first list
+            b (int): length of the second list
+            ranks (tuple[int, ...]): sorted ranks of the merged list to compute
+
+        Returns:
+            tuple[int, int, int, tuple, tuple[int, ...], tuple[int, ...]]: first used
+                rank of each list, wire of the first rank of the second list,
+                (low wire, high wire, keep low, keep high) comparators, and the
+                ranks of each list that are used
+        """
+
+        low, high = ranks[0], ranks[-1]
+        a_start, b_start = max(0, low - b), max(0, low - a)
+        a_length = min(a, high + 1) - a_start
+        b_length = min(b, high + 1) - b_start
+
+        # both lists are padded with +inf wires up to a power of two
+        n = 1
+        while n < max(a_length, b_length):
+            n *= 2
+
+        comparators = []
+
+        def merge(first: int, last: int, step: int) -> None:
+            if step * 2 < last - first:
+                merge(first, last, step * 2)
+                merge(first + step, last, step * 2)
+                for wire in range(first + step, last - step, step * 2):
+                    comparators.append((wire, wire + step))
+            else:
+                comparators.append((first, first + step))
+
+        merge(0, 2 * n - 1, 1)
+
+        # a comparator with an +inf wire moves the other value to its low wire
+        infinite = set(range(a_length, n)) | set(range(n + b_length, 2 * n))
+        steps = []
+        for low_wire, high_wire in comparators:
+            if high_wire in infinite:
+                continue
+            if low_wire in infinite:
+                infinite.remove(low_wire)
+                infinite.add(high_wire)
+                steps.append((low_wire, high_wire, False))
+            else:
+                steps.append((low_wire, high_wire, True))
+
+        # walk back from the wanted ranks, keeping the comparators they depend on
+        live = {rank - a_start - b_start for rank in ranks}
+        network = []
+        for low_wire, high_wire, compares in reversed(steps):
+            keep_low, keep_high = low_wire in live, high_wire in live
+            if not compares:
+                if keep_low:
+                    live.remove(low_wire)
+                    live.add(high_wire)
+                    network.append((low_wire, high_wire, False, False))
+            elif keep_low or keep_high:
+                live.update((low_wire, high_wire))
+                network.append((low_wire, high_wire, keep_low, keep_high))
+        network.reverse()
+
+        first_ranks = tuple(sorted(wire + a_start for wire in live if wire < n))
+        second_ranks = tuple(sorted(wire - n + b_start for wire in live if wire >= n))
+
+        return a_start, b_start, n, tuple(network), first_ranks, second_ranks
+
+    def get_merge_inputs(
+        lengths: tuple[int, int], ranks: set[int]
+    ) -> tuple[set[int], set[int]]:
+        """ranks of both lists that a merge keeping the given ranks uses"""
+        network = SortingNetwork.get_merge_network(*lengths, tuple(sorted(ranks)))
+        return set(network[4]), set(network[5])
+
+    def merge_sorted(
+        first: dict[int, np.ndarray],
+        second: dict[int, np.ndarray],
+        lengths: tuple[int, int],
+        ranks: set[int],
+    ) -> dict[int, np.ndarray]:
+        """Merges two sorted lists
+
+        Args:
+            first (dict[int, np.ndarray]): rank -> values of the first list
+            second (dict[int, np.ndarray]): rank -> values of the second list
+            lengths (tuple[int, int]): lengths of the lists
+            ranks (set[int]): ranks of the merged list to compute
+
+        Returns:
+            dict[int, np.ndarray]: rank -> values of the merged list
+        """
+
+        a_start, b_start, n, network, first_ranks, second_ranks = (
+            SortingNetwork.get_merge_network(*lengths, tuple(sorted(ranks)))
+        )
+        wires = {rank - a_start: first[rank] for rank in first_ranks}
+        wires.update({n + rank - b_start: second[rank] for rank in second_ranks})
+
+        for low_wire, high_wire, keep_low, keep_high in network:
+            if not (keep_low or keep_high):
+                wires[low_wire] = wires.pop(high_wire)
+                continue
+            low, high = wires[low_wire], wires[high_wire]
+            if keep_low:
+                wires[low_wire] = np.minimum(low, high)
+            if keep_high:
+                wires[high_wire] = np.maximum(low, high)
+
+        return {rank: wires[rank - a_start - b_start] for rank in ranks}
+
+    def get_list_ranks(
+        lengths: list[int], ranks: set[int]
+    ) -> tuple[list[set[int]], list[set[int]]]:
+        """Plans merging lists one after another, ((l0 + l1) + l2) + ...
+
+        Args:
+            lengths (list[int]): lengths of the lists
+            ranks (set[int]): ranks of the final list to compute
+
+        Returns:
+            tuple[list[set[int]], list[set[int]]]: ranks used of every list, and
+                ranks kept by the merge that adds every list after the first
+        """
+
+        list_ranks = [set() for _ in lengths]
+        merge_ranks = [set() for _ in lengths]
+        wanted = set(ranks)
+        for index in range(len(lengths) - 1, 0, -1):
+            merge_ranks[index] = wanted
+            wanted, list_ranks[index] = SortingNetwork.get_merge_inputs(
+                (sum(lengths[:index]), lengths[index]), wanted
+            )
+        list_ranks[0] = wanted
+
+        return list_ranks, merge_ranks
+
+    def merge_lists(
+        lists: list[dict[int, np.ndarray]], lengths: list[int], ranks: set[int]
+    ) -> dict[int, np.ndarray]:
+        """merge sorted lists one after another, keeping the given ranks"""
+        _, merge_ranks = SortingNetwork.get_list_ranks(lengths, ranks)
+        merged = lists[0]
+        for index in range(1, len(lists)):
+            merged = SortingNetwork.merge_sorted(
+                merged,
+                lists[index],
+                (sum(lengths[:index]), lengths[index]),
+                merge_ranks[index],
+            )
+
+        return merged
+
+    def get_window_runs(side: int) -> list[tuple[int, int]]:
+        """(width, offset) of the power of two runs of columns that make up a window"""
+        runs = []
+        width = 1 << (side.bit_length() - 1)
+        offset = 0
+        while offset < side:
+            while offset + width > side:
+                width //= 2
+            runs.append((width, offset))
+            offset += width
+
+        return runs
+
+    @cache
+    def get_run_ranks(
+        length: int, side: int, ranks: tuple[int, ...]
+    ) -> dict[int, set[int]]:
+        """Plans sorting windows of side sorted columns
+
+        Args:
+            length (int): length of the columns
+            side (int): number of columns in a window
+            ranks (tuple[int, ...]): ranks of the window to compute
+
+        Returns:
+            dict[int, set[int]]: run width -> ranks needed of the runs of that width
+        """
+
+        runs = SortingNetwork.get_window_runs(side)
+        list_ranks, _ = SortingNetwork.get_list_ranks(
+            [width * length for width, _ in runs], set(ranks)
+        )
+
+        run_ranks = {}
+        for (width, _), wanted in zip(runs, list_ranks):
+            run_ranks.setdefault(width, set()).update(wanted)
+
+        # a run is merged from the two runs of half its width
+        width = runs[0][0]
+        while width > 1:
+            half = width // 2
+            first, second = SortingNetwork.get_merge_inputs(
+                (half * length, half * length), run_ranks[width]
+            )
+            run_ranks.setdefault(half, set()).update(first | second)
+            width = half
+
+        return run_ranks
+
+    def sort_windows(
+        columns: dict[int, np.ndarray],
+        length: int,
+        side: int,
+        ranks: set[int],
+        width: int,
+    ) -> dict[int, np.ndarray]:
+        """Sorts every window of side adjacent sorted columns
+
+        Args:
+            columns (dict[int, np.ndarray]): rank -> (rows, width + side - 1) values
+                of the sorted columns
+            length (int): length of the columns
+            side (int): number of columns in a window
+            ranks (set[int]): ranks of the windows to compute
+            width (int): number of windows in a row
+
+        Returns:
+            dict[int, np.ndarray]: rank -> (rows, width) values of the windows
+        """
+
+        run_ranks = SortingNetwork.get_run_ranks(length, side, tuple(sorted(ranks)))
+        runs = SortingNetwork.get_window_runs(side)
+
+        # runs of every width up to the widest, each merged once for all windows
+        sorted_runs = {1: columns}
+        run_width = 1
+        while run_width < runs[0][0]:
+            half, run_width = run_width, run_width * 2
+            run = sorted_runs[half]
+            span = next(iter(run.values())).shape[1] - half
+            sorted_runs[run_width] = SortingNetwork.merge_sorted(
+                {rank: values[:, :span] for rank, values in run.items()},
+                {rank: values[:, half : half + span] for rank, values in run.items()},
+                (half * length, half * length),
+                run_ranks[run_width],
+            )
+
+        lists = [
+            {
+                rank: values[:, offset : offset + width]
+                for rank, values in sorted_runs[run_width].items()
+            }
+            for run_width, offset in runs
+        ]
+
+        return SortingNetwork.merge_lists(
+            lists, [run_width * length for run_width, _ in runs], ranks
+        )
+
+    def sort_values(values: list[np.ndarray], ranks: set[int]) -> dict[int, np.ndarray]:
+        """Sorts arrays elementwise by merging sorted halves
+
+        Args:
+            values (list[np.ndarray]): arrays of the same shape
+            ranks (set[int]): ranks to compute
+
+        Returns:
+            dict[int, np.ndarray]: rank -> elementwise value of that rank
+        """
+
+        if len(values) == 1:
+            return {0: values[0]}
+
+        half = len(values) // 2
+        lengths = (half, len(values) - half)
+        first, second = SortingNetwork.get_merge_inputs(lengths, ranks)
+
+        return SortingNetwork.merge_sorted(
+            SortingNetwork.sort_values(values[:half], first),
+            SortingNetwork.sort_values(values[half:], second),
+            lengths,
+            ranks,
+        )
+
+    def get_median(
+        grayscale_data: np.ndarray, radius: int = 1, band_pixels: int = 1 << 18
+    ) -> np.ndarray:
+        """median of every (2 * radius + 1) x (2 * radius + 1) neighborhood of an 8-bit
+        image, counting out of bounds pixels as 0
+
+        Output rows are taken a tile of a few rows at a time. The rows that all the
+        windows of a tile have in common are sorted and merged once per tile, and the
+        rows each window has on its own come from sorting the windows of single rows.
+        The image is worked on in bands of about band_pixels pixels, so the arrays
+        stay in the cache.
+
+        Args:
+            grayscale_data (np.ndarray): (height, width) uint8 grayscale data
+            radius (int, optional): mask radius. Defaults to 1.
+            band_pixels (int, optional): pixels of a band. Defaults to 1 << 18.
+
+        Returns:
+            np.ndarray: (height, width) median filtered data
+        """
+
+        height, width = grayscale_data.shape
+        side = 2 * radius + 1
+        middle = side**2 // 2
+        # the fewest min / max operations per pixel for each mask size
+        tile_rows = 2 if side <= 9 else 3 if side <= 25 else 4
+        shared_rows = side - tile_rows + 1
+        tiles = -(-height // tile_rows)
+
+        padded = np.pad(
+            grayscale_data,
+            ((radius, radius + tiles * tile_rows - height), (radius, radius)),
+        )
+        filtered_image = np.empty((tiles * tile_rows, width), dtype=np.uint8)
+
+        # the shared rows of a tile, then the rows of each window in row order
+        lengths = [shared_rows * side] + [side] * (tile_rows - 1)
+        list_ranks, _ = SortingNetwork.get_list_ranks(lengths, {middle})
+        row_ranks = set().union(*list_ranks[1:])
+        column_ranks = SortingNetwork.get_run_ranks(
+            shared_rows, side, tuple(sorted(list_ranks[0]))
+        )[1]
+
+        band_tiles = max(1, band_pixels // (tile_rows * padded.shape[1]))
+        for first_tile in range(0, tiles, band_tiles):
+            band_size = min(band_tiles, tiles - first_tile)
+            top = first_tile * tile_rows
+            band = padded[top : top + band_size * tile_rows + side - 1]
+
+            shared_values = [
+                band[tile_rows - 1 + row :: tile_rows][:band_size]
+                for row in range(shared_rows)
+            ]
+            shared_windows = SortingNetwork.sort_windows(
+                SortingNetwork.sort_values(shared_values, column_ranks),
+                shared_rows,
+                side,
+                list_ranks[0],
+                width,
+            )
+            row_windows = SortingNetwork.sort_windows(
+                {0: band}, 1, side, row_ranks, width
+            )
+
+            for tile_row in range(tile_rows):
+                # window rows outside the shared rows
+                rows = [
+                    row
+                    for row in range(side)
+                    if row < tile_rows - 1 - tile_row or row > side - 1 - tile_row
+                ]
+                lists = [shared_windows] + [
+                    {
+                        rank: values[tile_row + row :: tile_rows][:band_size]
+                        for rank, values in row_windows.items()
+                    }
+                    for row in rows
+                ]
+                filtered_image[
+                    top + tile_row : top + band_size * tile_rows : tile_rows
+                ] = SortingNetwork.merge_lists(lists, lengths, {middle})[middle]
+
+        return filtered_image[:height]
@@ -0,0 +1,161 @@
+from collections.abc import Callable
+import queue
+import threading
+import tkinter as tk
+
+
+class Task:
+    """
+    An operation queued on a TaskRunner. The operation is called with the task,
+    so it can report its progress and stop when the task is cancelled.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function: Callable[["Task"], object],
+        on_done: Callable[[object], None] | None = None,
+        on_error: Callable[[Exception], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            name (str): name shown while the task runs
+            function (Callable[[Task], object]): operation, run on the worker thread
+            on_done (Callable[[object], None] | None, optional): called with the
+                result on the Tk thread. Defaults to None.
+            on_error (Callable[[Exception], None] | None, optional): called with the
+                raised exception on the Tk thread. Defaults to None.
+        """
+        self.name = name
+        self.function = function
+        self.on_done = on_done
+        self.on_error = on_error
+        self.done = 0
+        self.total = 0
+        self.cancel_event = threading.Event()
+
+    def cancel(self) -> None:
+        """stop the task at its next progress report, or skip it if not started"""
+        self.cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def report(self, done: int, total: int) -> None:
+        """record the progress of the task
+
+        Args:
+            done (int): finished units of work (rows, tiles, steps)
+            total (int): units of work of the whole task
+
+        Raises:
+            Exception: when the task was cancelled
+        """
+        if self.cancel_event.is_set():
+            raise Exception("Cancelled operation")
+        self.done = done
+        self.total = total
+
+
+class TaskRunner:
+    """
+    Runs queued tasks one at a time on a worker thread. Results, errors and
+    progress are handed back to the Tk thread by polling with root.after, so
+    callbacks can update widgets.
+    """
+
+    def __init__(
+        self,
+        root: tk.Misc,
+        on_update: Callable[["TaskRunner"], None] | None = None,
+        interval: int = 50,
+    ) -> None:
+        """
+        Args:
+            root (tk.Misc): widget used to schedule the polling
+            on_update (Callable[[TaskRunner], None] | None, optional): called on the
+                Tk thread after every poll, to show the progress. Defaults to None.
+            interval (int, optional): polling interval in milliseconds.
+                Defaults to 50.
+        """
+        self.root = root
+        self.on_update = on_update
+        self.interval = interval
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = []  # submitted tasks that have not finished, in order
+        self.current = None
+
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+        self.root.after(self.interval, self.poll)
+
+    def submit(
+        self,
+        name: str,
+        function: Callable[[Task], object],
+        on_done: Callable[[object], None] | None = None,
+        on_error: Callable[[Exception], None] | None = None,
+    ) -> Task:
+        """queue an operation behind the ones already submitted
+
+        Args:
+            name (str): name shown while the task runs
+            function (Callable[[Task], object]): operation, run on the worker thread
+            on_done (Callable[[object], None] | None, optional): called with the
+                result on the Tk thread. Defaults to None.
+            on_error (Callable[[Exception], None] | None, optional): called with the
+                raised exception on the Tk thread. Defaults to None.
+
+        Returns:
+            Task: the queued task
+        """
+        task = Task(name, function, on_done, on_error)
+        self.pending.append(task)
+        self.tasks.put(task)
+        return task
+
+    def cancel_current(self) -> None:
+        """cancel the running task"""
+        task = self.current
+        if task:
+            task.cancel()
+
+    def cancel_all(self) -> None:
+        """cancel the running task and every queued task"""
+        for task in self.pending:
+            task.cancel()
+
+    def run(self) -> None:
+        while True:
+            task = self.tasks.get()
+            self.current = task
+            try:
+                if task.is_cancelled():
+                    raise Exception("Cancelled operation")
+                self.results.put((task, task.function(task), None))
+            except Exception as e:
+                self.results.put((task, None, e))
+            self.current = None
+
+    def poll(self) -> None:
+        # scheduled first so an error in a callback does not stop the polling
+        self.root.after(self.interval, self.poll)
+        while True:
+            try:
+                task, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending.remove(task)
+            # a task cancelled after it finished is dropped as well
+            if error is None and task.is_cancelled():
+                error = Exception("Cancelled operation")
+            if error is None:
+                if task.on_done:
+                    task.on_done(result)
+            elif task.on_error:
+                task.on_error(error)
+
+        if self.on_update:
+            self.on_update(self)
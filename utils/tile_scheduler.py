@@ -0,0 +1,338 @@
+from collections.abc import Callable
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from multiprocessing import shared_memory
+from PIL import Image
+from utils.image_processor import ImageProcessor
+import mmap
+import numpy as np
+import os
+
+
+def apply_filter(name: str, data: np.ndarray, options: dict) -> np.ndarray:
+    """apply a neighborhood filter of ImageProcessor by name
+
+    Args:
+        name (str): "average", "median", "highpass", "unsharp", "highboost",
+            "gradient", "geometric" or "contraharmonic"
+        data (np.ndarray): (height, width) pixel values
+        options (dict): keyword arguments of the filter, like radius or q
+
+    Returns:
+        np.ndarray: (height, width) uint8 filtered pixels
+    """
+    height, width = data.shape
+    processor = ImageProcessor()
+
+    match name:
+        case "average":
+            image = processor.get_average_filtered_image(data, width, height, **options)
+        case "median":
+            image = processor.get_median_filtered_image(data, width, height, **options)
+        case "highpass":
+            image = processor.get_highpass_filtered_image(
+                data, width, height, **options
+            )
+        case "unsharp":
+            image = processor.get_unsharp_masked_image(data, width, height, **options)
+        case "highboost":
+            image = processor.get_highboost_filtered_image(
+                data, width, height, **options
+            )
+        case "gradient":
+            image = processor.get_image_gradient(data, width, height, **options)
+        case "geometric":
+            image = processor.add_geometric_filter(width, height, data, **options)
+        case "contraharmonic":
+            image = processor.add_contraharmonic(width, height, data, **options)
+        case _:
+            raise Exception(f"Unknown filter: {name}")
+
+    return np.asarray(image)
+
+
+def attach_buffer(
+    buffer: np.ndarray | tuple, mode: str = "r+"
+) -> tuple[np.ndarray, shared_memory.SharedMemory | None]:
+    """get the array of a buffer given directly or described by
+    TileScheduler.share_buffer
+
+    Args:
+        buffer (np.ndarray | tuple): array, ("shared memory", name, shape, dtype)
+            or ("memmap", filename, offset, shape, dtype)
+        mode (str, optional): np.memmap mode of a file buffer. Defaults to "r+".
+
+    Returns:
+        tuple[np.ndarray, shared_memory.SharedMemory | None]: array and the
+            attached shared memory, to be closed by the caller
+    """
+    if isinstance(buffer, np.ndarray):
+        return buffer, None
+
+    match buffer[0]:
+        case "shared memory":
+            _, name, shape, dtype = buffer
+            memory = shared_memory.SharedMemory(name)
+            return np.ndarray(shape, dtype, buffer=memory.buf), memory
+        case "memmap":
+            _, filename, offset, shape, dtype = buffer
+            return np.memmap(filename, dtype, mode, offset, shape), None
+        case _:
+            raise Exception(f"Unknown buffer: {buffer[0]}")
+
+
+def filter_band(
+    name: str,
+    options: dict,
+    source: np.ndarray | tuple,
+    destination: np.ndarray | tuple,
+    top: int,
+    bottom: int,
+    radius: int,
+) -> int:
+    """filter the rows top to bottom of the source into the destination, reading
+    radius extra rows on each side
+
+    Args:
+        name (str): filter name, see apply_filter
+        options (dict): keyword arguments of the filter
+        source (np.ndarray | tuple): source buffer, see attach_buffer
+        destination (np.ndarray | tuple): output buffer, see attach_buffer
+        top (int): first output row
+        bottom (int): row after the last output row
+        radius (int): neighborhood radius of the filter
+
+    Returns:
+        int: number of rows written
+    """
+    source, source_memory = attach_buffer(source, "r")
+    destination, destination_memory = attach_buffer(destination, "r+")
+    try:
+        start = max(top - radius, 0)
+        end = min(bottom + radius, source.shape[0])
+        band = apply_filter(name, source[start:end], options)
+        destination[top:bottom] = band[top - start : bottom - start]
+    finally:
+        # views of the shared memory have to be gone before it is closed
+        del source, destination
+        for memory in (source_memory, destination_memory):
+            if memory:
+                memory.close()
+
+    return bottom - top
+
+
+class TileScheduler:
+    """
+    Splits neighborhood filters into row bands with radius-sized halos and runs
+    the bands on a pool of workers. With processes, the source and output images
+    live in shared memory, or in their np.memmap files, and only their names are
+    sent to the workers. Each band sees the same neighborhoods as the whole image,
+    and the filters only sum over those neighborhoods, never over image-wide
+    running sums, so the stitched output is identical to a single-threaded run.
+    """
+
+    # upper bound on the pixels of a band, when the band height is not given
+    max_band_pixels = 1 << 22
+
+    def __init__(self, workers: int | None = None, processes: bool = False) -> None:
+        """
+        Args:
+            workers (int | None, optional): number of workers. Defaults to None
+                (the number of processors).
+            processes (bool, optional): use worker processes instead of threads.
+                Processes start the main module again on platforms that spawn them,
+                so it needs an if __name__ == "__main__" guard. Defaults to False.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.processes = processes
+        self.executor = None
+
+    def __enter__(self) -> "TileScheduler":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def get_executor(self) -> Executor:
+        # the pool is kept between filters since starting processes is slow
+        if self.executor is None:
+            if self.processes:
+                self.executor = ProcessPoolExecutor(self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(self.workers)
+        return self.executor
+
+    def get_radius(name: str, options: dict) -> int:
+        """get the neighborhood radius of a filter
+
+        Args:
+            name (str): filter name, see apply_filter
+            options (dict): keyword arguments of the filter
+
+        Returns:
+            int: rows needed above and below every output row
+        """
+        if name in ("average", "median", "geometric", "contraharmonic"):
+            return options.get("radius", 1)
+        return 1
+
+    def filter(
+        self,
+        name: str,
+        data: np.ndarray,
+        progress: Callable[[int, int], None] | None = None,
+        band_rows: int | None = None,
+        **options,
+    ) -> Image:
+        """apply a neighborhood filter over bands of the image on the workers
+
+        Args:
+            name (str): filter name, see apply_filter
+            data (np.ndarray): (height, width) pixel values
+            progress (Callable[[int, int], None] | None, optional): called with the
+                number of finished rows and the image height as bands finish. It
+                can raise to stop the filter. Defaults to None.
+            band_rows (int | None, optional): output rows per band. Defaults to None,
+                see filter_into.
+            **options: keyword arguments of the filter, like radius or q
+
+        Returns:
+            Image: filtered image
+        """
+        output = np.empty(data.shape, dtype=np.uint8)
+        self.filter_into(name, data, output, progress, band_rows, **options)
+
+        return Image.fromarray(output)
+
+    def filter_into(
+        self,
+        name: str,
+        data: np.ndarray,
+        output: np.ndarray,
+        progress: Callable[[int, int], None] | None = None,
+        band_rows: int | None = None,
+        **options,
+    ) -> None:
+        """apply a neighborhood filter over bands of the image, writing each band
+        into an output array as it finishes
+
+        Whole np.memmap files are opened again by worker processes instead of being
+        copied into shared memory, so images larger than memory can be filtered.
+
+        Args:
+            name (str): filter name, see apply_filter
+            data (np.ndarray): (height, width) pixel values
+            output (np.ndarray): (height, width) uint8 array for the result
+            progress (Callable[[int, int], None] | None, optional): called with the
+                number of finished rows and the image height as bands finish. It
+                can raise to stop the filter. Defaults to None.
+            band_rows (int | None, optional): output rows per band. Defaults to None
+                (about 4 bands per worker and at least 32 bands, of at most
+                max_band_pixels pixels).
+            **options: keyword arguments of the filter, like radius or q
+        """
+        radius = TileScheduler.get_radius(name, options)
+        height, width = data.shape
+
+        # the filters need several times the band size for their intermediates
+        band_rows = band_rows or max(
+            min(
+                -(-height // max(4 * self.workers, 32)),
+                TileScheduler.max_band_pixels // max(width, 1),
+            ),
+            4 * radius,
+            16,
+        )
+        bands = [
+            (top, min(top + band_rows, height)) for top in range(0, height, band_rows)
+        ]
+
+        if self.workers == 1:
+            for top, bottom in bands:
+                filter_band(name, options, data, output, top, bottom, radius)
+                if progress:
+                    progress(bottom, height)
+            return
+
+        memories = []
+        try:
+            if self.processes:
+                source = TileScheduler.share_buffer(data, memories, copy=True)
+                destination = TileScheduler.share_buffer(output, memories)
+            else:
+                source = data
+                destination = output
+
+            executor = self.get_executor()
+            futures = [
+                executor.submit(
+                    filter_band,
+                    name,
+                    options,
+                    source,
+                    destination,
+                    top,
+                    bottom,
+                    radius,
+                )
+                for top, bottom in bands
+            ]
+            try:
+                done = 0
+                for future in as_completed(futures):
+                    done += future.result()
+                    if progress:
+                        progress(done, height)
+            except BaseException:
+                # bands still running write into the buffers, let them finish
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+
+            if self.processes and destination[0] == "shared memory":
+                output[:] = np.ndarray(
+                    output.shape, output.dtype, buffer=memories[-1].buf
+                )
+        finally:
+            for memory in memories:
+                memory.close()
+                memory.unlink()
+
+    def share_buffer(
+        data: np.ndarray, memories: list[shared_memory.SharedMemory], copy: bool = False
+    ) -> tuple:
+        """describe an array so worker processes can attach to it
+
+        Args:
+            data (np.ndarray): array to share
+            memories (list[shared_memory.SharedMemory]): created shared memory is
+                added here, to be unlinked by the caller
+            copy (bool, optional): copy the array into new shared memory.
+                Defaults to False.
+
+        Returns:
+            tuple: buffer description for attach_buffer
+        """
+        # only an array mapping a whole file can be opened again from its name
+        if isinstance(data, np.memmap) and isinstance(data.base, mmap.mmap):
+            return ("memmap", data.filename, data.offset, data.shape, data.dtype.str)
+
+        memory = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        memories.append(memory)
+        if copy:
+            np.ndarray(data.shape, data.dtype, buffer=memory.buf)[:] = data
+
+        return ("shared memory", memory.name, data.shape, data.dtype.str)
+
+    def close(self) -> None:
+        """stop the workers"""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None